@@ -3,37 +3,165 @@
 Módulo para generar reportes contables y ledgers desde Alegra
 """
 
-import requests
+import asyncio
+import aiohttp
 import base64
-import json
+import hashlib
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
 import os
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 
+import utils_numba
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Timeout total por solicitud a Alegra (segundos)
+ALEGRA_TIMEOUT = 30
+
+# Tamaño máximo de página que acepta la API de Alegra
+ALEGRA_PAGE_SIZE = 30
+
+# Límites del pool de conexiones keep-alive hacia Alegra
+ALEGRA_POOL_MAXSIZE = 16
+ALEGRA_POOL_PER_HOST = 4
+
+# Reintentos ante rate limit (429) y errores transitorios del gateway de Alegra
+ALEGRA_MAX_RETRIES = 5
+ALEGRA_BACKOFF_FACTOR = 0.5
+ALEGRA_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+ALEGRA_MAX_RETRY_AFTER = 60
+
+# Ventanas de frescura (segundos) para respuestas de Alegra cacheadas en Redis
+CACHE_POLICIES = {
+    'short': 10,       # Facturas/bills (cambian de estado con frecuencia)
+    'normal': 30,
+    'long': 60,        # Reportes de ledger
+}
+
+# Tiempo que se conserva una respuesta vencida como respaldo si Alegra no responde
+CACHE_STALE_TTL = 900
+
+# Compresión de los registros de reportes guardados en Parquet
+REPORT_PARQUET_COMPRESSION = 'zstd'
+REPORT_PARQUET_COMPRESSION_LEVEL = 3
+
+# Opciones de orjson para los reportes guardados en disco (indentado, UTF-8)
+REPORT_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Buckets de aging: 0-30, 31-60, 61-90 y más de 90 días de vencimiento
+AGING_BUCKET_NAMES = ('current', '31_60', '61_90', 'over_90')
+
+
+def _run_sync(coro: Coroutine) -> Any:
+    """Ejecutar una corrutina desde código síncrono (CLI, Celery o handlers async)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    # Ya hay un event loop activo (p. ej. FastAPI): ejecutar en un hilo aparte
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
 class AlegraReports:
     """Generador de reportes contables desde Alegra"""
     
-    def __init__(self):
+    # El directorio de reportes se crea una sola vez por proceso
+    _reports_dir_ready = False
+    
+    def __init__(self, use_cache: bool = True):
         self.alegra_email = os.getenv('ALEGRA_USER')
         self.alegra_token = os.getenv('ALEGRA_TOKEN')
         self.base_url = "https://api.alegra.com/api/v1"
         
         if not self.alegra_email or not self.alegra_token:
             raise ValueError("Faltan credenciales de Alegra en .env")
-    
-    def get_auth_headers(self) -> Dict[str, str]:
-        """Obtener headers de autenticación para Alegra"""
-        credentials = f"{self.alegra_email}:{self.alegra_token}"
-        auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
         
-        return {
-            'Authorization': auth_header,
+        # Las credenciales no cambian durante la vida del objeto: codificar una vez
+        credentials = f"{self.alegra_email}:{self.alegra_token}"
+        self._auth_headers = MappingProxyType({
+            'Authorization': f"Basic {base64.b64encode(credentials.encode()).decode()}",
             'Content-Type': 'application/json'
+        })
+        
+        # Sesión HTTP persistente (ver __aenter__); None = sesión por llamada
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Caché de respuestas (CacheManager/Redis), inicializado en el primer uso
+        self.use_cache = use_cache
+        self._response_cache = None
+        
+        # Formateadores de resumen por tipo de reporte (se resuelven una sola vez)
+        self._summary_formatters = {
+            'general-ledger': self._summarize_ledger,
+            'trial-balance': self._summarize_trial_balance,
+            'journal': self._summarize_journal,
+            'aging': self._summarize_aging,
+            'cash_flow': self._summarize_cash_flow,
         }
+        
+        # Compilar el kernel de aging aquí y no en el primer reporte
+        utils_numba.warmup()
+    
+    async def __aenter__(self) -> 'AlegraReports':
+        """Abrir una sesión persistente reutilizada por todos los reportes"""
+        self._session = self._create_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Cerrar la sesión persistente y su pool de conexiones"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Crear sesión con pool keep-alive y headers de autenticación fijos"""
+        connector = aiohttp.TCPConnector(
+            limit=ALEGRA_POOL_MAXSIZE,
+            limit_per_host=ALEGRA_POOL_PER_HOST,
+            ttl_dns_cache=300
+        )
+        return aiohttp.ClientSession(
+            headers=self.get_auth_headers(),
+            timeout=aiohttp.ClientTimeout(total=ALEGRA_TIMEOUT),
+            connector=connector
+        )
+    
+    @asynccontextmanager
+    async def _session_scope(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """Reutilizar la sesión persistente o abrir una temporal para la llamada"""
+        if self._session is not None and not self._session.closed:
+            yield self._session
+        else:
+            async with self._create_session() as session:
+                yield session
+    
+    def get_auth_headers(self) -> Mapping[str, str]:
+        """Obtener headers de autenticación para Alegra (solo lectura)"""
+        return self._auth_headers
     
     def generate_ledger_report(self, start_date: str, end_date: str, 
                              report_type: str = 'general-ledger',
@@ -47,10 +175,15 @@ class AlegraReports:
             report_type: Tipo de reporte (general-ledger, trial-balance, journal)
             account_id: ID de cuenta específica (opcional)
         """
-        logger = logging.getLogger(__name__)
-        logger.info(f"📊 Generando reporte {report_type} desde {start_date} hasta {end_date}")
-        
-        headers = self.get_auth_headers()
+        return _run_sync(
+            self.generate_ledger_report_async(start_date, end_date, report_type, account_id)
+        )
+    
+    async def generate_ledger_report_async(self, start_date: str, end_date: str,
+                                           report_type: str = 'general-ledger',
+                                           account_id: Optional[str] = None) -> Optional[Dict]:
+        """Versión asíncrona de generate_ledger_report"""
+        logger.info("📊 Generando reporte %s desde %s hasta %s", report_type, start_date, end_date)
         
         # Mapear tipos de reporte a endpoints de Alegra
         report_endpoints = {
@@ -60,7 +193,7 @@ class AlegraReports:
         }
         
         if report_type not in report_endpoints:
-            logger.error(f"❌ Tipo de reporte no válido: {report_type}")
+            logger.error("❌ Tipo de reporte no válido: %s", report_type)
             return None
         
         endpoint = report_endpoints[report_type]
@@ -75,199 +208,332 @@ class AlegraReports:
             params['accountId'] = account_id
         
         try:
-            response = requests.get(
-                f"{self.base_url}/{endpoint}",
-                params=params,
-                headers=headers,
-                timeout=30
-            )
+            async with self._session_scope() as session:
+                status, payload = await self._cached_fetch(session, endpoint, params, 'long',
+                                                           paginate=False)
             
-            logger.info(f"📡 Status Code: {response.status_code}")
+            logger.info("📡 Status Code: %s", status)
             
-            if response.status_code == 200:
-                report_data = response.json()
-                logger.info(f"✅ Reporte {report_type} generado exitosamente")
-                
-                # Guardar reporte en archivo
-                self._save_report_to_file(report_data, report_type, start_date, end_date)
-                
-                # Mostrar resumen
-                self._display_report_summary(report_data, report_type)
-                
-                return report_data
+            if status == 200:
+                return self._build_ledger_report(payload, report_type, start_date, end_date)
             else:
-                logger.error(f"❌ Error generando reporte: {response.status_code}")
-                logger.error(f"📝 Respuesta: {response.text}")
+                logger.error("❌ Error generando reporte: %s", status)
+                logger.error("📝 Respuesta: %s", payload)
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Error en API Alegra: {e}")
+            logger.error("❌ Error en API Alegra: %s", e)
             return None
     
     def generate_aging_report(self, start_date: str, end_date: str) -> Optional[Dict]:
         """Generar reporte de aging de cuentas por cobrar y pagar"""
-        logger = logging.getLogger(__name__)
-        logger.info(f"📊 Generando reporte de aging desde {start_date} hasta {end_date}")
+        return _run_sync(self.generate_aging_report_async(start_date, end_date))
+    
+    def generate_cash_flow_report(self, start_date: str, end_date: str) -> Optional[Dict]:
+        """Generar reporte básico de flujo de caja"""
+        return _run_sync(self.generate_cash_flow_report_async(start_date, end_date))
+    
+    async def _get_json(self, session: aiohttp.ClientSession, endpoint: str,
+                        params: Dict[str, str]) -> Tuple[int, Any]:
+        """
+        GET asíncrono contra Alegra; retorna (status, payload)
         
-        headers = self.get_auth_headers()
+        Las respuestas 429/502/503/504 se reintentan hasta ALEGRA_MAX_RETRIES
+        veces con backoff exponencial, respetando el header Retry-After.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        for attempt in range(ALEGRA_MAX_RETRIES + 1):
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    return response.status, orjson.loads(await response.read())
+                if response.status not in ALEGRA_RETRY_STATUSES or attempt == ALEGRA_MAX_RETRIES:
+                    return response.status, await response.text()
+                delay = self._retry_delay(attempt, response.headers.get('Retry-After'))
+            
+            logger.warning("⚠️ Alegra respondió %s en %s, reintentando en %.1fs (intento %s/%s)",
+                           response.status, endpoint, delay, attempt + 1, ALEGRA_MAX_RETRIES)
+            await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _retry_delay(attempt: int, retry_after: Optional[str]) -> float:
+        """Segundos de espera antes del siguiente intento (Retry-After o backoff exponencial)"""
+        backoff = ALEGRA_BACKOFF_FACTOR * (2 ** attempt)
+        if not retry_after:
+            return backoff
         
         try:
-            # Obtener facturas pendientes
-            invoices_response = requests.get(
-                f"{self.base_url}/invoices",
-                params={
-                    'status': 'open',
-                    'startDate': start_date,
-                    'endDate': end_date
-                },
-                headers=headers,
-                timeout=30
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return backoff
+        
+        return min(max(delay, 0.0), ALEGRA_MAX_RETRY_AFTER)
+    
+    async def _fetch_all_pages(self, session: aiohttp.ClientSession, endpoint: str,
+                               params: Dict[str, str]) -> Tuple[int, Any]:
+        """
+        Obtener todas las páginas de un endpoint de Alegra
+        
+        La primera página se pide con ``metadata=true`` para conocer el total de
+        registros; las páginas restantes se solicitan en paralelo y se concatenan
+        en orden. Retorna (status, lista de registros) o (status, texto de error).
+        """
+        page_params = dict(params, start='0', limit=str(ALEGRA_PAGE_SIZE), metadata='true')
+        status, payload = await self._get_json(session, endpoint, page_params)
+        if status != 200:
+            return status, payload
+        
+        if isinstance(payload, dict):
+            items = list(payload.get('data') or [])
+            total = int((payload.get('metadata') or {}).get('total', len(items)))
+        else:
+            items = list(payload or [])
+            total = len(items)
+        
+        pages = await asyncio.gather(*(
+            self._get_json(session, endpoint, dict(page_params, start=str(offset)))
+            for offset in range(ALEGRA_PAGE_SIZE, total, ALEGRA_PAGE_SIZE)
+        ))
+        
+        for page_status, page_payload in pages:
+            if page_status != 200:
+                return page_status, page_payload
+            if isinstance(page_payload, dict):
+                items.extend(page_payload.get('data') or [])
+            else:
+                items.extend(page_payload or [])
+        
+        return status, items
+    
+    def _get_response_cache(self):
+        """Obtener el CacheManager; si Redis no está disponible se desactiva el caché"""
+        if self._response_cache is None and self.use_cache:
+            try:
+                from cache_manager import CacheManager
+                
+                cache = CacheManager()
+                cache.redis_client.ping()
+                self._response_cache = cache
+            except Exception as e:
+                logger.warning("⚠️ Caché de respuestas Alegra deshabilitado: %s", e)
+                self.use_cache = False
+        
+        return self._response_cache
+    
+    @staticmethod
+    def _cache_key(endpoint: str, params: Dict[str, str]) -> str:
+        """Clave de caché estable para (endpoint, params)"""
+        query = urlencode(sorted(params.items()))
+        return hashlib.sha1(f"{endpoint}?{query}".encode()).hexdigest()
+    
+    async def _cached_fetch(self, session: aiohttp.ClientSession, endpoint: str,
+                            params: Dict[str, str], policy: str = 'normal',
+                            paginate: bool = True) -> Tuple[int, Any]:
+        """
+        Obtener un endpoint usando el caché de respuestas
+        
+        Con ``paginate`` (endpoints de listas como invoices/bills) se descargan
+        todas las páginas; sin él (reportes de ledger) se hace un único GET y
+        la respuesta se conserva tal cual. Una entrada más reciente que la
+        ventana de ``policy`` se sirve sin tocar la red. Si Alegra no es
+        alcanzable, se usa la entrada vencida (conservada hasta
+        CACHE_STALE_TTL) en lugar de fallar.
+        """
+        fetch = self._fetch_all_pages if paginate else self._get_json
+        cache = self._get_response_cache()
+        if cache is None:
+            return await fetch(session, endpoint, params)
+        
+        # Las respuestas crudas no comparten clave con las listas paginadas del mismo endpoint
+        key = self._cache_key(endpoint if paginate else f"{endpoint}#raw", params)
+        entry = cache.get_cached_data('alegra', key)
+        
+        if entry and time.time() - entry['fetched_at'] < CACHE_POLICIES[policy]:
+            return 200, entry['payload']
+        
+        try:
+            status, payload = await fetch(session, endpoint, params)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if entry:
+                logger.warning("⚠️ Alegra no disponible (%s), usando respuesta en caché de %s", e, endpoint)
+                return 200, entry['payload']
+            raise
+        
+        if status == 200:
+            cache.set_cached_data(
+                'alegra', key,
+                {'fetched_at': time.time(), 'payload': payload},
+                ttl=CACHE_STALE_TTL
             )
-            
-            bills_response = requests.get(
-                f"{self.base_url}/bills",
-                params={
-                    'status': 'open',
-                    'startDate': start_date,
-                    'endDate': end_date
-                },
-                headers=headers,
-                timeout=30
+        
+        return status, payload
+    
+    async def _fetch_invoices_and_bills(self, start_date: str,
+                                        end_date: str) -> Tuple[Tuple[int, Any], Tuple[int, Any]]:
+        """
+        Obtener facturas y bills del periodo en paralelo con una sola sesión HTTP
+        
+        Se piden sin filtro de estado: aging usa las abiertas y flujo de caja
+        las cerradas, así ambos reportes comparten la misma entrada de caché
+        en lugar de consultar cada endpoint dos veces.
+        """
+        params = {
+            'startDate': start_date,
+            'endDate': end_date
+        }
+        async with self._session_scope() as session:
+            return await asyncio.gather(
+                self._cached_fetch(session, 'invoices', params, 'short'),
+                self._cached_fetch(session, 'bills', params, 'short')
+            )
+    
+    async def generate_aging_report_async(self, start_date: str, end_date: str) -> Optional[Dict]:
+        """Versión asíncrona de generate_aging_report"""
+        logger.info("📊 Generando reporte de aging desde %s hasta %s", start_date, end_date)
+        
+        try:
+            # Obtener facturas y bills pendientes de forma concurrente
+            (invoices_status, invoices), (bills_status, bills) = await self._fetch_invoices_and_bills(
+                start_date, end_date
             )
             
-            if invoices_response.status_code == 200 and bills_response.status_code == 200:
-                invoices = invoices_response.json()
-                bills = bills_response.json()
-                
-                # Calcular aging
-                aging_data = self._calculate_aging(invoices, bills, start_date)
-                
-                # Guardar reporte
-                report_data = {
-                    'report_type': 'aging',
-                    'period': {'start': start_date, 'end': end_date},
-                    'generated_at': datetime.now().isoformat(),
-                    'data': aging_data
-                }
-                
-                self._save_report(report_data, 'aging')
-                return report_data
+            if invoices_status == 200 and bills_status == 200:
+                return self._build_aging_report(invoices, bills, start_date, end_date)
             else:
-                logger.error(f"❌ Error obteniendo datos: Invoices {invoices_response.status_code}, Bills {bills_response.status_code}")
+                logger.error("❌ Error obteniendo datos: Invoices %s, Bills %s", invoices_status, bills_status)
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Error generando aging: {e}")
+            logger.error("❌ Error generando aging: %s", e)
             return None
     
-    def generate_cash_flow_report(self, start_date: str, end_date: str) -> Optional[Dict]:
-        """Generar reporte básico de flujo de caja"""
-        logger = logging.getLogger(__name__)
-        logger.info(f"📊 Generando reporte de flujo de caja desde {start_date} hasta {end_date}")
-        
-        headers = self.get_auth_headers()
+    async def generate_cash_flow_report_async(self, start_date: str, end_date: str) -> Optional[Dict]:
+        """Versión asíncrona de generate_cash_flow_report"""
+        logger.info("📊 Generando reporte de flujo de caja desde %s hasta %s", start_date, end_date)
         
         try:
-            # Obtener ingresos (invoices pagadas)
-            income_response = requests.get(
-                f"{self.base_url}/invoices",
-                params={
-                    'status': 'closed',
-                    'startDate': start_date,
-                    'endDate': end_date
-                },
-                headers=headers,
-                timeout=30
+            # Obtener ingresos (invoices pagadas) y gastos (bills pagadas) de forma concurrente
+            (income_status, income_data), (expenses_status, expense_data) = await self._fetch_invoices_and_bills(
+                start_date, end_date
             )
             
-            # Obtener gastos (bills pagadas)
-            expenses_response = requests.get(
-                f"{self.base_url}/bills",
-                params={
-                    'status': 'closed',
-                    'startDate': start_date,
-                    'endDate': end_date
-                },
-                headers=headers,
-                timeout=30
-            )
-            
-            if income_response.status_code == 200 and expenses_response.status_code == 200:
-                income_data = income_response.json()
-                expense_data = expenses_response.json()
-                
-                # Calcular flujo de caja
-                cash_flow = self._calculate_cash_flow(income_data, expense_data)
-                
-                # Guardar reporte
-                report_data = {
-                    'report_type': 'cash_flow',
-                    'period': {'start': start_date, 'end': end_date},
-                    'generated_at': datetime.now().isoformat(),
-                    'data': cash_flow
-                }
-                
-                self._save_report(report_data, 'cash_flow')
-                return report_data
+            if income_status == 200 and expenses_status == 200:
+                return self._build_cash_flow_report(income_data, expense_data, start_date, end_date)
             else:
-                logger.error(f"❌ Error obteniendo datos: Income {income_response.status_code}, Expenses {expenses_response.status_code}")
+                logger.error("❌ Error obteniendo datos: Income %s, Expenses %s", income_status, expenses_status)
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Error generando flujo de caja: {e}")
+            logger.error("❌ Error generando flujo de caja: %s", e)
             return None
     
-    def _calculate_aging(self, invoices: List[Dict], bills: List[Dict], start_date: str) -> Dict:
-        """Calcular aging de cuentas por cobrar y pagar"""
-        from datetime import datetime, timedelta
+    def generate_all_reports(self, start_date: str, end_date: str) -> Dict[str, Optional[Dict]]:
+        """Generar aging, flujo de caja y libro mayor del mismo periodo"""
+        return _run_sync(self.generate_all_reports_async(start_date, end_date))
+    
+    async def generate_all_reports_async(self, start_date: str,
+                                         end_date: str) -> Dict[str, Optional[Dict]]:
+        """
+        Generar aging, flujo de caja y libro mayor con una sola ronda de requests
         
-        today = datetime.now().date()
-        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        Las tres consultas (facturas, bills y ledger) se lanzan a la vez sobre
+        la misma sesión, de modo que el tiempo total es aproximadamente el de
+        la consulta más lenta; aging y flujo de caja comparten las mismas
+        facturas/bills y cada uno filtra por estado.
+        Retorna un diccionario con cada reporte (None si falló).
+        """
+        logger.info("📊 Generando todos los reportes desde %s hasta %s", start_date, end_date)
         
-        aging_buckets = {
-            'current': 0,      # 0-30 días
-            '31_60': 0,        # 31-60 días
-            '61_90': 0,        # 61-90 días
-            'over_90': 0       # Más de 90 días
+        period = {'startDate': start_date, 'endDate': end_date}
+        reports: Dict[str, Optional[Dict]] = {
+            'aging': None,
+            'cash_flow': None,
+            'general-ledger': None
         }
         
-        # Aging de cuentas por cobrar (invoices)
-        receivables = {'total': 0, 'aging': aging_buckets.copy()}
-        for invoice in invoices:
-            if invoice.get('status') == 'open':
-                due_date = datetime.strptime(invoice.get('dueDate', invoice.get('date')), '%Y-%m-%d').date()
-                days_overdue = (today - due_date).days
-                amount = float(invoice.get('total', 0))
-                
-                receivables['total'] += amount
-                
-                if days_overdue <= 30:
-                    receivables['aging']['current'] += amount
-                elif days_overdue <= 60:
-                    receivables['aging']['31_60'] += amount
-                elif days_overdue <= 90:
-                    receivables['aging']['61_90'] += amount
-                else:
-                    receivables['aging']['over_90'] += amount
-        
-        # Aging de cuentas por pagar (bills)
-        payables = {'total': 0, 'aging': aging_buckets.copy()}
-        for bill in bills:
-            if bill.get('status') == 'open':
-                due_date = datetime.strptime(bill.get('dueDate', bill.get('date')), '%Y-%m-%d').date()
-                days_overdue = (today - due_date).days
-                amount = float(bill.get('total', 0))
-                
-                payables['total'] += amount
-                
-                if days_overdue <= 30:
-                    payables['aging']['current'] += amount
-                elif days_overdue <= 60:
-                    payables['aging']['31_60'] += amount
-                elif days_overdue <= 90:
-                    payables['aging']['61_90'] += amount
-                else:
-                    payables['aging']['over_90'] += amount
+        try:
+            async with self._session_scope() as session:
+                (
+                    (invoices_status, invoices),
+                    (bills_status, bills),
+                    (ledger_status, ledger_data)
+                ) = await asyncio.gather(
+                    self._cached_fetch(session, 'invoices', period, 'short'),
+                    self._cached_fetch(session, 'bills', period, 'short'),
+                    self._cached_fetch(session, 'reports/general-ledger', period, 'long',
+                                       paginate=False)
+                )
+        except Exception as e:
+            logger.error("❌ Error en API Alegra: %s", e)
+            return reports
+        
+        if invoices_status == 200 and bills_status == 200:
+            reports['aging'] = self._build_aging_report(invoices, bills, start_date, end_date)
+            reports['cash_flow'] = self._build_cash_flow_report(invoices, bills, start_date, end_date)
+        else:
+            logger.error("❌ Error obteniendo datos: Invoices %s, Bills %s", invoices_status, bills_status)
+        
+        if ledger_status == 200:
+            reports['general-ledger'] = self._build_ledger_report(
+                ledger_data, 'general-ledger', start_date, end_date
+            )
+        else:
+            logger.error("❌ Error generando reporte general-ledger: %s", ledger_status)
+        
+        return reports
+    
+    def _build_ledger_report(self, report_data: Dict, report_type: str,
+                             start_date: str, end_date: str) -> Dict:
+        """Guardar y mostrar un reporte de ledger tal como lo retornó Alegra"""
+        logger.info("✅ Reporte %s generado exitosamente", report_type)
+        
+        # Guardar reporte en archivo
+        self._save_report_to_file(report_data, report_type, start_date, end_date)
+        
+        # Mostrar resumen
+        self._display_report_summary(report_data, report_type)
+        
+        return report_data
+    
+    def _build_aging_report(self, invoices: Iterable[Dict], bills: Iterable[Dict],
+                            start_date: str, end_date: str) -> Dict:
+        """Calcular y guardar el reporte de aging"""
+        aging_data = self._calculate_aging(invoices, bills, start_date)
+        
+        report_data = {
+            'report_type': 'aging',
+            'period': {'start': start_date, 'end': end_date},
+            'generated_at': datetime.now().isoformat(),
+            'data': aging_data
+        }
+        
+        self._save_report(report_data, 'aging')
+        return report_data
+    
+    def _build_cash_flow_report(self, income_data: Iterable[Dict], expense_data: Iterable[Dict],
+                                start_date: str, end_date: str) -> Dict:
+        """Calcular y guardar el reporte de flujo de caja"""
+        cash_flow = self._calculate_cash_flow(income_data, expense_data)
+        
+        report_data = {
+            'report_type': 'cash_flow',
+            'period': {'start': start_date, 'end': end_date},
+            'generated_at': datetime.now().isoformat(),
+            'data': cash_flow
+        }
+        
+        self._save_report(report_data, 'cash_flow')
+        return report_data
+    
+    def _calculate_aging(self, invoices: Iterable[Dict], bills: Iterable[Dict], start_date: str) -> Dict:
+        """Calcular aging de cuentas por cobrar y pagar"""
+        today = np.datetime64(datetime.now().date(), 'D')
+        
+        # Aging de cuentas por cobrar (invoices) y por pagar (bills)
+        receivables = self._bucket_open_documents(invoices, today)
+        payables = self._bucket_open_documents(bills, today)
         
         return {
             'receivables': receivables,
@@ -275,10 +541,54 @@ class AlegraReports:
             'net_position': receivables['total'] - payables['total']
         }
     
-    def _calculate_cash_flow(self, income_data: List[Dict], expense_data: List[Dict]) -> Dict:
-        """Calcular flujo de caja básico"""
-        total_income = sum(float(invoice.get('total', 0)) for invoice in income_data)
-        total_expenses = sum(float(bill.get('total', 0)) for bill in expense_data)
+    @staticmethod
+    def _bucket_open_documents(documents: Iterable[Dict], today: np.datetime64) -> Dict:
+        """
+        Agrupar documentos abiertos por días de vencimiento de forma vectorizada
+        
+        ``documents`` se recorre una sola vez (puede ser un generador) y solo se
+        retienen la fecha de vencimiento y el monto de los documentos abiertos.
+        Las fechas se convierten a ``datetime64[D]`` y los montos a float64, y
+        la suma por bucket la hace ``utils_numba.aging_sum`` (Numba si está
+        disponible, NumPy en caso contrario). Los documentos sin fecha (NaT) se
+        registran en el log y se excluyen del total y de los buckets.
+        """
+        raw_due_dates = []
+        raw_amounts = []
+        for doc in documents:
+            if doc.get('status') == 'open':
+                raw_due_dates.append(doc.get('dueDate') or doc.get('date'))
+                raw_amounts.append(float(doc.get('total', 0)))
+        
+        # Parser ISO-8601 de NumPy en C (sin strptime): acepta 'YYYY-MM-DD' y
+        # sufijos de hora, y convierte None/'' en NaT
+        due_dates = np.array(raw_due_dates, dtype='datetime64[D]')
+        amounts = np.array(raw_amounts, dtype=np.float64)
+        
+        # NaT - fecha da INT64_MIN días y caería en 'current': se descartan explícitamente
+        undated = np.isnat(due_dates)
+        if undated.any():
+            logger.warning("⚠️ %s documentos abiertos sin dueDate/date excluidos del aging (monto %.2f)",
+                           int(undated.sum()), float(amounts[undated].sum()))
+            due_dates = due_dates[~undated]
+            amounts = amounts[~undated]
+        
+        days_overdue = (today - due_dates).astype(np.int64)
+        sums = utils_numba.aging_sum(days_overdue, amounts)
+        
+        return {
+            'total': float(amounts.sum()),
+            'aging': {name: float(total) for name, total in zip(AGING_BUCKET_NAMES, sums)}
+        }
+    
+    def _calculate_cash_flow(self, income_data: Iterable[Dict], expense_data: Iterable[Dict]) -> Dict:
+        """Calcular flujo de caja básico a partir de facturas y bills cerradas (pagadas)"""
+        total_income, income_count = self._sum_totals(
+            doc for doc in income_data if doc.get('status') == 'closed'
+        )
+        total_expenses, expense_count = self._sum_totals(
+            doc for doc in expense_data if doc.get('status') == 'closed'
+        )
         
         net_cash_flow = total_income - total_expenses
         
@@ -286,117 +596,249 @@ class AlegraReports:
             'total_income': total_income,
             'total_expenses': total_expenses,
             'net_cash_flow': net_cash_flow,
-            'income_count': len(income_data),
-            'expense_count': len(expense_data)
+            'income_count': income_count,
+            'expense_count': expense_count
         }
     
+    @staticmethod
+    def _sum_totals(documents: Iterable[Dict]) -> Tuple[float, int]:
+        """
+        Sumar el campo total y contar documentos en una sola pasada
+        
+        ``np.fromiter`` llena el arreglo directamente desde el generador (sirve
+        también para iterables sin ``len``); la suma se hace en C y el conteo
+        es el tamaño del arreglo.
+        """
+        totals = np.fromiter(
+            (float(doc.get('total', 0)) for doc in documents),
+            dtype=np.float64
+        )
+        return float(totals.sum()), int(totals.size)
+    
     def _save_report(self, report_data: Dict, report_type: str) -> None:
         """Guardar reporte en archivo JSON"""
-        import os
-        from datetime import datetime
-        logger = logging.getLogger(__name__)
-        
         # Crear directorio de reportes si no existe
         reports_dir = 'reports'
-        os.makedirs(reports_dir, exist_ok=True)
+        self._ensure_reports_dir()
         
         # Nombre de archivo con timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{reports_dir}/{report_type}_{timestamp}.json"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, indent=2, ensure_ascii=False)
+            self._write_report_bytes(filename, report_data)
             
-            logger.info(f"📁 Reporte guardado: {filename}")
+            logger.info("📁 Reporte guardado: %s", filename)
             
             # También mostrar resumen en consola
             self._print_report_summary(report_data, report_type)
             
         except Exception as e:
-            logger.error(f"❌ Error guardando reporte: {e}")
+            logger.error("❌ Error guardando reporte: %s", e)
+    
+    @staticmethod
+    def _ensure_reports_dir() -> None:
+        """Crear el directorio de reportes solo la primera vez que se guarda un reporte"""
+        if not AlegraReports._reports_dir_ready:
+            os.makedirs('reports', exist_ok=True)
+            AlegraReports._reports_dir_ready = True
+    
+    @staticmethod
+    def _write_report_bytes(filename: str, report_data: Dict) -> None:
+        """
+        Serializar el reporte completo en memoria y escribirlo con un solo write
+        
+        Evita las múltiples escrituras pequeñas de un stream con buffer; el
+        bucle solo se repite si el kernel acepta una escritura parcial.
+        """
+        buf = memoryview(orjson.dumps(report_data, option=REPORT_JSON_OPTIONS, default=str))
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while buf:
+                written = os.write(fd, buf)
+                buf = buf[written:]
+        finally:
+            os.close(fd)
     
     def _print_report_summary(self, report_data: Dict, report_type: str) -> None:
         """Imprimir resumen del reporte en consola"""
-        print(f"\n📊 RESUMEN DEL REPORTE {report_type.upper()}")
-        print("=" * 50)
-        
-        if report_type == 'aging':
-            data = report_data['data']
-            print(f"💰 Cuentas por Cobrar: ${data['receivables']['total']:,.2f}")
-            print(f"💸 Cuentas por Pagar: ${data['payables']['total']:,.2f}")
-            print(f"📈 Posición Neta: ${data['net_position']:,.2f}")
-            
-        elif report_type == 'cash_flow':
-            data = report_data['data']
-            print(f"📈 Ingresos Totales: ${data['total_income']:,.2f}")
-            print(f"📉 Gastos Totales: ${data['total_expenses']:,.2f}")
-            print(f"💰 Flujo de Caja Neto: ${data['net_cash_flow']:,.2f}")
-            
-        print("=" * 50)
+        self._display_report_summary(report_data, report_type)
+    
+    @classmethod
+    def _write_report_parquet(cls, filename: str, report_data: Dict) -> bool:
+        """
+        Guardar los registros del reporte en Parquet y el resto en un JSON sidecar
+        
+        Los registros se leen luego con pq.read_table(..., memory_map=True) sin
+        parsear JSON. Devuelve False si no aplica (sin pyarrow, registros que
+        no son dicts o con tipos mezclados) para que se use el JSON completo.
+        """
+        if not PYARROW_AVAILABLE:
+            return False
+        
+        rows = report_data.get('data') if isinstance(report_data, dict) else None
+        if not rows or not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return False
+        
+        try:
+            table = pa.Table.from_pylist(rows)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return False
+        
+        parquet_filename = filename[:-len('.json')] + '.parquet'
+        pq.write_table(
+            table,
+            parquet_filename,
+            compression=REPORT_PARQUET_COMPRESSION,
+            compression_level=REPORT_PARQUET_COMPRESSION_LEVEL
+        )
+        
+        metadata = {key: value for key, value in report_data.items() if key != 'data'}
+        metadata['data_file'] = os.path.basename(parquet_filename)
+        metadata['rows'] = table.num_rows
+        cls._write_report_bytes(filename, metadata)
+        return True
     
     def _save_report_to_file(self, report_data: Dict, report_type: str, 
                            start_date: str, end_date: str) -> None:
-        """Guardar reporte en archivo JSON"""
-        logger = logging.getLogger(__name__)
+        """
+        Guardar reporte en archivo
         
+        Si los registros del reporte son una lista de dicts uniformes y pyarrow
+        está disponible, se guardan en Parquet (ZSTD) junto a un JSON pequeño
+        con los metadatos; si no, se guarda el reporte completo en JSON.
+        """
         # Crear directorio de reportes si no existe
-        os.makedirs('reports', exist_ok=True)
+        self._ensure_reports_dir()
         
         # Nombre del archivo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"reports/{report_type}_{start_date}_{end_date}_{timestamp}.json"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, indent=2, ensure_ascii=False, default=str)
+            if not self._write_report_parquet(filename, report_data):
+                self._write_report_bytes(filename, report_data)
             
-            logger.info(f"📁 Reporte guardado en: {filename}")
+            logger.info("📁 Reporte guardado en: %s", filename)
             
         except Exception as e:
-            logger.error(f"❌ Error guardando reporte: {e}")
+            logger.error("❌ Error guardando reporte: %s", e)
     
-    def _display_report_summary(self, report_data: Dict, report_type: str) -> None:
-        """Mostrar resumen del reporte en consola"""
-        logger = logging.getLogger(__name__)
-        
-        print(f"\n📊 RESUMEN DEL REPORTE {report_type.upper()}")
-        print("=" * 50)
+    @staticmethod
+    def _column_totals(entries: List[Dict], columns: Tuple[str, ...]) -> Dict[str, float]:
+        """
+        Sumar columnas numéricas de los registros de un reporte
         
-        if report_type == 'general-ledger':
-            if 'data' in report_data:
-                entries = report_data['data']
-                print(f"📋 Total de entradas: {len(entries)}")
-                
-                if entries:
-                    # Mostrar primeras 5 entradas
-                    print("\n🔍 Primeras 5 entradas:")
-                    for i, entry in enumerate(entries[:5]):
-                        print(f"  {i+1}. {entry.get('date', 'N/A')} - {entry.get('description', 'N/A')} - ${entry.get('debit', 0):,.2f} / ${entry.get('credit', 0):,.2f}")
-        
-        elif report_type == 'trial-balance':
-            if 'data' in report_data:
-                accounts = report_data['data']
-                print(f"📋 Total de cuentas: {len(accounts)}")
-                
-                if accounts:
-                    # Mostrar primeras 5 cuentas
-                    print("\n🔍 Primeras 5 cuentas:")
-                    for i, account in enumerate(accounts[:5]):
-                        print(f"  {i+1}. {account.get('name', 'N/A')} - Debe: ${account.get('debit', 0):,.2f} - Haber: ${account.get('credit', 0):,.2f}")
-        
-        elif report_type == 'journal':
-            if 'data' in report_data:
-                entries = report_data['data']
-                print(f"📋 Total de asientos: {len(entries)}")
-                
-                if entries:
-                    # Mostrar primeras 5 asientos
-                    print("\n🔍 Primeras 5 asientos:")
-                    for i, entry in enumerate(entries[:5]):
-                        print(f"  {i+1}. {entry.get('date', 'N/A')} - {entry.get('description', 'N/A')} - ${entry.get('total', 0):,.2f}")
+        Con pyarrow los registros se convierten una sola vez a una tabla
+        columnar float64 (solo con las columnas pedidas) y se suman en C++.
+        Sin pyarrow, o si alguna columna trae valores no numéricos, se suma
+        cada columna con np.fromiter.
+        """
+        if PYARROW_AVAILABLE:
+            try:
+                schema = pa.schema([(column, pa.float64()) for column in columns])
+                table = pa.Table.from_pylist(entries, schema=schema)
+                return {
+                    column: table[column].combine_chunks().sum().as_py() or 0.0
+                    for column in columns
+                }
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
         
-        print("=" * 50)
+        return {
+            column: float(np.fromiter(
+                (float(entry.get(column) or 0) for entry in entries),
+                dtype=np.float64
+            ).sum())
+            for column in columns
+        }
+    
+    def _display_report_summary(self, report_data: Dict, report_type: str) -> None:
+        """Mostrar resumen del reporte en consola con un solo print"""
+        formatter = self._summary_formatters.get(report_type, self._summarize_default)
+        lines = [f"\n📊 RESUMEN DEL REPORTE {report_type.upper()}", "=" * 50]
+        lines.extend(formatter(report_data))
+        lines.append("=" * 50)
+        print("\n".join(lines))
+    
+    @staticmethod
+    def _summarize_default(report_data: Dict) -> List[str]:
+        """Tipos de reporte sin resumen específico"""
+        return []
+    
+    @staticmethod
+    def _summarize_aging(report_data: Dict) -> List[str]:
+        """Resumen de cuentas por cobrar/pagar"""
+        data = report_data['data']
+        return [
+            f"💰 Cuentas por Cobrar: ${data['receivables']['total']:,.2f}",
+            f"💸 Cuentas por Pagar: ${data['payables']['total']:,.2f}",
+            f"📈 Posición Neta: ${data['net_position']:,.2f}",
+        ]
+    
+    @staticmethod
+    def _summarize_cash_flow(report_data: Dict) -> List[str]:
+        """Resumen de ingresos, gastos y flujo neto"""
+        data = report_data['data']
+        return [
+            f"📈 Ingresos Totales: ${data['total_income']:,.2f}",
+            f"📉 Gastos Totales: ${data['total_expenses']:,.2f}",
+            f"💰 Flujo de Caja Neto: ${data['net_cash_flow']:,.2f}",
+        ]
+    
+    def _summarize_ledger(self, report_data: Dict) -> List[str]:
+        """Resumen del libro mayor con las primeras 5 entradas"""
+        entries = report_data.get('data') if isinstance(report_data, dict) else None
+        if entries is None:
+            return []
+        
+        totals = self._column_totals(entries, ('debit', 'credit'))
+        lines = [
+            f"📋 Total de entradas: {len(entries)}",
+            f"💰 Total Debe: ${totals['debit']:,.2f} - Total Haber: ${totals['credit']:,.2f}",
+        ]
+        if entries:
+            lines.append("\n🔍 Primeras 5 entradas:")
+            for i, entry in enumerate(entries[:5], 1):
+                get = entry.get
+                lines.append(f"  {i}. {get('date', 'N/A')} - {get('description', 'N/A')} - ${get('debit', 0):,.2f} / ${get('credit', 0):,.2f}")
+        return lines
+    
+    def _summarize_trial_balance(self, report_data: Dict) -> List[str]:
+        """Resumen del balance de prueba con las primeras 5 cuentas"""
+        accounts = report_data.get('data') if isinstance(report_data, dict) else None
+        if accounts is None:
+            return []
+        
+        totals = self._column_totals(accounts, ('debit', 'credit'))
+        lines = [
+            f"📋 Total de cuentas: {len(accounts)}",
+            f"💰 Total Debe: ${totals['debit']:,.2f} - Total Haber: ${totals['credit']:,.2f}",
+        ]
+        if accounts:
+            lines.append("\n🔍 Primeras 5 cuentas:")
+            for i, account in enumerate(accounts[:5], 1):
+                get = account.get
+                lines.append(f"  {i}. {get('name', 'N/A')} - Debe: ${get('debit', 0):,.2f} - Haber: ${get('credit', 0):,.2f}")
+        return lines
+    
+    def _summarize_journal(self, report_data: Dict) -> List[str]:
+        """Resumen del libro diario con los primeros 5 asientos"""
+        entries = report_data.get('data') if isinstance(report_data, dict) else None
+        if entries is None:
+            return []
+        
+        totals = self._column_totals(entries, ('total',))
+        lines = [
+            f"📋 Total de asientos: {len(entries)}",
+            f"💰 Total: ${totals['total']:,.2f}",
+        ]
+        if entries:
+            lines.append("\n🔍 Primeras 5 asientos:")
+            for i, entry in enumerate(entries[:5], 1):
+                get = entry.get
+                lines.append(f"  {i}. {get('date', 'N/A')} - {get('description', 'N/A')} - ${get('total', 0):,.2f}")
+        return lines
 
 def main():
     """Función principal para ejecutar reportes desde línea de comandos"""
@@ -405,7 +847,7 @@ def main():
     parser = argparse.ArgumentParser(description='Generador de reportes contables')
     parser.add_argument('--start-date', required=True, help='Fecha de inicio (YYYY-MM-DD)')
     parser.add_argument('--end-date', required=True, help='Fecha de fin (YYYY-MM-DD)')
-    parser.add_argument('--report-type', choices=['general-ledger', 'trial-balance', 'journal', 'aging', 'cash-flow'], 
+    parser.add_argument('--report-type', choices=['general-ledger', 'trial-balance', 'journal', 'aging', 'cash-flow', 'all'], 
                        default='general-ledger', help='Tipo de reporte')
     parser.add_argument('--account-id', help='ID de cuenta específica (opcional)')
     
@@ -414,7 +856,10 @@ def main():
     try:
         reporter = AlegraReports()
         
-        if args.report_type in ['aging', 'cash-flow']:
+        if args.report_type == 'all':
+            reports = reporter.generate_all_reports(args.start_date, args.end_date)
+            result = all(reports.values())
+        elif args.report_type in ['aging', 'cash-flow']:
             if args.report_type == 'aging':
                 result = reporter.generate_aging_report(args.start_date, args.end_date)
             else:
@@ -3,23 +3,231 @@
 Sistema de caché para optimizar consultas a Alegra API
 """
 
-import redis
-import json
 import logging
 import os
+import threading
+import time
+import uuid
+import orjson
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from dotenv import load_dotenv
 
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 load_dotenv()
 
+# Opciones de serialización para valores en caché (arrays NumPy y claves no str)
+_DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _dumps(data: Any) -> bytes:
+    """Serializar un valor para Redis"""
+    return orjson.dumps(data, default=str, option=_DUMPS_OPTIONS)
+
+
+_loads = orjson.loads
+
+# Compresión zstd de valores grandes; las entradas comprimidas se reconocen
+# por el número mágico del frame zstd (las antiguas sin comprimir siguen válidas)
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_LEVEL = 3
+
+
+def _pack(blob: bytes) -> bytes:
+    """Comprimir con zstd un valor serializado si es lo bastante grande"""
+    if ZSTD_AVAILABLE and len(blob) >= COMPRESSION_MIN_SIZE:
+        return zstandard.compress(blob, COMPRESSION_LEVEL)
+    return blob
+
+
+def _unpack(raw: bytes) -> Any:
+    """Decodificar un valor leído de Redis, comprimido o no"""
+    if raw[:4] == ZSTD_MAGIC:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("valor comprimido con zstd pero zstandard no está instalado")
+        raw = zstandard.decompress(raw)
+    return _loads(raw)
+
+# Comandos acumulados en un pipeline antes de enviarlos a Redis
+PIPELINE_BATCH_SIZE = 500
+
+# Claves pedidas por iteración de SCAN
+SCAN_COUNT = 1000
+
+# Índice por tipo de dato (ZSET clave -> expiración) para contar claves sin KEYS
+INDEX_KEY_PREFIX = 'cache:index:'
+
+# Claves muestreadas para calcular el TTL promedio
+TTL_SAMPLE_SIZE = 100
+
+# Caché L1 en proceso delante de Redis (entradas y segundos de vida)
+L1_MAXSIZE = 2048
+L1_TTL = 60
+
+# Hits servidos desde L1 que se acumulan en proceso antes de sumarse al hash de métricas
+L1_METRICS_FLUSH_EVERY = 100
+
+# Lock de get_or_compute: vida del lock (s), pausa entre reintentos (s) y reintentos
+COMPUTE_LOCK_TTL = 5
+COMPUTE_WAIT_INTERVAL = 0.05
+COMPUTE_WAIT_RETRIES = 20
+
+# Hash con los contadores de métricas (un campo por métrica)
+METRICS_KEY = 'cache:metrics'
+
+# GET + HINCRBY de hits/misses en una sola llamada al servidor
+# KEYS: [clave, hash de métricas]
+GET_WITH_METRICS_LUA = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('HINCRBY', KEYS[2], 'hits', 1)
+else
+    redis.call('HINCRBY', KEYS[2], 'misses', 1)
+end
+return value
+"""
+
+# Lectura por nombre: la clave por nombre guarda solo el ID de la entidad.
+# Retorna {ID, valor} para que L1 guarde ambos por separado, o false.
+# KEYS: [clave por nombre, hash de métricas]
+# ARGV: [prefijo de la clave por ID]
+GET_BY_NAME_LUA = """
+local entity_id = redis.call('GET', KEYS[1])
+local value = false
+if entity_id then
+    value = redis.call('GET', ARGV[1] .. entity_id)
+end
+if value then
+    redis.call('HINCRBY', KEYS[2], 'hits', 1)
+    return {entity_id, value}
+end
+redis.call('HINCRBY', KEYS[2], 'misses', 1)
+return false
+"""
+
+# Invalidación atómica de una entidad: lee el registro por ID, borra las claves
+# por ID y por nombre, las saca del índice e incrementa la métrica.
+# KEYS: [clave por ID, índice del tipo, hash de métricas]
+# ARGV: [prefijo de la clave por nombre]
+# string.lower de Lua solo baja ASCII: si el nombre tiene bytes no ASCII se
+# retorna para que Python arme la clave por nombre con CacheManager._norm()
+# (para ASCII, casefold y lower coinciden). Si el valor está comprimido con
+# zstd se retorna completo para que Python lo descomprima y lea el nombre.
+INVALIDATE_ENTITY_LUA = """
+local value = redis.call('GET', KEYS[1])
+redis.call('UNLINK', KEYS[1])
+redis.call('ZREM', KEYS[2], KEYS[1])
+redis.call('HINCRBY', KEYS[3], 'invalidations', 1)
+if not value then
+    return false
+end
+if string.sub(value, 1, 4) == '\\40\\181\\47\\253' then
+    return value
+end
+local ok, entity = pcall(cjson.decode, value)
+if not ok or type(entity) ~= 'table' or type(entity.name) ~= 'string' or entity.name == '' then
+    return false
+end
+if string.find(entity.name, '[\\128-\\255]') then
+    return entity.name
+end
+local name_key = ARGV[1] .. string.lower(entity.name)
+redis.call('UNLINK', name_key)
+redis.call('ZREM', KEYS[2], name_key)
+return false
+"""
+
+# Get-or-lock para get_or_compute: retorna {1, valor} si hay dato en caché,
+# {0} si este llamador obtuvo el lock y debe calcular, {2} si otro lo tiene.
+# KEYS: [clave, lock, hash de métricas]
+# ARGV: [token del lock, TTL del lock]
+GET_OR_LOCK_LUA = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('HINCRBY', KEYS[3], 'hits', 1)
+    return {1, value}
+end
+if redis.call('SET', KEYS[2], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    redis.call('HINCRBY', KEYS[3], 'misses', 1)
+    return {0}
+end
+return {2}
+"""
+
+# Liberar el lock solo si sigue siendo de quien lo tomó
+# KEYS: [lock]  ARGV: [token del lock]
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class _L1Cache:
+    """
+    LRU con TTL en memoria del proceso, seguro entre hilos
+    
+    Guarda los bytes tal como vienen de Redis para que cada lectura entregue
+    un objeto nuevo y los llamadores no compartan dicts mutables. Las entidades
+    se guardan solo bajo su clave por ID; la clave por nombre guarda el ID, así
+    una escritura que saca el ID de L1 invalida también las lecturas por nombre.
+    Las escrituras de otros procesos no se propagan: una entrada puede quedar
+    desactualizada a lo sumo ``ttl`` segundos.
+    """
+    
+    def __init__(self, maxsize: int = L1_MAXSIZE, ttl: float = L1_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
 class CacheManager:
     """Gestor de caché para datos de Alegra con invalidación granular"""
     
     def __init__(self):
+        # redis se importa aquí para que importar este módulo no lo cargue
+        import redis
+        
         self.redis_client = redis.Redis.from_url(
             os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
-            decode_responses=True
+            decode_responses=False
         )
         self.cache_ttl = {
             'contacts': 3600,      # 1 hora
@@ -30,30 +238,50 @@ class CacheManager:
         }
         self.logger = logging.getLogger(__name__)
         
-        # Métricas de caché
+        # Lecturas repetidas de entidades calientes no van a Redis
+        self._l1 = _L1Cache()
+        
+        # Hits de L1 pendientes de sumar a METRICS_KEY (ver _count_l1_hit)
+        self._l1_hits = 0
+        self._l1_hits_lock = threading.Lock()
+        
+        # Métricas de caché (campos del hash METRICS_KEY)
         self.metrics_keys = {
-            'hits': 'cache:metrics:hits',
-            'misses': 'cache:metrics:misses',
-            'invalidations': 'cache:metrics:invalidations',
-            'errors': 'cache:metrics:errors'
+            'hits': 'hits',
+            'misses': 'misses',
+            'invalidations': 'invalidations',
+            'errors': 'errors'
         }
         
+        # Script Lua registrado una vez; redis-py usa EVALSHA y recarga si hace falta
+        self._get_with_metrics = self.redis_client.register_script(GET_WITH_METRICS_LUA)
+        self._get_by_name_script = self.redis_client.register_script(GET_BY_NAME_LUA)
+        self._invalidate_script = self.redis_client.register_script(INVALIDATE_ENTITY_LUA)
+        self._get_or_lock_script = self.redis_client.register_script(GET_OR_LOCK_LUA)
+        self._release_lock_script = self.redis_client.register_script(RELEASE_LOCK_LUA)
+        
         # Inicializar métricas si no existen
         self._initialize_metrics()
     
     def get_cached_data(self, data_type: str, key: str) -> Optional[Any]:
-        """Obtener datos del caché con métricas"""
+        """Obtener datos del caché con métricas (primero en L1, luego en Redis)"""
         try:
             cache_key = f"{data_type}:{key}"
-            cached_data = self.redis_client.get(cache_key)
+            cached_data = self._l1.get(cache_key)
+            if cached_data is not None:
+                self._count_l1_hit()
+                return _unpack(cached_data)
+            
+            cached_data = self._get_with_metrics(
+                keys=[cache_key, METRICS_KEY]
+            )
             
             if cached_data:
                 self.logger.debug(f"📦 Datos encontrados en caché: {cache_key}")
-                self._increment_metric('hits')
-                return json.loads(cached_data)
+                self._l1.set(cache_key, cached_data)
+                return _unpack(cached_data)
             else:
                 self.logger.debug(f"❌ Datos no encontrados en caché: {cache_key}")
-                self._increment_metric('misses')
                 return None
                 
         except Exception as e:
@@ -61,17 +289,83 @@ class CacheManager:
             self._increment_metric('errors')
             return None
     
+    def get_or_compute(self, data_type: str, key: str, loader: Callable[[], Any],
+                       ttl: int = None) -> Any:
+        """
+        Obtener datos del caché o calcularlos una sola vez entre workers
+        
+        Si la clave no está, solo el worker que toma el lock llama a ``loader``
+        y guarda el resultado; los demás esperan a que aparezca el valor. Si la
+        espera se agota o Redis falla, se llama a ``loader`` directamente.
+        """
+        cache_key = f"{data_type}:{key}"
+        cached_data = self._l1.get(cache_key)
+        if cached_data is not None:
+            self._count_l1_hit()
+            return _unpack(cached_data)
+        
+        lock_key = f"cache:lock:{cache_key}"
+        token = uuid.uuid4().hex
+        owns_lock = False
+        
+        try:
+            for _ in range(COMPUTE_WAIT_RETRIES + 1):
+                reply = self._get_or_lock_script(
+                    keys=[cache_key, lock_key, METRICS_KEY],
+                    args=[token, COMPUTE_LOCK_TTL]
+                )
+                
+                if reply[0] == 1:
+                    self._l1.set(cache_key, reply[1])
+                    return _unpack(reply[1])
+                
+                if reply[0] == 0:
+                    owns_lock = True
+                    break
+                
+                time.sleep(COMPUTE_WAIT_INTERVAL)
+            else:
+                self.logger.warning(f"⏳ Tiempo de espera agotado por {cache_key}, calculando sin lock")
+                
+        except Exception as e:
+            self.logger.error(f"❌ Error obteniendo datos del caché: {e}")
+            self._increment_metric('errors')
+        
+        if not owns_lock:
+            return loader()
+        
+        try:
+            data = loader()
+            if data is not None:
+                self.set_cached_data(data_type, key, data, ttl)
+            return data
+        finally:
+            try:
+                self._release_lock_script(keys=[lock_key], args=[token])
+            except Exception as e:
+                self.logger.error(f"❌ Error liberando lock {lock_key}: {e}")
+    
     def set_cached_data(self, data_type: str, key: str, data: Any, ttl: int = None) -> bool:
         """Guardar datos en caché"""
+        try:
+            blob = _dumps(data)
+        except Exception as e:
+            self.logger.error(f"❌ Error guardando datos en caché: {e}")
+            return False
+        
+        return self.set_cached_bytes(data_type, key, blob, ttl)
+    
+    def set_cached_bytes(self, data_type: str, key: str, blob: bytes, ttl: int = None) -> bool:
+        """Guardar en caché un valor ya serializado con _dumps (sin volver a codificar)"""
         try:
             cache_key = f"{data_type}:{key}"
             ttl = ttl or self.cache_ttl.get(data_type, 3600)
             
-            self.redis_client.setex(
-                cache_key,
-                ttl,
-                json.dumps(data, default=str)
-            )
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(cache_key, ttl, _pack(blob))
+            pipe.zadd(f"{INDEX_KEY_PREFIX}{data_type}", {cache_key: time.time() + ttl})
+            pipe.execute()
+            self._l1.pop(cache_key)
             
             self.logger.debug(f"💾 Datos guardados en caché: {cache_key} (TTL: {ttl}s)")
             return True
@@ -88,10 +382,11 @@ class CacheManager:
             else:
                 cache_pattern = f"{data_type}:*"
             
-            keys = self.redis_client.keys(cache_pattern)
-            if keys:
-                self.redis_client.delete(*keys)
-                self.logger.info(f"🗑️ Caché invalidado: {len(keys)} claves eliminadas")
+            deleted_count = self._delete_keys(
+                self.redis_client.scan_iter(match=cache_pattern, count=SCAN_COUNT)
+            )
+            if deleted_count:
+                self.logger.info(f"🗑️ Caché invalidado: {deleted_count} claves eliminadas")
             
             return True
             
@@ -99,9 +394,94 @@ class CacheManager:
             self.logger.error(f"❌ Error invalidando caché: {e}")
             return False
     
+    def _delete_keys(self, keys: Iterable[bytes]) -> int:
+        """
+        Eliminar claves en lotes de PIPELINE_BATCH_SIZE y sacarlas de su índice
+        
+        Se consume un iterador (p. ej. scan_iter) sin materializar todo el
+        keyspace; retorna el número de claves eliminadas.
+        """
+        deleted_count = 0
+        batch = []
+        
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= PIPELINE_BATCH_SIZE:
+                deleted_count += self._delete_batch(batch)
+                batch = []
+        
+        if batch:
+            deleted_count += self._delete_batch(batch)
+        
+        return deleted_count
+    
+    def _delete_batch(self, batch: List[bytes]) -> int:
+        """
+        Eliminar un lote de claves y sus entradas de índice en un solo round-trip
+        
+        Se usa UNLINK: Redis libera la memoria en un hilo de fondo y la
+        invalidación no bloquea el hilo principal con valores grandes.
+        """
+        self._l1.clear()
+        
+        by_type: Dict[bytes, List[bytes]] = {}
+        for key in batch:
+            by_type.setdefault(key.split(b':', 1)[0], []).append(key)
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*batch)
+        for data_type, type_keys in by_type.items():
+            pipe.zrem(INDEX_KEY_PREFIX.encode() + data_type, *type_keys)
+        
+        return pipe.execute()[0]
+    
+    @staticmethod
+    def _norm(name: str) -> str:
+        """Normalizar un nombre para las claves por nombre (casefold maneja tildes y ß)"""
+        return name.casefold()
+    
+    def get_by_normalized_name(self, data_type: str, norm_name: str) -> Optional[Dict]:
+        """
+        Resolver nombre -> ID -> entidad en una sola llamada al servidor
+        
+        ``norm_name`` debe venir ya normalizado con ``_norm`` (p. ej. calculado
+        una vez al ingresar la entidad) para no repetirlo en cada consulta.
+        """
+        try:
+            id_prefix = f"{data_type}:id:"
+            name_key = f"{data_type}:name:{norm_name}"
+            
+            # L1 resuelve nombre -> ID y luego lee la entidad bajo su clave por ID
+            entity_id = self._l1.get(name_key)
+            if entity_id is not None:
+                cached_data = self._l1.get(id_prefix + entity_id.decode('utf-8'))
+                if cached_data is not None:
+                    self._count_l1_hit()
+                    return _unpack(cached_data)
+            
+            reply = self._get_by_name_script(
+                keys=[
+                    name_key,
+                    METRICS_KEY,
+                ],
+                args=[id_prefix]
+            )
+            if not reply:
+                return None
+            
+            entity_id, cached_data = reply
+            self._l1.set(name_key, entity_id)
+            self._l1.set(id_prefix + entity_id.decode('utf-8'), cached_data)
+            return _unpack(cached_data)
+            
+        except Exception as e:
+            self.logger.error(f"❌ Error obteniendo datos del caché: {e}")
+            self._increment_metric('errors')
+            return None
+    
     def get_contact_by_name(self, name: str) -> Optional[Dict]:
-        """Obtener contacto por nombre desde caché"""
-        return self.get_cached_data('contacts', f"name:{name.lower()}")
+        """Obtener contacto por nombre desde caché (normaliza el nombre en cada llamada)"""
+        return self.get_by_normalized_name('contacts', self._norm(name))
     
     def get_contact_by_id(self, contact_id: str) -> Optional[Dict]:
         """Obtener contacto por ID desde caché"""
@@ -109,20 +489,15 @@ class CacheManager:
     
     def cache_contact(self, contact: Dict) -> bool:
         """Guardar contacto en caché"""
-        if not contact.get('id') or not contact.get('name'):
-            return False
-        
-        # Guardar por ID
-        self.set_cached_data('contacts', f"id:{contact['id']}", contact)
-        
-        # Guardar por nombre
-        self.set_cached_data('contacts', f"name:{contact['name'].lower()}", contact)
-        
-        return True
+        return self.cache_contacts_bulk([contact]) == 1
+    
+    def cache_contacts_bulk(self, contacts: List[Dict]) -> int:
+        """Guardar varios contacts en caché; retorna cuántos se guardaron"""
+        return self._cache_entities_bulk('contacts', contacts)
     
     def get_item_by_name(self, name: str) -> Optional[Dict]:
-        """Obtener item por nombre desde caché"""
-        return self.get_cached_data('items', f"name:{name.lower()}")
+        """Obtener item por nombre desde caché (normaliza el nombre en cada llamada)"""
+        return self.get_by_normalized_name('items', self._norm(name))
     
     def get_item_by_id(self, item_id: str) -> Optional[Dict]:
         """Obtener item por ID desde caché"""
@@ -130,20 +505,15 @@ class CacheManager:
     
     def cache_item(self, item: Dict) -> bool:
         """Guardar item en caché"""
-        if not item.get('id') or not item.get('name'):
-            return False
-        
-        # Guardar por ID
-        self.set_cached_data('items', f"id:{item['id']}", item)
-        
-        # Guardar por nombre
-        self.set_cached_data('items', f"name:{item['name'].lower()}", item)
-        
-        return True
+        return self.cache_items_bulk([item]) == 1
+    
+    def cache_items_bulk(self, items: List[Dict]) -> int:
+        """Guardar varios items en caché; retorna cuántos se guardaron"""
+        return self._cache_entities_bulk('items', items)
     
     def get_account_by_name(self, name: str) -> Optional[Dict]:
-        """Obtener cuenta por nombre desde caché"""
-        return self.get_cached_data('accounts', f"name:{name.lower()}")
+        """Obtener cuenta por nombre desde caché (normaliza el nombre en cada llamada)"""
+        return self.get_by_normalized_name('accounts', self._norm(name))
     
     def get_account_by_id(self, account_id: str) -> Optional[Dict]:
         """Obtener cuenta por ID desde caché"""
@@ -151,16 +521,66 @@ class CacheManager:
     
     def cache_account(self, account: Dict) -> bool:
         """Guardar cuenta en caché"""
-        if not account.get('id') or not account.get('name'):
-            return False
+        return self.cache_accounts_bulk([account]) == 1
+    
+    def cache_accounts_bulk(self, accounts: List[Dict]) -> int:
+        """Guardar varios accounts en caché; retorna cuántos se guardaron"""
+        return self._cache_entities_bulk('accounts', accounts)
+    
+    def _cache_entities_bulk(self, data_type: str, entities: List[Dict]) -> int:
+        """
+        Guardar entidades por ID y por nombre usando un pipeline sin transacción
+        
+        Cada entidad se serializa una sola vez (ver _store_dual). Los comandos
+        se envían en lotes de PIPELINE_BATCH_SIZE, así que N entidades cuestan
+        ~2N/PIPELINE_BATCH_SIZE round-trips en vez de 2N. Las entidades sin id
+        o nombre se omiten.
+        """
+        ttl = self.cache_ttl.get(data_type, 3600)
+        expires_at = time.time() + ttl
+        cached_count = 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            
+            for entity in entities:
+                if not entity.get('id') or not entity.get('name'):
+                    continue
+                
+                self._store_dual(pipe, data_type, entity['id'], entity['name'],
+                                 _dumps(entity), ttl, expires_at)
+                cached_count += 1
+                
+                if len(pipe) >= PIPELINE_BATCH_SIZE:
+                    pipe.execute()
+            
+            if len(pipe):
+                pipe.execute()
+            
+            self.logger.debug(f"💾 {cached_count} {data_type} guardados en caché (TTL: {ttl}s)")
+            return cached_count
+            
+        except Exception as e:
+            self.logger.error(f"❌ Error guardando {data_type} en caché: {e}")
+            return 0
+    
+    def _store_dual(self, pipe, data_type: str, entity_id: Any, name: str,
+                    blob: bytes, ttl: int, expires_at: float) -> None:
+        """
+        Encolar en el pipeline una entidad ya serializada
         
-        # Guardar por ID
-        self.set_cached_data('accounts', f"id:{account['id']}", account)
+        El JSON va una sola vez bajo la clave por ID; la clave por nombre es un
+        índice que solo contiene el ID.
+        """
+        id_key = f"{data_type}:id:{entity_id}"
+        name_key = f"{data_type}:name:{self._norm(name)}"
         
-        # Guardar por nombre
-        self.set_cached_data('accounts', f"name:{account['name'].lower()}", account)
+        pipe.setex(id_key, ttl, _pack(blob))
+        pipe.setex(name_key, ttl, str(entity_id))
+        pipe.zadd(f"{INDEX_KEY_PREFIX}{data_type}", {id_key: expires_at, name_key: expires_at})
         
-        return True
+        self._l1.pop(id_key)
+        self._l1.pop(name_key)
     
     def sync_alegra_data(self, data_type: str) -> Dict:
         """Sincronizar datos de Alegra con caché"""
@@ -175,9 +595,7 @@ class CacheManager:
                 clients = reporter.get_contacts('client') or []
                 providers = reporter.get_contacts('provider') or []
                 
-                for contact in clients + providers:
-                    if self.cache_contact(contact):
-                        synced_count += 1
+                synced_count = self.cache_contacts_bulk(clients + providers)
                 
                 self.logger.info(f"✅ Sincronizados {synced_count} contactos")
                 
@@ -191,9 +609,7 @@ class CacheManager:
                 # Sincronizar cuentas
                 accounts = reporter.get_accounts() or []
                 
-                for account in accounts:
-                    if self.cache_account(account):
-                        synced_count += 1
+                synced_count = self.cache_accounts_bulk(accounts)
                 
                 self.logger.info(f"✅ Sincronizadas {synced_count} cuentas")
             
@@ -208,17 +624,26 @@ class CacheManager:
             raise
     
     def get_cache_stats(self) -> Dict:
-        """Obtener estadísticas del caché (método legacy)"""
+        """
+        Obtener estadísticas del caché (método legacy)
+        
+        Los conteos salen de los índices por tipo: se purgan las entradas ya
+        expiradas y se lee ZCARD, todo en un solo pipeline.
+        """
         try:
-            stats = {}
+            now = time.time()
+            data_types = list(self.cache_ttl.keys())
             
-            for data_type in self.cache_ttl.keys():
-                pattern = f"{data_type}:*"
-                keys = self.redis_client.keys(pattern)
-                stats[data_type] = len(keys)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for data_type in data_types:
+                index_key = f"{INDEX_KEY_PREFIX}{data_type}"
+                pipe.zremrangebyscore(index_key, '-inf', now)
+                pipe.zcard(index_key)
+            counts = pipe.execute()[1::2]
             
-            stats['total_keys'] = sum(stats.values())
-            stats['memory_usage'] = self.redis_client.memory_usage()
+            stats = dict(zip(data_types, counts))
+            stats['total_keys'] = sum(counts)
+            stats['memory_usage'] = self.redis_client.info('memory').get('used_memory', 0)
             
             return stats
             
@@ -230,6 +655,7 @@ class CacheManager:
         """Limpiar todo el caché"""
         try:
             self.redis_client.flushdb()
+            self._l1.clear()
             self.logger.info("🗑️ Caché completamente limpiado")
             return True
             
@@ -238,38 +664,55 @@ class CacheManager:
             return False
     
     def _initialize_metrics(self):
-        """Inicializar métricas de caché"""
+        """
+        Inicializar métricas de caché
+        
+        Los contadores antiguos (una clave ``cache:metrics:<métrica>`` por
+        métrica) se migran una vez al hash y se eliminan.
+        """
         try:
-            for metric_key in self.metrics_keys.values():
-                if not self.redis_client.exists(metric_key):
-                    self.redis_client.set(metric_key, 0)
+            legacy_keys = [f"{METRICS_KEY}:{field}" for field in self.metrics_keys.values()]
+            legacy_values = self.redis_client.mget(legacy_keys)
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for field, legacy_key, value in zip(self.metrics_keys.values(), legacy_keys, legacy_values):
+                if value is not None:
+                    pipe.hincrby(METRICS_KEY, field, int(value))
+                    pipe.delete(legacy_key)
+                else:
+                    pipe.hsetnx(METRICS_KEY, field, 0)
+            pipe.execute()
         except Exception as e:
             self.logger.error(f"❌ Error inicializando métricas: {e}")
     
+    def _count_l1_hit(self) -> None:
+        """Contar un hit servido desde L1 y volcarlos a Redis cada L1_METRICS_FLUSH_EVERY"""
+        with self._l1_hits_lock:
+            self._l1_hits += 1
+            if self._l1_hits < L1_METRICS_FLUSH_EVERY:
+                return
+        self._flush_l1_hits()
+    
+    def _flush_l1_hits(self) -> None:
+        """Sumar a METRICS_KEY los hits de L1 acumulados en este proceso"""
+        with self._l1_hits_lock:
+            pending, self._l1_hits = self._l1_hits, 0
+        if pending:
+            self._increment_metric('hits', pending)
+    
     def _increment_metric(self, metric_name: str, value: int = 1):
         """Incrementar métrica de caché"""
         try:
-            metric_key = self.metrics_keys.get(metric_name)
-            if metric_key:
-                self.redis_client.incrby(metric_key, value)
+            field = self.metrics_keys.get(metric_name)
+            if field:
+                self.redis_client.hincrby(METRICS_KEY, field, value)
         except Exception as e:
             self.logger.error(f"❌ Error incrementando métrica {metric_name}: {e}")
     
     def invalidate_contact(self, contact_id: str) -> bool:
         """Invalidar caché de contacto específico"""
         try:
-            # Invalidar por ID
-            self.redis_client.delete(f"contacts:id:{contact_id}")
-            
-            # Obtener nombre del contacto para invalidar por nombre
-            contact_data = self.redis_client.get(f"contacts:id:{contact_id}")
-            if contact_data:
-                contact = json.loads(contact_data)
-                name = contact.get('name', '').lower()
-                if name:
-                    self.redis_client.delete(f"contacts:name:{name}")
-            
-            self._increment_metric('invalidations')
+            self._invalidate_entity('contacts', contact_id)
             self.logger.info(f"🗑️ Contacto invalidado: {contact_id}")
             return True
             
@@ -281,18 +724,7 @@ class CacheManager:
     def invalidate_item(self, item_id: str) -> bool:
         """Invalidar caché de item específico"""
         try:
-            # Invalidar por ID
-            self.redis_client.delete(f"items:id:{item_id}")
-            
-            # Obtener nombre del item para invalidar por nombre
-            item_data = self.redis_client.get(f"items:id:{item_id}")
-            if item_data:
-                item = json.loads(item_data)
-                name = item.get('name', '').lower()
-                if name:
-                    self.redis_client.delete(f"items:name:{name}")
-            
-            self._increment_metric('invalidations')
+            self._invalidate_entity('items', item_id)
             self.logger.info(f"🗑️ Item invalidado: {item_id}")
             return True
             
@@ -304,18 +736,7 @@ class CacheManager:
     def invalidate_account(self, account_id: str) -> bool:
         """Invalidar caché de cuenta específica"""
         try:
-            # Invalidar por ID
-            self.redis_client.delete(f"accounts:id:{account_id}")
-            
-            # Obtener nombre de la cuenta para invalidar por nombre
-            account_data = self.redis_client.get(f"accounts:id:{account_id}")
-            if account_data:
-                account = json.loads(account_data)
-                name = account.get('name', '').lower()
-                if name:
-                    self.redis_client.delete(f"accounts:name:{name}")
-            
-            self._increment_metric('invalidations')
+            self._invalidate_entity('accounts', account_id)
             self.logger.info(f"🗑️ Cuenta invalidada: {account_id}")
             return True
             
@@ -324,12 +745,40 @@ class CacheManager:
             self._increment_metric('errors')
             return False
     
+    def _invalidate_entity(self, data_type: str, entity_id: str) -> None:
+        """Borrar una entidad por ID y por nombre en una sola llamada al servidor"""
+        self._l1.clear()
+        
+        reply = self._invalidate_script(
+            keys=[
+                f"{data_type}:id:{entity_id}",
+                f"{INDEX_KEY_PREFIX}{data_type}",
+                METRICS_KEY,
+            ],
+            args=[f"{data_type}:name:"]
+        )
+        
+        if not reply:
+            return
+        
+        if reply[:4] == ZSTD_MAGIC:
+            # Valor comprimido: el nombre se lee en Python
+            entity = _unpack(reply)
+            name = entity.get('name') if isinstance(entity, dict) else None
+        else:
+            # Nombre con caracteres no ASCII: la clave se arma con _norm()
+            name = reply.decode()
+        
+        if name:
+            self._delete_batch([f"{data_type}:name:{self._norm(name)}".encode()])
+    
     def invalidate_by_pattern(self, pattern: str) -> int:
         """Invalidar caché por patrón"""
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                deleted_count = self.redis_client.delete(*keys)
+            deleted_count = self._delete_keys(
+                self.redis_client.scan_iter(match=pattern, count=SCAN_COUNT)
+            )
+            if deleted_count:
                 self._increment_metric('invalidations', deleted_count)
                 self.logger.info(f"🗑️ Invalidadas {deleted_count} claves con patrón: {pattern}")
                 return deleted_count
@@ -345,9 +794,13 @@ class CacheManager:
         try:
             metrics = {}
             
-            # Métricas básicas
-            for metric_name, metric_key in self.metrics_keys.items():
-                value = self.redis_client.get(metric_key)
+            # Incluir los hits de L1 de este proceso que aún no se volcaron
+            self._flush_l1_hits()
+            
+            # Métricas básicas (un solo HGETALL)
+            values = self.redis_client.hgetall(METRICS_KEY)
+            for metric_name, field in self.metrics_keys.items():
+                value = values.get(field.encode())
                 metrics[metric_name] = int(value) if value else 0
             
             # Calcular hit rate
@@ -361,31 +814,27 @@ class CacheManager:
                 metrics['hit_rate'] = 0.0
             
             # Estadísticas de claves
-            metrics['total_keys'] = len(self.redis_client.keys('*'))
+            metrics['total_keys'] = self.redis_client.dbsize()
             
             # Memoria utilizada
             try:
-                memory_info = self.redis_client.memory_usage()
+                memory_info = self.redis_client.info('memory').get('used_memory', 0)
                 metrics['memory_usage_bytes'] = memory_info
                 metrics['memory_usage_mb'] = round(memory_info / (1024 * 1024), 2)
             except:
                 metrics['memory_usage_bytes'] = 0
                 metrics['memory_usage_mb'] = 0
             
-            # TTL promedio
+            # TTL promedio (muestra acotada con SCAN y TTLs en un pipeline)
             try:
-                all_keys = self.redis_client.keys('*')
-                ttl_sum = 0
-                ttl_count = 0
-                
-                for key in all_keys[:100]:  # Muestrear primeras 100 claves
-                    ttl = self.redis_client.ttl(key)
-                    if ttl > 0:
-                        ttl_sum += ttl
-                        ttl_count += 1
+                sample = list(islice(self.redis_client.scan_iter(count=TTL_SAMPLE_SIZE), TTL_SAMPLE_SIZE))
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in sample:
+                    pipe.ttl(key)
+                ttls = [ttl for ttl in pipe.execute() if ttl and ttl > 0]
                 
-                if ttl_count > 0:
-                    metrics['avg_ttl_seconds'] = round(ttl_sum / ttl_count, 2)
+                if ttls:
+                    metrics['avg_ttl_seconds'] = round(sum(ttls) / len(ttls), 2)
                 else:
                     metrics['avg_ttl_seconds'] = 0
             except:
@@ -400,8 +849,9 @@ class CacheManager:
     def reset_metrics(self) -> bool:
         """Resetear métricas de caché"""
         try:
-            for metric_key in self.metrics_keys.values():
-                self.redis_client.set(metric_key, 0)
+            with self._l1_hits_lock:
+                self._l1_hits = 0
+            self.redis_client.hset(METRICS_KEY, mapping={field: 0 for field in self.metrics_keys.values()})
             
             self.logger.info("📊 Métricas de caché reseteadas")
             return True
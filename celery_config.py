@@ -1,70 +1,105 @@
 #!/usr/bin/env python3
 """
 Configuración de Celery para procesamiento asíncrono de facturas
+
+Celery y kombu se importan solo cuando se pide la app (workers, tasks o
+``celery -A celery_config``), no al importar este módulo.
 """
 
 import os
-from celery import Celery
-from kombu import Queue
-
-# Configuración de Celery
-app = Celery('invoicebot')
-
-# Configuración de broker (Redis)
-app.conf.broker_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-app.conf.result_backend = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-
-# Configuración de tareas
-app.conf.task_serializer = 'json'
-app.conf.accept_content = ['json']
-app.conf.result_serializer = 'json'
-app.conf.timezone = 'America/Bogota'
-app.conf.enable_utc = True
-
-# Configuración de colas
-app.conf.task_routes = {
-    'invoicebot.tasks.process_invoice': {'queue': 'invoice_processing'},
-    'invoicebot.tasks.generate_report': {'queue': 'report_generation'},
-    'invoicebot.tasks.validate_taxes': {'queue': 'tax_validation'},
-    'invoicebot.tasks.sync_alegra_data': {'queue': 'alegra_sync'},
-}
-
-# Configuración de colas personalizadas
-app.conf.task_default_queue = 'default'
-app.conf.task_queues = (
-    Queue('default', routing_key='default'),
-    Queue('invoice_processing', routing_key='invoice_processing'),
-    Queue('report_generation', routing_key='report_generation'),
-    Queue('tax_validation', routing_key='tax_validation'),
-    Queue('alegra_sync', routing_key='alegra_sync'),
-)
-
-# Configuración de concurrencia
-app.conf.worker_concurrency = int(os.getenv('CELERY_WORKER_CONCURRENCY', '4'))
-app.conf.worker_prefetch_multiplier = 1
-app.conf.task_acks_late = True
-app.conf.worker_disable_rate_limits = False
-
-# Configuración de retry
-app.conf.task_default_retry_delay = 60
-app.conf.task_max_retries = 3
-app.conf.task_retry_jitter = True
-
-# Configuración de monitoreo
-app.conf.worker_send_task_events = True
-app.conf.task_send_sent_event = True
 
-# Configuración de timeouts
-app.conf.task_soft_time_limit = 300  # 5 minutos
-app.conf.task_time_limit = 600  # 10 minutos
+_app = None
 
-# Configuración de rate limiting
-app.conf.task_annotations = {
-    'invoicebot.tasks.process_invoice': {'rate_limit': '10/m'},
-    'invoicebot.tasks.generate_report': {'rate_limit': '5/m'},
-    'invoicebot.tasks.validate_taxes': {'rate_limit': '20/m'},
-    'invoicebot.tasks.sync_alegra_data': {'rate_limit': '30/m'},
-}
+def get_app():
+    """Construir (una sola vez) y retornar la app de Celery"""
+    global _app
+    
+    if _app is None:
+        from celery import Celery
+        from kombu import Queue
+        
+        # Configuración de Celery
+        app = Celery('invoicebot')
+        conf = app.conf
+        
+        # Configuración de broker (Redis)
+        conf.broker_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        conf.result_backend = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        
+        # Conexiones al broker: keepalive, health check y pool acotado
+        # (redis-py usa el parser en C de hiredis automáticamente si está instalado)
+        conf.broker_pool_limit = int(os.getenv('CELERY_BROKER_POOL', '20'))
+        conf.broker_transport_options = {
+            'socket_keepalive': True,
+            'health_check_interval': 30,
+        }
+        
+        # Pool propio para el result backend
+        conf.redis_max_connections = int(os.getenv('CELERY_RESULT_POOL', '20'))
+        conf.redis_socket_keepalive = True
+        conf.redis_backend_health_check_interval = 30
+        
+        # Configuración de tareas
+        conf.task_serializer = 'json'
+        conf.accept_content = ['json']
+        conf.result_serializer = 'json'
+        conf.timezone = 'America/Bogota'
+        conf.enable_utc = True
+        
+        # Configuración de colas
+        conf.task_routes = {
+            'invoicebot.tasks.process_invoice': {'queue': 'invoice_processing'},
+            'invoicebot.tasks.generate_report': {'queue': 'report_generation'},
+            'invoicebot.tasks.validate_taxes': {'queue': 'tax_validation'},
+            'invoicebot.tasks.sync_alegra_data': {'queue': 'alegra_sync'},
+        }
+        
+        # Configuración de colas personalizadas
+        conf.task_default_queue = 'default'
+        conf.task_queues = (
+            Queue('default', routing_key='default'),
+            Queue('invoice_processing', routing_key='invoice_processing'),
+            Queue('report_generation', routing_key='report_generation'),
+            Queue('tax_validation', routing_key='tax_validation'),
+            Queue('alegra_sync', routing_key='alegra_sync'),
+        )
+        
+        # Configuración de concurrencia
+        conf.worker_concurrency = int(os.getenv('CELERY_WORKER_CONCURRENCY', '4'))
+        conf.worker_prefetch_multiplier = 1
+        conf.task_acks_late = True
+        conf.worker_disable_rate_limits = False
+        
+        # Configuración de retry
+        conf.task_default_retry_delay = 60
+        conf.task_max_retries = 3
+        conf.task_retry_jitter = True
+        
+        # Configuración de monitoreo
+        conf.worker_send_task_events = True
+        conf.task_send_sent_event = True
+        
+        # Configuración de timeouts
+        conf.task_soft_time_limit = 300  # 5 minutos
+        conf.task_time_limit = 600  # 10 minutos
+        
+        # Configuración de rate limiting
+        conf.task_annotations = {
+            'invoicebot.tasks.process_invoice': {'rate_limit': '10/m'},
+            'invoicebot.tasks.generate_report': {'rate_limit': '5/m'},
+            'invoicebot.tasks.validate_taxes': {'rate_limit': '20/m'},
+            'invoicebot.tasks.sync_alegra_data': {'rate_limit': '30/m'},
+        }
+        
+        # Auto-discovery de tareas
+        app.autodiscover_tasks(['invoicebot'])
+        
+        _app = app
+    
+    return _app
 
-# Auto-discovery de tareas
-app.autodiscover_tasks(['invoicebot'])
\ No newline at end of file
+def __getattr__(name):
+    """Exponer ``app`` de forma perezosa (``from celery_config import app``)"""
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
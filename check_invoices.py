@@ -5,43 +5,95 @@ Script para verificar las facturas creadas en Alegra
 
 import requests
 import base64
+import orjson
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-# Cargar variables de entorno
-load_dotenv()
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
 
-def check_invoices_in_alegra():
-    """Verificar facturas existentes en Alegra"""
-    print("🔍 Verificando facturas en Alegra...")
-    print("=" * 50)
-    
-    # Configurar autenticación
+ALEGRA_API_URL = 'https://api.alegra.com/api/v1'
+
+# Tamaño máximo de página que acepta la API de Alegra
+ALEGRA_PAGE_SIZE = 30
+
+def _auth_header():
+    """Construir el header Basic de Alegra a partir de las variables de entorno"""
     email = os.getenv('ALEGRA_USER')
     token = os.getenv('ALEGRA_TOKEN')
     
     credentials = f"{email}:{token}"
-    auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
-    
-    headers = {
-        'Authorization': auth_header,
+    return f"Basic {base64.b64encode(credentials.encode()).decode()}"
+
+def _build_session():
+    """Crear la sesión HTTP que reutiliza la conexión TLS con Alegra entre llamadas"""
+    session = requests.Session()
+    session.headers.update({
+        'Authorization': _auth_header(),
         'Content-Type': 'application/json'
-    }
+    })
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10))
+    return session
+
+_session = None
+
+def _get_session():
+    """Sesión HTTP compartida, creada en el primer uso (después de load_dotenv)"""
+    global _session
+    if _session is None:
+        _session = _build_session()
+    return _session
+
+def _iter_json_items(response):
+    """
+    Recorrer los elementos del arreglo JSON de una respuesta en streaming
+    
+    Con ijson se parsea factura por factura mientras llega el cuerpo; sin
+    ijson se carga la página completa con orjson.
+    """
+    if IJSON_AVAILABLE:
+        response.raw.decode_content = True
+        yield from ijson.items(response.raw, 'item', use_float=True)
+    else:
+        yield from orjson.loads(response.content)
+
+def check_invoices_in_alegra():
+    """Verificar facturas existentes en Alegra (paginado y en streaming)"""
+    print("🔍 Verificando facturas en Alegra...")
+    print("=" * 50)
     
     try:
-        response = requests.get('https://api.alegra.com/api/v1/invoices', headers=headers, timeout=10)
-        
-        print(f"📡 Status Code: {response.status_code}")
+        total = 0
+        start = 0
         
-        if response.status_code == 200:
-            invoices = response.json()
-            print(f"📄 Total de facturas encontradas: {len(invoices)}")
-            
-            if invoices:
-                print("\n📋 Lista de facturas:")
-                print("-" * 60)
-                for i, invoice in enumerate(invoices, 1):
-                    print(f"{i}. ID: {invoice.get('id')}")
+        while True:
+            with _get_session().get(
+                f"{ALEGRA_API_URL}/invoices",
+                params={'start': start, 'limit': ALEGRA_PAGE_SIZE},
+                stream=True,
+                timeout=30
+            ) as response:
+                if start == 0:
+                    print(f"📡 Status Code: {response.status_code}")
+                
+                if response.status_code != 200:
+                    print(f"❌ Error obteniendo facturas: {response.status_code}")
+                    print(f"📝 Respuesta: {response.text}")
+                    return
+                
+                page_count = 0
+                for invoice in _iter_json_items(response):
+                    if total == 0:
+                        print("\n📋 Lista de facturas:")
+                        print("-" * 60)
+                    total += 1
+                    page_count += 1
+                    print(f"{total}. ID: {invoice.get('id')}")
                     print(f"   📄 Número: {invoice.get('number', 'Sin número')}")
                     print(f"   📅 Fecha: {invoice.get('date')}")
                     print(f"   💰 Total: ${invoice.get('total', 0)}")
@@ -49,15 +101,19 @@ def check_invoices_in_alegra():
                     print(f"   📝 Observaciones: {invoice.get('observations', 'N/A')[:100]}...")
                     print(f"   📊 Estado: {invoice.get('status', 'N/A')}")
                     print("-" * 60)
-            else:
-                print("❌ No se encontraron facturas en Alegra")
-                print("💡 Esto puede significar que:")
-                print("   - Las facturas se crearon pero no se guardaron")
-                print("   - Hay un problema con la API")
-                print("   - Las facturas están en estado borrador")
-        else:
-            print(f"❌ Error obteniendo facturas: {response.status_code}")
-            print(f"📝 Respuesta: {response.text}")
+            
+            if page_count < ALEGRA_PAGE_SIZE:
+                break
+            start += ALEGRA_PAGE_SIZE
+        
+        print(f"📄 Total de facturas encontradas: {total}")
+        
+        if not total:
+            print("❌ No se encontraron facturas en Alegra")
+            print("💡 Esto puede significar que:")
+            print("   - Las facturas se crearon pero no se guardaron")
+            print("   - Hay un problema con la API")
+            print("   - Las facturas están en estado borrador")
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -67,23 +123,11 @@ def check_company_info():
     print("\n🏢 Información de la empresa:")
     print("=" * 40)
     
-    # Configurar autenticación
-    email = os.getenv('ALEGRA_USER')
-    token = os.getenv('ALEGRA_TOKEN')
-    
-    credentials = f"{email}:{token}"
-    auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
-    
-    headers = {
-        'Authorization': auth_header,
-        'Content-Type': 'application/json'
-    }
-    
     try:
-        response = requests.get('https://api.alegra.com/api/v1/company', headers=headers, timeout=10)
+        response = _get_session().get(f"{ALEGRA_API_URL}/company", timeout=10)
         
         if response.status_code == 200:
-            company = response.json()
+            company = orjson.loads(response.content)
             print(f"🏢 Empresa: {company.get('name')}")
             print(f"📧 Email: {company.get('email', 'N/A')}")
             print(f"🌍 País: {company.get('country', 'N/A')}")
@@ -99,31 +143,23 @@ def create_test_invoice():
     print("\n🧪 Creando factura de prueba...")
     print("=" * 40)
     
-    # Configurar autenticación
-    email = os.getenv('ALEGRA_USER')
-    token = os.getenv('ALEGRA_TOKEN')
-    
-    credentials = f"{email}:{token}"
-    auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
-    
-    headers = {
-        'Authorization': auth_header,
-        'Content-Type': 'application/json'
-    }
-    
-    # Obtener cliente
+    # Obtener clientes e items en paralelo (son consultas independientes)
     try:
-        client_response = requests.get('https://api.alegra.com/api/v1/contacts', headers=headers, timeout=10)
+        session = _get_session()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            client_future = executor.submit(session.get, f"{ALEGRA_API_URL}/contacts", timeout=10)
+            item_future = executor.submit(session.get, f"{ALEGRA_API_URL}/items", timeout=10)
+            client_response = client_future.result()
+            item_response = item_future.result()
+        
         if client_response.status_code == 200:
-            clients = client_response.json()
+            clients = orjson.loads(client_response.content)
             if clients:
                 client_id = clients[0].get('id')
                 client_name = clients[0].get('name')
                 
-                # Obtener item
-                item_response = requests.get('https://api.alegra.com/api/v1/items', headers=headers, timeout=10)
                 if item_response.status_code == 200:
-                    items = item_response.json()
+                    items = orjson.loads(item_response.content)
                     if items:
                         item_id = items[0].get('id')
                         item_name = items[0].get('name')
@@ -147,15 +183,14 @@ def create_test_invoice():
                         }
                         
                         print("📄 Creando factura de prueba...")
-                        invoice_response = requests.post('https://api.alegra.com/api/v1/invoices', 
-                                                       json=payload, 
-                                                       headers=headers, 
-                                                       timeout=10)
+                        invoice_response = _get_session().post(f"{ALEGRA_API_URL}/invoices", 
+                                                      json=payload, 
+                                                      timeout=10)
                         
                         print(f"   Status Code: {invoice_response.status_code}")
                         
                         if invoice_response.status_code == 201:
-                            invoice = invoice_response.json()
+                            invoice = orjson.loads(invoice_response.content)
                             print("   ✅ ¡Factura de prueba creada exitosamente!")
                             print(f"   🆔 ID: {invoice.get('id')}")
                             print(f"   📄 Número: {invoice.get('number')}")
@@ -164,9 +199,9 @@ def create_test_invoice():
                             
                             # Verificar que aparece en la lista
                             print("\n🔍 Verificando que la factura aparece en la lista...")
-                            check_response = requests.get('https://api.alegra.com/api/v1/invoices', headers=headers, timeout=10)
+                            check_response = _get_session().get(f"{ALEGRA_API_URL}/invoices", timeout=10)
                             if check_response.status_code == 200:
-                                all_invoices = check_response.json()
+                                all_invoices = orjson.loads(check_response.content)
                                 print(f"   📊 Total de facturas ahora: {len(all_invoices)}")
                                 
                                 # Buscar la factura recién creada
@@ -224,4 +259,6 @@ def main():
         print("❌ Revisa los logs para más detalles")
 
 if __name__ == "__main__":
+    # Cargar variables de entorno
+    load_dotenv()
     main()
\ No newline at end of file
@@ -1,29 +1,76 @@
 """
 Configuración para el procesador de facturas
+
+Los patrones de PDF_PATTERNS se compilan al importar el módulo; PDF_PATTERNS_RAW
+conserva las expresiones originales como texto y PDF_PATTERNS_UNION agrupa las
+alternativas de cada campo en una sola expresión (ver match_field).
 """
 
 import json
-import os
-from typing import Any, Dict
+import re
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, Tuple
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-def _load_settings() -> Dict[str, Any]:
-    settings_path = os.path.join(os.path.dirname(__file__), 'config', 'settings.json')
-    if not os.path.exists(settings_path):
-        return {}
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+
+# Directorio de archivos JSON de configuración, resuelto una sola vez
+_CFG_DIR = Path(__file__).resolve().parent / 'config'
+
+# JSON ya parseados por ruta: (mtime, tamaño, datos)
+_JSON_CACHE: Dict[Path, Tuple[float, int, Dict[str, Any]]] = {}
+
+
+def _load_json(path: Path) -> Dict[str, Any]:
+    """Cargar un JSON de configuración, reutilizando el resultado mientras el archivo no cambie"""
+    cached = _JSON_CACHE.get(path)
 
     try:
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (OSError, json.JSONDecodeError):
+        stat = path.stat()
+    except FileNotFoundError:
         return {}
+    except OSError:
+        # Si no se puede consultar el archivo se sirve la última versión conocida
+        return cached[2] if cached else {}
 
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
 
-SETTINGS = _load_settings()
+    try:
+        raw = path.read_bytes()
+        data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+    except (OSError, ValueError):
+        return cached[2] if cached else {}
 
+    _JSON_CACHE[path] = (stat.st_mtime, stat.st_size, data)
+    return data
 
-# Patrones de regex para extracción de datos de PDF
-PDF_PATTERNS = {
+
+def _load_settings() -> Dict[str, Any]:
+    return _load_json(_CFG_DIR / 'settings.json')
+
+
+
+# Patrones de regex para extracción de datos de PDF (texto original, serializable)
+PDF_PATTERNS_RAW = {
     'fecha': [
         r'Fecha[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
         r'Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
@@ -80,6 +127,256 @@ PDF_PATTERNS = {
     }
 }
 
+# Patrones compilados una sola vez al importar (re.IGNORECASE); 'items' conserva los marcadores
+PDF_PATTERNS = {
+    field: [re.compile(p, re.IGNORECASE) for p in patterns] if isinstance(patterns, list) else patterns
+    for field, patterns in PDF_PATTERNS_RAW.items()
+}
+
+# Una sola alternación por campo: el texto se recorre una vez en lugar de una por patrón.
+# La alternación devuelve la coincidencia más a la izquierda; match_field restaura la
+# prioridad de la lista (p. ej. "Fecha: ..." gana a una fecha suelta anterior)
+PDF_PATTERNS_UNION = {
+    field: re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+    for field, patterns in PDF_PATTERNS_RAW.items()
+    if isinstance(patterns, list)
+}
+
+
+def match_field(text: str, field: str) -> Optional[str]:
+    """
+    Extraer el valor de un campo con la misma prioridad que recorrer PDF_PATTERNS en orden
+
+    El patrón unificado encuentra en una pasada la coincidencia más a la izquierda. Solo
+    los patrones de mayor prioridad que la alternativa ganadora pueden desplazarla, y
+    ninguno coincide en esa posición o antes, así que se buscan únicamente después de ella.
+    """
+    match = PDF_PATTERNS_UNION[field].search(text)
+    if not match:
+        return None
+
+    # Cada alternativa tiene un único grupo: lastindex identifica el patrón que coincidió
+    winner = match.lastindex - 1
+    for pattern in PDF_PATTERNS[field][:winner]:
+        better = pattern.search(text, match.start() + 1)
+        if better:
+            return better.group(1)
+    return match.group(match.lastindex)
+
+
+# Palabras clave (en minúsculas) que anclan los patrones de cada campo; los campos
+# ausentes (p. ej. 'fecha', que acepta una fecha suelta) se evalúan siempre
+PDF_FIELD_KEYWORDS = {
+    'cliente': ['cliente', 'customer', 'facturar a', 'bill to', 'razón social', 'nombre'],
+    'total': ['total', 'amount'],
+    'iva': ['iva', 'impuesto', 'tax', '19%'],
+    'retenciones': ['retención', 'retenido', 'retention', 'rete'],
+    'nit_proveedor': ['nit', 'tax id', 'identificación'],
+    'numero_factura': ['factura', 'invoice', 'número', 'no']
+}
+
+
+def _build_keyword_automaton():
+    """Construir el autómata Aho-Corasick palabra clave -> campos"""
+    if not AHOCORASICK_AVAILABLE:
+        return None
+
+    fields_by_keyword: Dict[str, Set[str]] = {}
+    for field, keywords in PDF_FIELD_KEYWORDS.items():
+        for keyword in keywords:
+            fields_by_keyword.setdefault(keyword, set()).add(field)
+
+    automaton = ahocorasick.Automaton()
+    for keyword, fields in fields_by_keyword.items():
+        automaton.add_word(keyword, tuple(fields))
+    automaton.make_automaton()
+    return automaton
+
+
+PDF_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def candidate_fields(text: str) -> Set[str]:
+    """Campos cuyas palabras clave aparecen en el texto (una sola pasada)"""
+    lowered = text.lower()
+    fields = {field for field in PDF_PATTERNS_UNION if field not in PDF_FIELD_KEYWORDS}
+
+    if PDF_KEYWORD_AUTOMATON is not None:
+        for _, matched_fields in PDF_KEYWORD_AUTOMATON.iter(lowered):
+            fields.update(matched_fields)
+    else:
+        fields.update(
+            field for field, keywords in PDF_FIELD_KEYWORDS.items()
+            if any(keyword in lowered for keyword in keywords)
+        )
+
+    return fields
+
+
+@lru_cache(maxsize=None)
+def _hyperscan_database() -> Tuple[Any, Tuple[str, ...]]:
+    """Compilar (una vez, en el primer uso) todos los patrones de PDF en una base Hyperscan"""
+    fields = []
+    expressions = []
+    for field, patterns in PDF_PATTERNS_RAW.items():
+        if isinstance(patterns, list):
+            for pattern in patterns:
+                fields.append(field)
+                expressions.append(pattern.encode('utf-8'))
+
+    flags = (
+        hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8
+        | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+    )
+    database = hyperscan.Database()
+    database.compile(
+        expressions=expressions,
+        ids=list(range(len(expressions))),
+        elements=len(expressions),
+        flags=[flags] * len(expressions)
+    )
+    return database, tuple(fields)
+
+
+def matching_fields(text: str) -> Set[str]:
+    """Campos con algún patrón que coincide, evaluando todos los patrones en una sola pasada"""
+    if not HYPERSCAN_AVAILABLE:
+        return candidate_fields(text)
+
+    database, fields = _hyperscan_database()
+    found: Set[str] = set()
+
+    def on_match(pattern_id, start, end, flags, context):
+        found.add(fields[pattern_id])
+
+    database.scan(text.encode('utf-8'), match_event_handler=on_match)
+    return found
+
+
+def extract_fields(text: str, fields: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Extraer todos los campos (o solo `fields`), ejecutando regex solo para los campos candidatos"""
+    candidates = matching_fields(text)
+    if fields is not None:
+        candidates &= set(fields)
+    
+    datos = {}
+    for field in candidates:
+        value = match_field(text, field)
+        if value is not None:
+            datos[field] = value
+    return datos
+
+
+# Palabras clave (en minúsculas) que puntúan cada tipo de factura en la detección legacy
+INVOICE_TYPE_KEYWORDS = {
+    'compra': (
+        'proveedor', 'proveedores', 'compra', 'compras', 'factura de compra',
+        'bill', 'purchase', 'supplier', 'vendor', 'factura de proveedor',
+        'orden de compra', 'oc', 'pedido', 'receipt'
+    ),
+    'venta': (
+        'cliente', 'clientes', 'venta', 'ventas', 'factura de venta',
+        'invoice', 'sale', 'customer', 'factura de cliente',
+        'orden de venta', 'ov', 'cotización', 'quote'
+    )
+}
+
+
+def _build_invoice_type_automaton():
+    """Construir el autómata Aho-Corasick palabra clave -> (palabra clave, tipo)"""
+    if not AHOCORASICK_AVAILABLE:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for invoice_type, keywords in INVOICE_TYPE_KEYWORDS.items():
+        for keyword in keywords:
+            automaton.add_word(keyword, (keyword, invoice_type))
+    automaton.make_automaton()
+    return automaton
+
+
+INVOICE_TYPE_AUTOMATON = _build_invoice_type_automaton()
+
+
+def score_invoice_type(texto_lower: str) -> Tuple[int, int]:
+    """Puntajes (compra, venta): palabras clave distintas de cada tipo presentes en el texto"""
+    if INVOICE_TYPE_AUTOMATON is None:
+        return tuple(
+            sum(1 for keyword in INVOICE_TYPE_KEYWORDS[invoice_type] if keyword in texto_lower)
+            for invoice_type in ('compra', 'venta')
+        )
+
+    # Una sola pasada; cada palabra clave puntúa una vez aunque aparezca varias veces
+    found = {hit for _, hit in INVOICE_TYPE_AUTOMATON.iter(texto_lower)}
+    scores = {'compra': 0, 'venta': 0}
+    for _, invoice_type in found:
+        scores[invoice_type] += 1
+    return scores['compra'], scores['venta']
+
+
+# Etiquetas (una palabra, en minúsculas y sin ':') que anteceden a cada campo en la misma
+# línea, por prioridad, junto con el tipo de valor que se toma a su derecha
+PDF_FIELD_LABELS = {
+    'fecha': (('fecha', 'date'), 'date'),
+    'cliente': (('cliente', 'customer'), 'text'),
+    'total': (('total', 'amount', 'subtotal'), 'money'),
+    'iva': (('iva', 'impuesto', 'impuestos', 'tax'), 'money'),
+    'retenciones': (('retención', 'retenciones', 'retenido', 'retention', 'rete'), 'money'),
+    'nit_proveedor': (('nit', 'identificación'), 'id'),
+    'numero_factura': (('factura', 'invoice', 'número', 'no'), 'number')
+}
+
+# Forma de cada tipo de valor (una palabra completa); el grupo 1 es el valor extraído
+_LABEL_VALUE_RE = {
+    'date': re.compile(r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'),
+    'money': re.compile(r'\$?(\d[\d,]*\.?\d*)'),
+    'id': re.compile(r'(\d+-?\d*)'),
+    'number': re.compile(r'#?(\d+)')
+}
+
+
+def _label_value(rest: Sequence[str], kind: str) -> Optional[str]:
+    """Valor a la derecha de una etiqueta: resto de la línea, primera palabra válida o último monto"""
+    if kind == 'text':
+        return ' '.join(rest) or None
+
+    value_re = _LABEL_VALUE_RE[kind]
+    # Los montos van en la columna derecha: entre "Total 1 Unidad $213,511.00" gana el último
+    words = reversed(rest) if kind == 'money' else rest
+    for word in words:
+        match = value_re.fullmatch(word)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _first_labeled_value(lines: Sequence[Sequence[str]], positions: Dict[str, list],
+                         labels: Tuple[str, ...], kind: str) -> Optional[str]:
+    """Primer valor válido tras alguna etiqueta, respetando la prioridad de las etiquetas"""
+    for label in labels:
+        for line_no, word_no in positions.get(label, ()):
+            value = _label_value(lines[line_no][word_no + 1:], kind)
+            if value is not None:
+                return value
+    return None
+
+
+def extract_labeled_fields(lines: Sequence[Sequence[str]]) -> Dict[str, str]:
+    """Extraer campos por etiqueta a partir de las palabras de cada línea (ordenadas por x)"""
+    # Índice etiqueta -> posiciones (línea, palabra), construido en una sola pasada
+    positions: Dict[str, list] = {}
+    for line_no, words in enumerate(lines):
+        for word_no, word in enumerate(words):
+            positions.setdefault(word.lower().rstrip(':'), []).append((line_no, word_no))
+
+    datos = {}
+    for field, (labels, kind) in PDF_FIELD_LABELS.items():
+        value = _first_labeled_value(lines, positions, labels, kind)
+        if value is not None:
+            datos[field] = value
+    return datos
+
+
 # Configuración de XML namespaces
 XML_NAMESPACES = {
     'cfdi': 'http://www.sat.gob.mx/cfd/3',
@@ -88,16 +385,16 @@ XML_NAMESPACES = {
     'ubl': 'urn:oasis:names:specification:ubl:schema:xsd:Invoice-2'
 }
 
-# Configuración de Alegra
-ALEGRA_CONFIG = SETTINGS.get('alegra', {
+# Configuración de Alegra por defecto (solo lectura, compartida entre accesos)
+_ALEGRA_DEFAULT = MappingProxyType({
     'base_url': 'https://api.alegra.com/api/v1',
     'timeout': 30,
     'max_retries': 3,
     'default_due_days': 30
 })
 
-# Configuración de logging
-LOGGING_CONFIG = SETTINGS.get('logging', {
+# Configuración de logging por defecto
+_LOGGING_DEFAULT = MappingProxyType({
     'level': 'INFO',
     'format': '%(asctime)s - %(levelname)s - %(message)s',
     'file': 'invoice_processor.log',
@@ -105,15 +402,14 @@ LOGGING_CONFIG = SETTINGS.get('logging', {
     'backup_count': 5
 })
 
-# Configuración de monitoreo de carpetas
-FOLDER_MONITOR_CONFIG = SETTINGS.get('folder_monitor', {
+# Configuración de monitoreo de carpetas por defecto
+_FOLDER_MONITOR_DEFAULT = MappingProxyType({
     'recursive': False,
     'ignore_patterns': ['.tmp', '~', '.DS_Store', 'Thumbs.db'],
     'process_delay': 1  # segundos
 })
 
-
-NANOBOT_CONFIG = SETTINGS.get('nanobot', {
+_NANOBOT_DEFAULT = MappingProxyType({
     'enabled': False,
     'host': 'http://localhost:8080',
     'classifier_agent': 'invoice_classifier',
@@ -122,33 +418,46 @@ NANOBOT_CONFIG = SETTINGS.get('nanobot', {
     'triage_on_api_error': True
 })
 
+# Secciones de settings.json expuestas como atributos: nombre -> (sección, valor por defecto)
+_SETTINGS_SECTIONS = {
+    'ALEGRA_CONFIG': ('alegra', _ALEGRA_DEFAULT),
+    'LOGGING_CONFIG': ('logging', _LOGGING_DEFAULT),
+    'FOLDER_MONITOR_CONFIG': ('folder_monitor', _FOLDER_MONITOR_DEFAULT),
+    'NANOBOT_CONFIG': ('nanobot', _NANOBOT_DEFAULT)
+}
 
-def _load_accounting_config() -> Dict[str, Any]:
-    accounting_path = os.path.join(os.path.dirname(__file__), 'config', 'accounting_accounts.json')
-    if not os.path.exists(accounting_path):
-        return {}
-
-    try:
-        with open(accounting_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (OSError, json.JSONDecodeError):
-        return {}
 
+def _load_accounting_config() -> Dict[str, Any]:
+    return _load_json(_CFG_DIR / 'accounting_accounts.json')
 
-ACCOUNTING_CONFIG = _load_accounting_config()
 
 
 def _load_tax_rules() -> Dict[str, Any]:
     """Cargar reglas fiscales desde archivo JSON"""
-    tax_rules_path = os.path.join(os.path.dirname(__file__), 'config', 'tax_rules.json')
-    if not os.path.exists(tax_rules_path):
-        return {}
-    
-    try:
-        with open(tax_rules_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (OSError, json.JSONDecodeError):
-        return {}
+    return _load_json(_CFG_DIR / 'tax_rules.json')
+
+
+
+# Atributos cargados en el primer acceso (PEP 562) en lugar de al importar
+_LAZY_LOADERS = {
+    'SETTINGS': _load_settings,
+    'ACCOUNTING_CONFIG': _load_accounting_config,
+    'TAX_RULES': _load_tax_rules
+}
+
 
+def __getattr__(name: str) -> Any:
+    """Cargar la configuración bajo demanda y memorizarla en el módulo"""
+    if name in _LAZY_LOADERS:
+        value = _LAZY_LOADERS[name]()
+    elif name in _SETTINGS_SECTIONS:
+        section, default = _SETTINGS_SECTIONS[name]
+        settings = globals().get('SETTINGS')
+        if settings is None:
+            settings = __getattr__('SETTINGS')
+        value = settings.get(section, default)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-TAX_RULES = _load_tax_rules()
\ No newline at end of file
+    globals()[name] = value
+    return value
@@ -3,43 +3,59 @@
 Validador de configuración y seguridad para InvoiceBot
 """
 
+import mmap
 import os
 import re
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from dotenv import load_dotenv
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+# Hilos para ejecutar en paralelo las fases de validación (dominadas por E/S de disco)
+VALIDATION_WORKERS = 4
 
 class ConfigValidator:
     """Validador de configuración y seguridad"""
     
+    # Formato de email compilado una sola vez para toda la clase
+    _EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    
+    # Credenciales que nunca deben aparecer en el código fuente
+    _CREDENTIAL_MARKERS = (b'asanroj10@gmail.com', b'***REMOVED***')
+    
+    # Una sola alternación sobre bytes: una pasada por archivo sin importar cuántos marcadores haya
+    _CREDENTIAL_RE = re.compile(b'|'.join(re.escape(marker) for marker in _CREDENTIAL_MARKERS))
+    
     def __init__(self):
         load_dotenv()
         self.logger = logging.getLogger(__name__)
         self.errors = []
         self.warnings = []
+        self._lock = threading.Lock()
     
     def validate_all(self) -> Tuple[bool, List[str], List[str]]:
         """Validar toda la configuración"""
-        self.logger.info("🔍 Iniciando validación de configuración...")
+        self.logger.info("🔍 Validación: credenciales, directorios, archivos, permisos, logging, NIIF")
         
-        # Validar credenciales de Alegra
-        self._validate_alegra_credentials()
+        # Listar el directorio una sola vez en lugar de un stat por archivo
+        entries = self._scan_entries()
         
-        # Validar estructura de directorios
-        self._validate_directory_structure()
+        # La estructura de directorios va primero: la fase de logging escribe en logs/
+        self._validate_directory_structure(entries)
         
-        # Validar archivos de configuración
-        self._validate_config_files()
-        
-        # Validar permisos de archivos
-        self._validate_file_permissions()
-        
-        # Validar configuración de logging
-        self._validate_logging_config()
-        
-        # Validar cumplimiento NIIF
-        self._validate_niif_compliance()
+        # El resto de fases son independientes entre sí
+        phases = (
+            self._validate_alegra_credentials,
+            partial(self._validate_config_files, entries),
+            partial(self._validate_file_permissions, entries),
+            self._validate_logging_config,
+            self._validate_niif_compliance
+        )
+        with ThreadPoolExecutor(max_workers=VALIDATION_WORKERS) as executor:
+            list(executor.map(lambda phase: phase(), phases))
         
         success = len(self.errors) == 0
         
@@ -50,30 +66,49 @@ class ConfigValidator:
         
         return success, self.errors, self.warnings
     
+    def _add_error(self, message: str):
+        """Registrar un error (las fases corren en hilos distintos)"""
+        with self._lock:
+            self.errors.append(message)
+    
+    def _add_warning(self, message: str):
+        """Registrar una advertencia (las fases corren en hilos distintos)"""
+        with self._lock:
+            self.warnings.append(message)
+    
+    @staticmethod
+    def _scan_entries(path: str = '.') -> Dict[str, os.DirEntry]:
+        """Entradas del directorio indexadas por nombre"""
+        with os.scandir(path) as it:
+            return {entry.name: entry for entry in it}
+    
     def _validate_alegra_credentials(self):
         """Validar credenciales de Alegra"""
-        self.logger.info("🔐 Validando credenciales de Alegra...")
+        self.logger.debug("🔐 Validando credenciales de Alegra...")
         
         email = os.getenv('ALEGRA_USER')
         token = os.getenv('ALEGRA_TOKEN')
         
         if not email:
-            self.errors.append("ALEGRA_USER no está definido en .env")
+            self._add_error("ALEGRA_USER no está definido en .env")
         elif not self._is_valid_email(email):
-            self.errors.append("ALEGRA_USER no es un email válido")
+            self._add_error("ALEGRA_USER no es un email válido")
         
         if not token:
-            self.errors.append("ALEGRA_TOKEN no está definido en .env")
+            self._add_error("ALEGRA_TOKEN no está definido en .env")
         elif len(token) < 10:
-            self.warnings.append("ALEGRA_TOKEN parece ser muy corto")
+            self._add_warning("ALEGRA_TOKEN parece ser muy corto")
         
         # Verificar que las credenciales no estén en el código
         if self._check_credentials_in_code():
-            self.errors.append("Credenciales encontradas en el código fuente")
+            self._add_error("Credenciales encontradas en el código fuente")
     
-    def _validate_directory_structure(self):
+    def _validate_directory_structure(self, entries: Optional[Dict[str, os.DirEntry]] = None):
         """Validar estructura de directorios"""
-        self.logger.info("📁 Validando estructura de directorios...")
+        self.logger.debug("📁 Validando estructura de directorios...")
+        
+        if entries is None:
+            entries = self._scan_entries()
         
         required_dirs = [
             'logs',
@@ -83,16 +118,19 @@ class ConfigValidator:
         ]
         
         for directory in required_dirs:
-            if not os.path.exists(directory):
+            if directory not in entries:
                 try:
                     os.makedirs(directory, exist_ok=True)
                     self.logger.info(f"📁 Directorio creado: {directory}")
                 except Exception as e:
-                    self.errors.append(f"No se pudo crear directorio {directory}: {e}")
+                    self._add_error(f"No se pudo crear directorio {directory}: {e}")
     
-    def _validate_config_files(self):
+    def _validate_config_files(self, entries: Optional[Dict[str, os.DirEntry]] = None):
         """Validar archivos de configuración"""
-        self.logger.info("📄 Validando archivos de configuración...")
+        self.logger.debug("📄 Validando archivos de configuración...")
+        
+        if entries is None:
+            entries = self._scan_entries()
         
         required_files = [
             '.env',
@@ -102,30 +140,34 @@ class ConfigValidator:
         ]
         
         for file_path in required_files:
-            if not os.path.exists(file_path):
-                self.errors.append(f"Archivo requerido no encontrado: {file_path}")
+            if file_path not in entries:
+                self._add_error(f"Archivo requerido no encontrado: {file_path}")
     
-    def _validate_file_permissions(self):
+    def _validate_file_permissions(self, entries: Optional[Dict[str, os.DirEntry]] = None):
         """Validar permisos de archivos"""
-        self.logger.info("🔒 Validando permisos de archivos...")
+        self.logger.debug("🔒 Validando permisos de archivos...")
+        
+        if entries is None:
+            entries = self._scan_entries()
         
         sensitive_files = ['.env', 'logs/', 'reports/']
         
         for file_path in sensitive_files:
-            if os.path.exists(file_path):
+            entry = entries.get(file_path.rstrip('/'))
+            if entry is not None:
                 # Verificar que .env no sea legible por otros
                 if file_path == '.env':
-                    stat = os.stat(file_path)
+                    stat = entry.stat()
                     if stat.st_mode & 0o077:
-                        self.warnings.append(f"Archivo {file_path} tiene permisos demasiado abiertos")
+                        self._add_warning(f"Archivo {file_path} tiene permisos demasiado abiertos")
     
     def _validate_logging_config(self):
         """Validar configuración de logging"""
-        self.logger.info("📝 Validando configuración de logging...")
+        self.logger.debug("📝 Validando configuración de logging...")
         
         # Verificar que el directorio de logs existe
         if not os.path.exists('logs'):
-            self.errors.append("Directorio de logs no existe")
+            self._add_error("Directorio de logs no existe")
         
         # Verificar que se puede escribir en logs
         try:
@@ -134,11 +176,11 @@ class ConfigValidator:
                 f.write('test')
             os.remove(test_file)
         except Exception as e:
-            self.errors.append(f"No se puede escribir en directorio de logs: {e}")
+            self._add_error(f"No se puede escribir en directorio de logs: {e}")
     
     def _validate_niif_compliance(self):
         """Validar cumplimiento NIIF"""
-        self.logger.info("📊 Validando cumplimiento NIIF...")
+        self.logger.debug("📊 Validando cumplimiento NIIF...")
         
         # Verificar que se incluyen campos requeridos para NIIF
         required_fields = [
@@ -148,12 +190,11 @@ class ConfigValidator:
         ]
         
         # Esto es más una advertencia ya que se implementaría en el código
-        self.warnings.append("Verificar que los payloads incluyan campos NIIF requeridos")
+        self._add_warning("Verificar que los payloads incluyan campos NIIF requeridos")
     
     def _is_valid_email(self, email: str) -> bool:
         """Validar formato de email"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return self._EMAIL_RE.match(email) is not None
     
     def _check_credentials_in_code(self) -> bool:
         """Verificar si las credenciales están hardcodeadas en el código"""
@@ -166,12 +207,14 @@ class ConfigValidator:
         for file_path in code_files:
             if os.path.exists(file_path):
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
+                    # mmap no admite archivos vacíos
+                    if os.path.getsize(file_path) == 0:
+                        continue
                     
-                    # Buscar patrones de credenciales hardcodeadas
-                    if 'asanroj10@gmail.com' in content or '***REMOVED***' in content:
-                        return True
+                    # Buscar patrones de credenciales hardcodeadas sobre los bytes mapeados
+                    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if self._CREDENTIAL_RE.search(mm):
+                            return True
                 except Exception:
                     continue
         
@@ -179,22 +222,21 @@ class ConfigValidator:
     
     def generate_security_report(self) -> str:
         """Generar reporte de seguridad"""
-        report = f"""
+        parts = [f"""
 REPORTE DE SEGURIDAD - InvoiceBot
 ================================
 Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 ERRORES ({len(self.errors)}):
-"""
+"""]
         
-        for i, error in enumerate(self.errors, 1):
-            report += f"{i}. {error}\n"
+        # Secciones acumuladas en una lista y unidas una sola vez al final
+        parts.extend(f"{i}. {error}\n" for i, error in enumerate(self.errors, 1))
         
-        report += f"\nADVERTENCIAS ({len(self.warnings)}):\n"
-        for i, warning in enumerate(self.warnings, 1):
-            report += f"{i}. {warning}\n"
+        parts.append(f"\nADVERTENCIAS ({len(self.warnings)}):\n")
+        parts.extend(f"{i}. {warning}\n" for i, warning in enumerate(self.warnings, 1))
         
-        report += f"""
+        parts.append(f"""
 RECOMENDACIONES DE SEGURIDAD:
 1. Mantener .env fuera del control de versiones
 2. Usar permisos restrictivos en archivos sensibles
@@ -205,9 +247,9 @@ RECOMENDACIONES DE SEGURIDAD:
 7. Usar HTTPS para todas las comunicaciones
 
 ESTADO: {'✅ SEGURO' if len(self.errors) == 0 else '❌ REQUIERE ATENCIÓN'}
-"""
+""")
         
-        return report
+        return ''.join(parts)
 
 def main():
     """Función principal"""
@@ -6,9 +6,17 @@ Script de despliegue para InvoiceBot
 import os
 import sys
 import subprocess
-import shutil
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import List, Tuple
+
+# Hilos usados para escribir en paralelo los archivos generados
+DEPLOY_WRITE_WORKERS = 4
+
+# Permisos del script de despliegue generado
+DEPLOY_SCRIPT_MODE = 0o755
 
 def print_banner():
     """Mostrar banner de despliegue"""
@@ -111,8 +119,7 @@ backup/*.json
 backup/*.txt
 """
         
-        with open('.gitignore', 'w') as f:
-            f.write(gitignore_content)
+        Path('.gitignore').write_text(gitignore_content, encoding='utf-8')
         print("   ✅ .gitignore creado")
         
         return True
@@ -121,8 +128,8 @@ backup/*.txt
         print(f"   ❌ Error inicializando Git: {e}")
         return False
 
-def create_requirements_prod():
-    """Crear requirements.txt para producción"""
+def create_requirements_prod() -> List[Tuple[Path, str]]:
+    """Generar requirements.txt para producción"""
     print("📦 Creando requirements para producción...")
     
     prod_requirements = """# InvoiceBot - Production Requirements
@@ -144,17 +151,10 @@ gunicorn>=20.0.0
 sqlalchemy>=1.4.0
 """
     
-    try:
-        with open('requirements-prod.txt', 'w') as f:
-            f.write(prod_requirements)
-        print("   ✅ requirements-prod.txt creado")
-        return True
-    except Exception as e:
-        print(f"   ❌ Error creando requirements: {e}")
-        return False
+    return [(Path('requirements-prod.txt'), prod_requirements)]
 
-def create_docker_files():
-    """Crear archivos Docker"""
+def create_docker_files() -> List[Tuple[Path, str]]:
+    """Generar archivos Docker"""
     print("🐳 Creando archivos Docker...")
     
     # Dockerfile
@@ -187,13 +187,6 @@ ENV LOG_LEVEL=INFO
 CMD ["python", "invoice_watcher.py", "facturas"]
 """
     
-    try:
-        with open('Dockerfile', 'w') as f:
-            f.write(dockerfile_content)
-        print("   ✅ Dockerfile creado")
-    except Exception as e:
-        print(f"   ❌ Error creando Dockerfile: {e}")
-    
     # docker-compose.yml
     docker_compose_content = """version: '3.8'
 
@@ -218,15 +211,13 @@ services:
     restart: unless-stopped
 """
     
-    try:
-        with open('docker-compose.yml', 'w') as f:
-            f.write(docker_compose_content)
-        print("   ✅ docker-compose.yml creado")
-    except Exception as e:
-        print(f"   ❌ Error creando docker-compose.yml: {e}")
-
-def create_systemd_service():
-    """Crear servicio systemd"""
+    return [
+        (Path('Dockerfile'), dockerfile_content),
+        (Path('docker-compose.yml'), docker_compose_content),
+    ]
+
+def create_systemd_service() -> List[Tuple[Path, str]]:
+    """Generar servicio systemd"""
     print("🔧 Creando servicio systemd...")
     
     service_content = f"""[Unit]
@@ -246,47 +237,37 @@ Environment=PYTHONPATH={os.getcwd()}
 WantedBy=multi-user.target
 """
     
-    try:
-        with open('invoicebot.service', 'w') as f:
-            f.write(service_content)
-        print("   ✅ invoicebot.service creado")
-        print("   📝 Para instalar: sudo cp invoicebot.service /etc/systemd/system/")
-        print("   📝 Para habilitar: sudo systemctl enable invoicebot")
-        print("   📝 Para iniciar: sudo systemctl start invoicebot")
-        return True
-    except Exception as e:
-        print(f"   ❌ Error creando servicio: {e}")
-        return False
+    print("   📝 Para instalar: sudo cp invoicebot.service /etc/systemd/system/")
+    print("   📝 Para habilitar: sudo systemctl enable invoicebot")
+    print("   📝 Para iniciar: sudo systemctl start invoicebot")
+    return [(Path('invoicebot.service'), service_content)]
 
-def create_cron_jobs():
-    """Crear trabajos cron"""
+def create_cron_jobs() -> List[Tuple[Path, str]]:
+    """Generar trabajos cron"""
     print("⏰ Creando trabajos cron...")
     
-    cron_content = f"""# InvoiceBot - Trabajos programados
-# Editar con: crontab -e
-
-# Generar reportes diarios a las 6:00 AM
-0 6 * * * cd {os.getcwd()} && {sys.executable} invoice_processor_enhanced.py report --start-date $(date -d yesterday +\%Y-\%m-\%d) --end-date $(date -d yesterday +\%Y-\%m-\%d) >> logs/cron.log 2>&1
-
-# Limpiar logs antiguos (más de 30 días) semanalmente
-0 2 * * 0 find {os.getcwd()}/logs -name "*.log" -mtime +30 -delete
-
-# Backup de datos diario a las 11:00 PM
-0 23 * * * cd {os.getcwd()} && tar -czf backup/invoicebot_backup_$(date +\%Y\%m\%d).tar.gz facturas/processed/ reports/ logs/ --exclude="*.tmp"
-"""
+    cwd = os.getcwd()
+    python = sys.executable
+    # Cadena cruda: cron exige escapar '%' como '\%'
+    cron_content = textwrap.dedent(rf"""
+        # InvoiceBot - Trabajos programados
+        # Editar con: crontab -e
+
+        # Generar reportes diarios a las 6:00 AM
+        0 6 * * * cd {cwd} && {python} invoice_processor_enhanced.py report --start-date $(date -d yesterday +\%Y-\%m-\%d) --end-date $(date -d yesterday +\%Y-\%m-\%d) >> logs/cron.log 2>&1
+
+        # Limpiar logs antiguos (más de 30 días) semanalmente
+        0 2 * * 0 find {cwd}/logs -name "*.log" -mtime +30 -delete
+
+        # Backup de datos diario a las 11:00 PM
+        0 23 * * * cd {cwd} && tar -czf backup/invoicebot_backup_$(date +\%Y\%m\%d).tar.gz facturas/processed/ reports/ logs/ --exclude="*.tmp"
+    """).lstrip()
     
-    try:
-        with open('crontab.txt', 'w') as f:
-            f.write(cron_content)
-        print("   ✅ crontab.txt creado")
-        print("   📝 Para instalar: crontab crontab.txt")
-        return True
-    except Exception as e:
-        print(f"   ❌ Error creando crontab: {e}")
-        return False
+    print("   📝 Para instalar: crontab crontab.txt")
+    return [(Path('crontab.txt'), cron_content)]
 
-def create_deployment_script():
-    """Crear script de despliegue"""
+def create_deployment_script() -> List[Tuple[Path, str]]:
+    """Generar script de despliegue"""
     print("🚀 Creando script de despliegue...")
     
     deploy_script = """#!/bin/bash
@@ -327,19 +308,10 @@ echo "✅ Despliegue completado!"
 echo "🚀 Para iniciar: ./start_invoicebot.sh"
 """
     
-    try:
-        with open('deploy.sh', 'w') as f:
-            f.write(deploy_script)
-        
-        os.chmod('deploy.sh', 0o755)
-        print("   ✅ deploy.sh creado")
-        return True
-    except Exception as e:
-        print(f"   ❌ Error creando script de despliegue: {e}")
-        return False
+    return [(Path('deploy.sh'), deploy_script)]
 
-def create_documentation():
-    """Crear documentación adicional"""
+def create_documentation() -> List[Tuple[Path, str]]:
+    """Generar documentación adicional"""
     print("📚 Creando documentación...")
     
     # CHANGELOG.md
@@ -372,13 +344,6 @@ def create_documentation():
 - Verificación de configuración
 """
     
-    try:
-        with open('CHANGELOG.md', 'w') as f:
-            f.write(changelog_content)
-        print("   ✅ CHANGELOG.md creado")
-    except Exception as e:
-        print(f"   ❌ Error creando CHANGELOG: {e}")
-    
     # LICENSE
     license_content = """MIT License
 
@@ -403,12 +368,36 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
     
+    return [
+        (Path('CHANGELOG.md'), changelog_content),
+        (Path('LICENSE'), license_content),
+    ]
+
+def _write_file(entry: Tuple[Path, str]):
+    """Escribir un archivo generado; devuelve la excepción si falla"""
+    path, content = entry
     try:
-        with open('LICENSE', 'w') as f:
-            f.write(license_content)
-        print("   ✅ LICENSE creado")
-    except Exception as e:
-        print(f"   ❌ Error creando LICENSE: {e}")
+        path.write_text(content, encoding='utf-8')
+        if path.name == 'deploy.sh':
+            path.chmod(DEPLOY_SCRIPT_MODE)
+        return None
+    except OSError as e:
+        return e
+
+def write_generated_files(files: List[Tuple[Path, str]]) -> bool:
+    """Escribir en paralelo los archivos generados (son independientes entre sí)"""
+    print("💾 Escribiendo archivos generados...")
+    
+    with ThreadPoolExecutor(max_workers=DEPLOY_WRITE_WORKERS) as executor:
+        errors = list(executor.map(_write_file, files))
+    
+    for (path, _), error in zip(files, errors):
+        if error is None:
+            print(f"   ✅ {path} creado")
+        else:
+            print(f"   ❌ Error creando {path}: {error}")
+    
+    return not any(errors)
 
 def main():
     """Función principal de despliegue"""
@@ -423,13 +412,15 @@ def main():
     else:
         initialize_git()
     
-    # Crear archivos de producción
-    create_requirements_prod()
-    create_docker_files()
-    create_systemd_service()
-    create_cron_jobs()
-    create_deployment_script()
-    create_documentation()
+    # Generar archivos de producción y escribirlos en paralelo
+    files = []
+    files += create_requirements_prod()
+    files += create_docker_files()
+    files += create_systemd_service()
+    files += create_cron_jobs()
+    files += create_deployment_script()
+    files += create_documentation()
+    write_generated_files(files)
     
     print("\n✅ ¡Despliegue preparado!")
     print("=" * 50)
@@ -4,8 +4,18 @@ Debug del OCR para testfactura2.jpg
 """
 
 import os
+import re
+import traceback
 from invoice_processor_enhanced import InvoiceProcessor
 
+# Fechas, NITs y montos en una sola pasada; los patrones más específicos van primero.
+# Patrón de bytes: todo lo que busca es ASCII y el motor de bytes evita el ancho variable de str
+_DEBUG_RE = re.compile(
+    rb'(?P<date>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+    rb'|(?P<nit>\d{6,12}[-]?\d?)'
+    rb'|(?P<num>\$?[\d,]+\.?\d*)'
+)
+
 def debug_image_ocr():
     """Debug del OCR de la imagen"""
     print("🔍 DEBUG OCR - testfactura2.jpg")
@@ -34,35 +44,37 @@ def debug_image_ocr():
             # Intentar extraer datos manualmente
             print("\n🔍 ANÁLISIS MANUAL DEL TEXTO:")
             lines = result.split('\n')
-            for i, line in enumerate(lines):
-                if line.strip():
-                    print(f"Línea {i+1}: {line.strip()}")
+            print('\n'.join(
+                f"Línea {i+1}: {line.strip()}"
+                for i, line in enumerate(lines)
+                if line.strip()
+            ))
             
             # Buscar patrones específicos
             print("\n🔍 BÚSQUEDA DE PATRONES:")
             
-            # Buscar números que podrían ser montos
-            import re
-            numbers = re.findall(r'\$?[\d,]+\.?\d*', result)
-            if numbers:
-                print(f"💰 Números encontrados: {numbers}")
+            found = {'num': [], 'date': [], 'nit': []}
+            for match in _DEBUG_RE.finditer(result.encode('utf-8')):
+                # Las coincidencias son solo ASCII: decodificarlas no puede fallar
+                found[match.lastgroup].append(match.group().decode('ascii'))
+            
+            # Números que podrían ser montos
+            if found['num']:
+                print(f"💰 Números encontrados: {found['num']}")
             
-            # Buscar fechas
-            dates = re.findall(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', result)
-            if dates:
-                print(f"📅 Fechas encontradas: {dates}")
+            # Fechas
+            if found['date']:
+                print(f"📅 Fechas encontradas: {found['date']}")
             
-            # Buscar NITs
-            nits = re.findall(r'\d{6,12}[-]?\d?', result)
-            if nits:
-                print(f"🆔 NITs encontrados: {nits}")
+            # NITs
+            if found['nit']:
+                print(f"🆔 NITs encontrados: {found['nit']}")
             
         else:
             print("❌ No se pudo extraer texto de la imagen")
             
     except Exception as e:
         print(f"❌ Error: {e}")
-        import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
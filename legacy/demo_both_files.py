@@ -64,7 +64,7 @@ def extract_pdf_data(file_path):
         
         for tipo, patrones_lista in patterns.items():
             for patron in patrones_lista:
-                matches = re.findall(patron, text, re.IGNORECASE | re.MULTILINE)
+                matches = re.findall(patron, text)
                 if matches:
                     if tipo not in datos:
                         datos[tipo] = []
@@ -4,10 +4,33 @@ Demostración del Sistema de Impuestos Colombianos 2025
 Muestra diferentes escenarios de cálculo de impuestos
 """
 
-import json
 from datetime import datetime
+import orjson
 from tax_calculator import ColombianTaxCalculator, InvoiceData
 
+# Retenciones del payload de Alegra: (tipo, campo de TaxResult, descripción)
+_WHT_FIELDS = (
+    ("renta", "retefuente_renta", "Retención en la fuente por renta"),
+    ("iva", "retefuente_iva", "Retención en la fuente por IVA"),
+    ("ica", "retefuente_ica", "Retención en la fuente por ICA")
+)
+
+# Calculador compartido por todos los escenarios (no guarda estado por factura)
+_calculator = None
+
+
+def _get_calculator() -> ColombianTaxCalculator:
+    """Obtener el calculador compartido, cargando la configuración fiscal una sola vez"""
+    global _calculator
+    if _calculator is None:
+        _calculator = ColombianTaxCalculator()
+    return _calculator
+
+
+def _print_explanation(points):
+    """Imprimir la explicación de un escenario en una sola escritura"""
+    print("\n📋 EXPLICACIÓN:\n" + "\n".join(f"• {point}" for point in points))
+
 def demo_scenario_1():
     """Escenario 1: Factura de Royal Canin (sin retenciones)"""
     print("🐱 ESCENARIO 1: ALIMENTO PARA MASCOTAS")
@@ -15,7 +38,7 @@ def demo_scenario_1():
     print("Factura: Royal Canin - Sin retenciones aplicables")
     print()
     
-    calculator = ColombianTaxCalculator()
+    calculator = _get_calculator()
     
     invoice_data = InvoiceData(
         base_amount=203343.81,
@@ -38,11 +61,12 @@ def demo_scenario_1():
     print(calculator.get_tax_summary(tax_result))
     
     # Explicación
-    print("\n📋 EXPLICACIÓN:")
-    print("• IVA 5%: Alimento para mascotas tiene tasa reducida")
-    print("• Sin ReteFuente Renta: Monto < 27 UVT para compras de bienes")
-    print("• Sin ReteFuente IVA: Monto < 10 UVT")
-    print("• Sin ReteFuente ICA: Misma ciudad (Bogotá-Bogotá)")
+    _print_explanation([
+        "IVA 5%: Alimento para mascotas tiene tasa reducida",
+        "Sin ReteFuente Renta: Monto < 27 UVT para compras de bienes",
+        "Sin ReteFuente IVA: Monto < 10 UVT",
+        "Sin ReteFuente ICA: Misma ciudad (Bogotá-Bogotá)"
+    ])
 
 def demo_scenario_2():
     """Escenario 2: Honorarios profesionales (con retenciones)"""
@@ -51,7 +75,7 @@ def demo_scenario_2():
     print("Factura: Consultoría - Con ReteFuente Renta")
     print()
     
-    calculator = ColombianTaxCalculator()
+    calculator = _get_calculator()
     
     invoice_data = InvoiceData(
         base_amount=3000000,  # > 27 UVT
@@ -74,11 +98,12 @@ def demo_scenario_2():
     print(calculator.get_tax_summary(tax_result))
     
     # Explicación
-    print("\n📋 EXPLICACIÓN:")
-    print("• IVA 19%: Servicios profesionales")
-    print("• ReteFuente Renta 11%: Honorarios > 27 UVT")
-    print("• ReteFuente IVA 15%: Monto > 10 UVT")
-    print("• ReteFuente ICA 0.35%: Diferente ciudad (Bogotá-Medellín)")
+    _print_explanation([
+        "IVA 19%: Servicios profesionales",
+        "ReteFuente Renta 11%: Honorarios > 27 UVT",
+        "ReteFuente IVA 15%: Monto > 10 UVT",
+        "ReteFuente ICA 0.35%: Diferente ciudad (Bogotá-Medellín)"
+    ])
 
 def demo_scenario_3():
     """Escenario 3: Compra de equipos (todas las retenciones)"""
@@ -87,7 +112,7 @@ def demo_scenario_3():
     print("Factura: Equipos de cómputo - Todas las retenciones")
     print()
     
-    calculator = ColombianTaxCalculator()
+    calculator = _get_calculator()
     
     invoice_data = InvoiceData(
         base_amount=10000000,  # Monto alto
@@ -110,11 +135,12 @@ def demo_scenario_3():
     print(calculator.get_tax_summary(tax_result))
     
     # Explicación
-    print("\n📋 EXPLICACIÓN:")
-    print("• IVA 19%: Electrónicos")
-    print("• ReteFuente Renta 2.5%: Compra de bienes, vendedor declarante")
-    print("• ReteFuente IVA 15%: Monto > 10 UVT")
-    print("• ReteFuente ICA 0.32%: Diferente ciudad (Cali-Barranquilla)")
+    _print_explanation([
+        "IVA 19%: Electrónicos",
+        "ReteFuente Renta 2.5%: Compra de bienes, vendedor declarante",
+        "ReteFuente IVA 15%: Monto > 10 UVT",
+        "ReteFuente ICA 0.32%: Diferente ciudad (Cali-Barranquilla)"
+    ])
 
 def demo_scenario_4():
     """Escenario 4: Régimen simplificado (sin retenciones)"""
@@ -123,7 +149,7 @@ def demo_scenario_4():
     print("Factura: Tienda simplificada - Sin IVA ni retenciones")
     print()
     
-    calculator = ColombianTaxCalculator()
+    calculator = _get_calculator()
     
     invoice_data = InvoiceData(
         base_amount=500000,
@@ -146,10 +172,11 @@ def demo_scenario_4():
     print(calculator.get_tax_summary(tax_result))
     
     # Explicación
-    print("\n📋 EXPLICACIÓN:")
-    print("• Sin IVA: Régimen simplificado no cobra IVA")
-    print("• Sin retenciones: Régimen simplificado exento")
-    print("• Monto neto = Monto total")
+    _print_explanation([
+        "Sin IVA: Régimen simplificado no cobra IVA",
+        "Sin retenciones: Régimen simplificado exento",
+        "Monto neto = Monto total"
+    ])
 
 def demo_comparison():
     """Comparación de escenarios"""
@@ -163,18 +190,22 @@ def demo_comparison():
         ("Simplificado", 500000, 0, 0, 0, 0)
     ]
     
-    print(f"{'Escenario':<15} {'Base':<12} {'IVA':<10} {'ReteRenta':<12} {'ReteIVA':<10} {'ReteICA':<10}")
-    print("-" * 80)
-    
-    for name, base, iva, rete_renta, rete_iva, rete_ica in scenarios:
-        print(f"{name:<15} ${base:>10,.0f} ${iva:>8,.0f} ${rete_renta:>10,.0f} ${rete_iva:>8,.0f} ${rete_ica:>8,.0f}")
+    lines = [
+        f"{'Escenario':<15} {'Base':<12} {'IVA':<10} {'ReteRenta':<12} {'ReteIVA':<10} {'ReteICA':<10}",
+        "-" * 80
+    ]
+    lines.extend(
+        f"{name:<15} ${base:>10,.0f} ${iva:>8,.0f} ${rete_renta:>10,.0f} ${rete_iva:>8,.0f} ${rete_ica:>8,.0f}"
+        for name, base, iva, rete_renta, rete_iva, rete_ica in scenarios
+    )
+    print("\n".join(lines))
 
 def demo_alegra_integration():
     """Demostración de integración con Alegra"""
     print("\n🏢 INTEGRACIÓN CON ALEGRA")
     print("=" * 60)
     
-    calculator = ColombianTaxCalculator()
+    calculator = _get_calculator()
     
     # Usar escenario de honorarios
     invoice_data = InvoiceData(
@@ -220,33 +251,16 @@ def demo_alegra_integration():
                 "description": "IVA"
             }
         ],
-        "withholdings": []
+        # Solo las retenciones con monto
+        "withholdings": [
+            {"type": wht_type, "amount": amount, "description": description}
+            for wht_type, field, description in _WHT_FIELDS
+            if (amount := getattr(tax_result, field)) > 0
+        ]
     }
     
-    # Agregar retenciones
-    if tax_result.retefuente_renta > 0:
-        alegra_payload["withholdings"].append({
-            "type": "renta",
-            "amount": tax_result.retefuente_renta,
-            "description": "Retención en la fuente por renta"
-        })
-    
-    if tax_result.retefuente_iva > 0:
-        alegra_payload["withholdings"].append({
-            "type": "iva",
-            "amount": tax_result.retefuente_iva,
-            "description": "Retención en la fuente por IVA"
-        })
-    
-    if tax_result.retefuente_ica > 0:
-        alegra_payload["withholdings"].append({
-            "type": "ica",
-            "amount": tax_result.retefuente_ica,
-            "description": "Retención en la fuente por ICA"
-        })
-    
     print("📤 Payload para Alegra API:")
-    print(json.dumps(alegra_payload, indent=2, ensure_ascii=False))
+    print(orjson.dumps(alegra_payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
 
 def main():
     """Función principal de demostración"""
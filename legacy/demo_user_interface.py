@@ -4,17 +4,51 @@ Demostración de la interfaz de usuario del sistema de facturas
 Muestra exactamente lo que vería el usuario durante el procesamiento
 """
 
+import asyncio
 import os
 import sys
 import json
-import pdfplumber
-import re
-from datetime import datetime
-from config import PDF_PATTERNS
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from config import PDF_PATTERNS_UNION, extract_fields, extract_labeled_fields
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Hilos para extraer el texto de las páginas de un PDF
+PDF_PAGE_WORKERS = os.cpu_count() or 1
+
+# Por debajo de este número de páginas no compensa abrir el PDF en varios hilos
+PDF_PARALLEL_MIN_PAGES = 4
+
+# Distancia vertical máxima (pt) entre palabras de una misma línea, como en extract_text
+PDF_LINE_TOLERANCE = 3
+
+# PDFs distintos cuyas líneas extraídas se conservan en memoria
+PDF_TEXT_CACHE_SIZE = 256
+
+# Tabla para quitar separadores de miles en una sola pasada ("1,234.50" -> "1234.50")
+_MONEY_TRANS = str.maketrans('', '', ',')
+
+# Subtipo de XObject que puede dibujar texto fuera del contenido principal de la página
+_FORM_XOBJECT_NAME = 'Form'
+
+# Partes fijas del payload de Alegra: solo se completan fecha, cliente y montos
+_PAYLOAD_DUE_DATE = '2024-02-15'
+_PAYLOAD_ITEM_TEMPLATE = MappingProxyType({'description': 'Producto/Servicio procesado', 'quantity': 1})
+
+# Secuencia ANSI: cursor al inicio, borrar pantalla y scrollback
+_CLEAR_SCREEN = "\x1b[H\x1b[2J\x1b[3J"
 
 def clear_screen():
     """Limpiar pantalla"""
-    os.system('clear' if os.name == 'posix' else 'cls')
+    sys.stdout.write(_CLEAR_SCREEN)
+    sys.stdout.flush()
 
 def print_header(title):
     """Imprimir encabezado"""
@@ -28,20 +62,24 @@ def print_section(title):
 
 def print_data_table(data):
     """Imprimir tabla de datos"""
-    print("┌" + "─" * 58 + "┐")
-    for key, value in data.items():
-        if value and value != 'N/A':
-            print(f"│ {key:15} │ {str(value):38} │")
-    print("└" + "─" * 58 + "┘")
+    lines = ["┌" + "─" * 58 + "┐"]
+    lines.extend(
+        f"│ {key:15} │ {str(value):38} │"
+        for key, value in data.items()
+        if value and value != 'N/A'
+    )
+    lines.append("└" + "─" * 58 + "┘")
+    print("\n".join(lines))
 
 def print_validation_results(validations):
     """Imprimir resultados de validación"""
-    print("┌" + "─" * 58 + "┐")
+    lines = ["┌" + "─" * 58 + "┐"]
     for validation, result in validations.items():
         status = "✅" if result['valid'] else "❌"
         message = result['message'][:35] + "..." if len(result['message']) > 35 else result['message']
-        print(f"│ {status} {validation.replace('_', ' ').title():15} │ {message:38} │")
-    print("└" + "─" * 58 + "┘")
+        lines.append(f"│ {status} {validation.replace('_', ' ').title():15} │ {message:38} │")
+    lines.append("└" + "─" * 58 + "┘")
+    print("\n".join(lines))
 
 def print_menu(options):
     """Imprimir menú de opciones"""
@@ -55,40 +93,170 @@ def simulate_user_input(prompt, default="s"):
     print(f"\n{prompt}")
     return default
 
+def _may_contain_text(page):
+    """Detectar páginas escaneadas sin interpretarlas: sin operadores BT ni XObjects de formulario"""
+    from pdfminer.pdftypes import resolve1
+    from pdfminer.psparser import LIT
+    
+    try:
+        page_obj = page.page_obj
+        resources = resolve1(page_obj.resources) or {}
+        for xobject in (resolve1(resources.get('XObject')) or {}).values():
+            if resolve1(xobject).get('Subtype') is LIT(_FORM_XOBJECT_NAME):
+                return True
+        return any(b'BT' in resolve1(stream).get_data() for stream in page_obj.contents)
+    except Exception:
+        # Ante una estructura inesperada se extrae el texto normalmente
+        return True
+
+@lru_cache(maxsize=PDF_TEXT_CACHE_SIZE)
+def _font_cache(file_path, mtime_ns, size):
+    """Fuentes de pdfminer ya construidas (por objid) para una versión concreta del archivo"""
+    return {}
+
+def _holds_pdf_refs(value):
+    """Indicar si un valor (o lo que contiene) aún apunta a objetos del documento"""
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+    
+    if isinstance(value, (PDFObjRef, PDFStream)):
+        return True
+    if isinstance(value, dict):
+        return any(_holds_pdf_refs(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_holds_pdf_refs(item) for item in value)
+    return False
+
+@lru_cache(maxsize=None)
+def _shared_font_manager_class():
+    """PDFResourceManager que comparte fuentes entre aperturas del mismo archivo (creada al primer uso)"""
+    from pdfminer.pdfinterp import PDFResourceManager
+    
+    class SharedFontResourceManager(PDFResourceManager):
+        """
+        Reutilizar fuentes construidas por otra apertura del mismo archivo
+        
+        Solo se comparten fuentes autocontenidas: anchos, codificación y CMaps
+        ya resueltos, sin PDFObjRef/PDFStream que apunten a un documento que
+        otro hilo puede haber cerrado. Como el archivo no cambió (ruta, mtime y
+        tamaño), el mismo objid describe la misma fuente en todas las aperturas.
+        Las demás quedan en la caché propia de este documento. Una vez
+        construidas, las fuentes solo se leen, así que los hilos pueden usarlas
+        a la vez.
+        """
+        
+        def __init__(self, shared_fonts):
+            super().__init__()
+            self.shared_fonts = shared_fonts
+        
+        def get_font(self, objid, spec):
+            font = self.shared_fonts.get(objid) if objid else None
+            if font is None:
+                font = super().get_font(objid, spec)
+                if objid and not any(_holds_pdf_refs(value) for value in vars(font).values()):
+                    self.shared_fonts[objid] = font
+            return font
+    
+    return SharedFontResourceManager
+
+def _open_pdf(file_path):
+    """Abrir el PDF compartiendo fuentes autocontenidas con otras aperturas del mismo archivo"""
+    # Importación diferida: la interfaz arranca sin cargar pdfplumber si no hay PDF que leer
+    import pdfplumber
+    
+    stat = os.stat(file_path)
+    pdf = pdfplumber.open(file_path)
+    # Los objid solo son únicos dentro de un archivo: la caché va por ruta, mtime y tamaño.
+    # pdfplumber usa pdf.rsrcmgr recién al interpretar cada página
+    shared_fonts = _font_cache(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    pdf.rsrcmgr = _shared_font_manager_class()(shared_fonts)
+    return pdf
+
+def _page_words(page):
+    """Palabras posicionadas de una página, liberando enseguida sus objetos char/rect/curve"""
+    if not _may_contain_text(page):
+        return []
+    words = page.extract_words()
+    page.flush_cache()
+    return words
+
+def _extract_page_range(file_path, start, stop):
+    """Extraer las palabras de un rango de páginas con un documento propio del hilo"""
+    # pdfplumber no es seguro entre hilos: cada hilo abre su propio documento
+    with _open_pdf(file_path) as pdf:
+        return [word for i in range(start, stop) for word in _page_words(pdf.pages[i])]
+
+def _extract_pdf_words(file_path):
+    """Extraer las palabras de todas las páginas, en paralelo si el PDF es largo"""
+    with _open_pdf(file_path) as pdf:
+        page_count = len(pdf.pages)
+        if page_count < PDF_PARALLEL_MIN_PAGES or PDF_PAGE_WORKERS == 1:
+            return [word for page in pdf.pages for word in _page_words(page)]
+    
+    # Rangos contiguos por hilo; se concatenan en el orden de las páginas
+    chunk = -(-page_count // PDF_PAGE_WORKERS)
+    bounds = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        ranges = list(executor.map(lambda b: _extract_page_range(file_path, *b), bounds))
+    return [word for words in ranges for word in words]
+
+@lru_cache(maxsize=PDF_TEXT_CACHE_SIZE)
+def _cached_pdf_lines(file_path, mtime_ns, size):
+    """Líneas del PDF (palabras ordenadas por x) memorizadas por ruta, fecha de modificación y tamaño"""
+    from pdfplumber.utils import cluster_objects
+    
+    # doctop es único en todo el documento: las líneas no se mezclan entre páginas
+    lines = cluster_objects(_extract_pdf_words(file_path), 'doctop', PDF_LINE_TOLERANCE)
+    return tuple(
+        tuple(word['text'] for word in sorted(line, key=lambda word: word['x0']))
+        for line in lines
+    )
+
+def _is_valid_nit(nit):
+    """Validar formato de NIT (8 a 10 dígitos, guion y dígito de verificación) sin regex"""
+    if not nit.isascii() or not 10 <= len(nit) <= 12 or nit[-2] != '-':
+        return False
+    return nit[:-2].isdigit() and nit[-1].isdigit()
+
+def _format_money(value):
+    """Formatear un monto para mostrarlo ($1,234.50)"""
+    return f"${value:,.2f}"
+
+def _parse_money(value):
+    """Convertir un monto extraído del PDF a float"""
+    return float(value.translate(_MONEY_TRANS)) if value else 0
+
 def extract_pdf_data(file_path):
     """Extraer datos de PDF"""
     print(f"🔍 Extrayendo datos de {file_path}...")
     
     try:
-        with pdfplumber.open(file_path) as pdf:
-            text = ''
-            for page in pdf.pages:
-                text += page.extract_text() or ''
+        # Un archivo sin cambios no se vuelve a procesar con pdfplumber
+        stat = os.stat(file_path)
+        lines = _cached_pdf_lines(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        # Mismo texto que page.extract_text(), reconstruido a partir de las palabras
+        text = '\n'.join(' '.join(words) for words in lines)
         
         print(f"✅ Texto extraído: {len(text)} caracteres")
         
-        # Extraer datos con patrones
-        patterns = PDF_PATTERNS.copy()
-        datos = {}
-        
-        for tipo, patrones_lista in patterns.items():
-            for patron in patrones_lista:
-                matches = re.findall(patron, text, re.IGNORECASE | re.MULTILINE)
-                if matches:
-                    if tipo not in datos:
-                        datos[tipo] = []
-                    datos[tipo].extend(matches)
+        # Campos localizados por su etiqueta en la línea; solo los que falten pasan por regex
+        datos = extract_labeled_fields(lines)
+        missing = PDF_PATTERNS_UNION.keys() - datos.keys()
+        if missing:
+            datos.update(extract_fields(text, missing))
         
         # Procesar datos extraídos
         processed_data = {
-            'fecha': datos.get('fecha', ['N/A'])[0] if datos.get('fecha') else 'N/A',
-            'proveedor': datos.get('proveedor', ['N/A'])[0] if datos.get('proveedor') else 'N/A',
-            'nit_proveedor': datos.get('nit_proveedor', ['N/A'])[0] if datos.get('nit_proveedor') else 'N/A',
-            'total': float(datos.get('total', ['0'])[0].replace(',', '')) if datos.get('total') else 0,
-            'iva': float(datos.get('iva', ['0'])[0].replace(',', '')) if datos.get('iva') else 0,
-            'numero_factura': datos.get('numero_factura', ['N/A'])[0] if datos.get('numero_factura') else 'N/A',
-            'cliente': datos.get('cliente', ['N/A'])[0] if datos.get('cliente') else 'N/A'
+            'fecha': datos.get('fecha') or 'N/A',
+            'proveedor': datos.get('proveedor') or 'N/A',
+            'nit_proveedor': datos.get('nit_proveedor') or 'N/A',
+            'total': _parse_money(datos.get('total')),
+            'iva': _parse_money(datos.get('iva')),
+            'numero_factura': datos.get('numero_factura') or 'N/A',
+            'cliente': datos.get('cliente') or 'N/A'
         }
+        # Montos formateados una sola vez para todas las pantallas
+        processed_data['total_str'] = _format_money(processed_data['total'])
+        processed_data['iva_str'] = _format_money(processed_data['iva'])
         
         return processed_data
         
@@ -108,7 +276,7 @@ def validate_invoice_data(datos):
         tolerance = datos['total'] * 0.01  # 1% tolerancia
         validaciones['iva_calculo'] = {
             'valid': abs(datos['iva'] - expected_iva) <= tolerance,
-            'message': f'IVA calculado: ${datos["iva"]:,.2f}, Esperado: ${expected_iva:,.2f}'
+            'message': f'IVA calculado: {datos["iva_str"]}, Esperado: {_format_money(expected_iva)}'
         }
     else:
         validaciones['iva_calculo'] = {
@@ -119,9 +287,9 @@ def validate_invoice_data(datos):
     # Validación 2: NIT formato
     nit = datos.get('nit_proveedor', '')
     if nit and nit != 'N/A':
-        nit_valid = re.match(r'^\d{8,10}-\d{1}$', nit)
+        nit_valid = _is_valid_nit(nit)
         validaciones['nit_formato'] = {
-            'valid': bool(nit_valid),
+            'valid': nit_valid,
             'message': f'NIT {nit} - Formato {"válido" if nit_valid else "inválido"}'
         }
     else:
@@ -133,7 +301,7 @@ def validate_invoice_data(datos):
     # Validación 3: Monto mínimo
     validaciones['monto_minimo'] = {
         'valid': datos['total'] >= 1000,
-        'message': f'Total ${datos["total"]:,.2f} - {"Aceptable" if datos["total"] >= 1000 else "Muy bajo"}'
+        'message': f'Total {datos["total_str"]} - {"Aceptable" if datos["total"] >= 1000 else "Muy bajo"}'
     }
     
     # Validación 4: Duplicados
@@ -153,8 +321,8 @@ def show_invoice_detection(datos):
         'Fecha': datos['fecha'],
         'Proveedor': datos['proveedor'],
         'NIT': datos['nit_proveedor'],
-        'Total': f"${datos['total']:,.2f}",
-        'IVA': f"${datos['iva']:,.2f}",
+        'Total': datos['total_str'],
+        'IVA': datos['iva_str'],
         'Número': datos['numero_factura'],
         'Cliente': datos['cliente']
     })
@@ -192,8 +360,8 @@ def show_editing_interface(datos):
         ('fecha', 'Fecha', datos['fecha']),
         ('proveedor', 'Proveedor', datos['proveedor']),
         ('nit_proveedor', 'NIT', datos['nit_proveedor']),
-        ('total', 'Total', f"${datos['total']:,.2f}"),
-        ('iva', 'IVA', f"${datos['iva']:,.2f}"),
+        ('total', 'Total', datos['total_str']),
+        ('iva', 'IVA', datos['iva_str']),
         ('numero_factura', 'Número', datos['numero_factura'])
     ]
     
@@ -218,7 +386,7 @@ def show_category_editing():
     for i, category in enumerate(categories, 1):
         print(f"{i}. {category}")
 
-def show_alegra_creation(datos):
+async def show_alegra_creation(datos, alegra_id):
     """Mostrar creación en Alegra"""
     print_section("CREACIÓN EN ALEGRA")
     print("💾 Generando payload para Alegra...")
@@ -226,32 +394,29 @@ def show_alegra_creation(datos):
     
     payload = {
         'date': datos['fecha'],
-        'dueDate': '2024-02-15',
+        'dueDate': _PAYLOAD_DUE_DATE,
         'client': {'name': datos['cliente']},
-        'items': [{
-            'description': 'Producto/Servicio procesado',
-            'quantity': 1,
-            'price': datos['total']
-        }],
+        'items': [{**_PAYLOAD_ITEM_TEMPLATE, 'price': datos['total']}],
         'taxes': [{'amount': datos['iva']}],
         'total': datos['total']
     }
+    # Cuerpo listo para enviar por POST a Alegra
+    body = orjson.dumps(payload) if ORJSON_AVAILABLE else json.dumps(payload).encode('utf-8')
     
-    print("✅ Payload generado:")
+    print(f"✅ Payload generado ({len(body)} bytes):")
     print(f"   📅 Fecha: {payload['date']}")
     print(f"   👤 Cliente: {payload['client']['name']}")
-    print(f"   💰 Total: ${payload['total']:,.2f}")
-    print(f"   🧾 IVA: ${payload['taxes'][0]['amount']:,.2f}")
+    print(f"   💰 Total: {datos['total_str']}")
+    print(f"   🧾 IVA: {datos['iva_str']}")
     print()
     print("🔄 Enviando a Alegra API...")
     print("⏳ Procesando...")
     
-    # Simular delay
-    import time
-    time.sleep(2)
+    # Simular delay sin bloquear el event loop
+    await asyncio.sleep(2)
     
     print("✅ ¡Factura creada exitosamente!")
-    print(f"🆔 ID Alegra: FAC-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    print(f"🆔 ID Alegra: {alegra_id}")
     print(f"📊 Estado: Procesada")
 
 def show_processing_metrics():
@@ -273,8 +438,8 @@ def show_final_summary(datos, alegra_id):
         'ID Alegra': alegra_id,
         'Fecha': datos['fecha'],
         'Proveedor': datos['proveedor'],
-        'Total': f"${datos['total']:,.2f}",
-        'IVA': f"${datos['iva']:,.2f}",
+        'Total': datos['total_str'],
+        'IVA': datos['iva_str'],
         'Estado': 'Procesada'
     })
     
@@ -286,7 +451,7 @@ def show_final_summary(datos, alegra_id):
         "🚪 Salir"
     ])
 
-def simulate_user_journey():
+async def simulate_user_journey():
     """Simular el journey completo del usuario"""
     print_header("SISTEMA DE FACTURAS - INTERFAZ DE USUARIO")
     print("👤 Bienvenido al sistema de procesamiento de facturas")
@@ -320,8 +485,9 @@ def simulate_user_journey():
     print("\n👤 [Usuario] Selecciona: 1 (CONFIRMAR Y CREAR)")
     input("⏎ Presiona Enter para continuar...")
     
-    # Paso 6: Mostrar creación en Alegra
-    show_alegra_creation(datos)
+    # Paso 6: Mostrar creación en Alegra (el mismo ID se usa en el resumen final)
+    alegra_id = f"FAC-{time.strftime('%Y%m%d%H%M%S')}"
+    await show_alegra_creation(datos, alegra_id)
     input("\n⏎ Presiona Enter para continuar...")
     
     # Paso 7: Mostrar métricas
@@ -329,7 +495,6 @@ def simulate_user_journey():
     input("\n⏎ Presiona Enter para continuar...")
     
     # Paso 8: Mostrar resumen final
-    alegra_id = f"FAC-{datetime.now().strftime('%Y%m%d%H%M%S')}"
     show_final_summary(datos, alegra_id)
     
     print("\n🎉 ¡User Journey completado exitosamente!")
@@ -340,7 +505,7 @@ def main():
         print("❌ Error: Archivo testfactura1.pdf no encontrado")
         return False
     
-    simulate_user_journey()
+    asyncio.run(simulate_user_journey())
     return True
 
 if __name__ == "__main__":
@@ -5,22 +5,33 @@ Permite al usuario confirmar el tipo de factura (compra/venta) antes del procesa
 """
 
 import argparse
+import atexit
 import base64
 import json
 import logging
 import os
+import queue
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-import pdfplumber
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from alegra_reports import AlegraReports
-from config import ACCOUNTING_CONFIG, ALEGRA_CONFIG, LOGGING_CONFIG, NANOBOT_CONFIG, PDF_PATTERNS
+from config import (
+    ACCOUNTING_CONFIG, ALEGRA_CONFIG, LOGGING_CONFIG, NANOBOT_CONFIG, PDF_PATTERNS, PDF_PATTERNS_UNION,
+    matching_fields, score_invoice_type
+)
 from nanobot_client import NanobotClient, NanobotError, NanobotResponseError
+from utils_pdf import extract_pdf_text
 
 # Configurar logging dinámicamente
 log_level = LOGGING_CONFIG.get('level', 'INFO')
@@ -29,14 +40,24 @@ log_format = LOGGING_CONFIG.get('format', '%(asctime)s - %(levelname)s - %(messa
 log_file = LOGGING_CONFIG.get('file', 'logs/invoicebot.log')
 os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
 
-logging.basicConfig(
-    level=log_level_value,
-    format=log_format,
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+# Igual que basicConfig (solo si nadie configuró logging), pero la escritura a disco y consola
+# la hace un hilo QueueListener: el procesamiento de facturas solo encola los registros
+root_logger = logging.getLogger()
+if not root_logger.handlers:
+    log_formatter = logging.Formatter(log_format)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(log_formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(log_formatter)
+    
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, file_handler, stream_handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(log_level_value)
+    log_listener.start()
+    # Vaciar la cola antes de salir para no perder los últimos registros
+    atexit.register(log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
 # OCR imports for image processing
@@ -55,9 +76,85 @@ except ImportError as e:  # pragma: no cover - best effort optional deps
 else:
     OCR_AVAILABLE = True
 
+# JSON rápido (opcional) para respuestas y payloads de Alegra y reglas fiscales
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# API persistente de Tesseract (opcional): evita lanzar un proceso y recargar el modelo por imagen
+try:
+    import tesserocr  # type: ignore[import]
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
 # Cargar variables de entorno
 load_dotenv()
 
+# Conexiones keep-alive con Alegra que conserva la sesión HTTP
+ALEGRA_POOL_CONNECTIONS = 10
+ALEGRA_POOL_MAXSIZE = 20
+
+# Códigos HTTP transitorios que se reintentan (solo métodos idempotentes, nunca POST)
+ALEGRA_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Lado mayor (px) al que se reducen las imágenes antes del OCR (~300 DPI en tamaño carta)
+OCR_MAX_SIDE = 2200
+
+# Patrones de proveedor (no están en PDF_PATTERNS), compilados una sola vez
+_PROVEEDOR_PATTERNS = [
+    re.compile(r'Proveedor[:\s]+(.+)', re.IGNORECASE),
+    re.compile(r'Supplier[:\s]+(.+)', re.IGNORECASE),
+    re.compile(r'Vendor[:\s]+(.+)', re.IGNORECASE),
+    re.compile(r'De[:\s]+(.+)', re.IGNORECASE),
+    re.compile(r'From[:\s]+(.+)', re.IGNORECASE)
+]
+
+# Patrones de factura ya compilados (config + proveedor), compartidos por todas las llamadas
+_INVOICE_PATTERNS = {**PDF_PATTERNS, 'proveedor': _PROVEEDOR_PATTERNS}
+
+# Números (cantidades y precios) dentro de una línea de item
+_NUM_RE = re.compile(r'[\d,]+\.?\d*')
+
+# Líneas no vacías del texto, recorridas sin construir la lista de split('\n')
+_TEXT_LINE_RE = re.compile(r'[^\n]+')
+
+# Palabras que abren y cierran la sección de items (una sola búsqueda por línea)
+_ITEM_START_RE = re.compile('descripción|item|producto|servicio|cantidad|precio', re.IGNORECASE)
+_ITEM_END_RE = re.compile('subtotal|total|impuestos|iva', re.IGNORECASE)
+
+# Tabla para quitar separadores de miles en una sola pasada ("1,234.50" -> "1234.50")
+_COMMA_STRIP = str.maketrans('', '', ',')
+
+def _json_loads(raw):
+    """Decodificar JSON (bytes o str) con orjson si está disponible"""
+    return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+def _json_dumps(payload):
+    """Codificar un payload para el cuerpo de un POST (bytes con orjson)"""
+    if ORJSON_AVAILABLE:
+        # Los montos pueden llegar como escalares de NumPy
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload)
+
+# Reglas fiscales junto al procesador (si no existen se usan las reglas por defecto)
+TAX_RULES_PATH = os.path.join(os.path.dirname(__file__), 'config', 'tax_rules.json')
+
+@lru_cache(maxsize=1)
+def _load_tax_rules(path: str) -> Dict[str, Any]:
+    """Cargar las reglas fiscales una sola vez por proceso (no modificar el dict devuelto)"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return _json_loads(f.read())
+    
+    # Reglas por defecto
+    return {
+        'tax_rates': {'iva_standard': 0.19, 'rete_iva': 0.035},
+        'validation_rules': {'tax_tolerance_percentage': 0.01}
+    }
+
 class ConversationalInvoiceProcessor:
     """Procesador de facturas con sistema de conversación interactiva"""
 
@@ -77,6 +174,27 @@ class ConversationalInvoiceProcessor:
         if not self.alegra_email or not self.alegra_token:
             raise ValueError("Faltan credenciales de Alegra en .env")
 
+        # Las credenciales no cambian: el header Basic se codifica una sola vez (solo lectura)
+        credentials = f"{self.alegra_email}:{self.alegra_token}"
+        self._auth_headers = MappingProxyType({
+            'Authorization': f"Basic {base64.b64encode(credentials.encode()).decode()}",
+            'Content-Type': 'application/json'
+        })
+
+        # Sesión compartida por todas las llamadas a Alegra: reutiliza la conexión TLS
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=ALEGRA_POOL_CONNECTIONS,
+            pool_maxsize=ALEGRA_POOL_MAXSIZE,
+            max_retries=Retry(
+                total=self.alegra_max_retries,
+                backoff_factor=0.3,
+                status_forcelist=ALEGRA_RETRY_STATUSES,
+                raise_on_status=False
+            )
+        )
+        self._session.mount('https://', adapter)
+
         self.accounting_config = ACCOUNTING_CONFIG
 
         self.nanobot_config = dict(NANOBOT_CONFIG)
@@ -105,6 +223,9 @@ class ConversationalInvoiceProcessor:
 
         self.last_classification: Optional[Dict[str, Any]] = None
 
+        # API de tesserocr creada en el primer OCR y reutilizada entre facturas
+        self._ocr_api = None
+
         self._ensure_directories()
     
     def _ensure_directories(self) -> None:
@@ -121,20 +242,19 @@ class ConversationalInvoiceProcessor:
             os.makedirs(directory, exist_ok=True)
             logger.debug("Directorio asegurado: %s", directory)
     
-    def get_auth_headers(self) -> Dict[str, str]:
-        """Obtener headers de autenticación para Alegra"""
-        credentials = f"{self.alegra_email}:{self.alegra_token}"
-        auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
-        
-        return {
-            'Authorization': auth_header,
-            'Content-Type': 'application/json'
-        }
+    def get_auth_headers(self) -> Mapping[str, str]:
+        """Obtener headers de autenticación para Alegra (calculados una vez en __init__)"""
+        return self._auth_headers
     
-    def detect_invoice_type(self, texto: str) -> str:
-        """Detectar automáticamente si es factura de compra o venta."""
+    def detect_invoice_type(self, texto: str, texto_lower: Optional[str] = None) -> str:
+        """Detectar automáticamente si es factura de compra o venta.
+
+        Si el llamador ya tiene el texto en minúsculas puede pasarlo en
+        ``texto_lower`` para no volver a convertirlo.
+        """
 
-        texto_lower = texto.lower()
+        if texto_lower is None:
+            texto_lower = texto.lower()
         legacy_result, compra_score, venta_score = self._legacy_detect_invoice_type(texto_lower)
 
         if not self.nanobot_enabled or not self.nanobot_client:
@@ -210,20 +330,8 @@ class ConversationalInvoiceProcessor:
 
     def _legacy_detect_invoice_type(self, texto_lower: str) -> Tuple[str, int, int]:
         """Detección legacy de tipo de factura"""
-        compra_keywords = [
-            'proveedor', 'proveedores', 'compra', 'compras', 'factura de compra',
-            'bill', 'purchase', 'supplier', 'vendor', 'factura de proveedor',
-            'orden de compra', 'oc', 'pedido', 'receipt'
-        ]
-
-        venta_keywords = [
-            'cliente', 'clientes', 'venta', 'ventas', 'factura de venta',
-            'invoice', 'sale', 'customer', 'factura de cliente',
-            'orden de venta', 'ov', 'cotización', 'quote'
-        ]
-
-        compra_score = sum(1 for keyword in compra_keywords if keyword in texto_lower)
-        venta_score = sum(1 for keyword in venta_keywords if keyword in texto_lower)
+        # Una sola pasada Aho-Corasick sobre el texto puntúa ambos tipos
+        compra_score, venta_score = score_invoice_type(texto_lower)
 
         if compra_score > venta_score:
             legacy_result = 'compra'
@@ -265,40 +373,55 @@ class ConversationalInvoiceProcessor:
 
     def extract_data_from_pdf(self, pdf_path: str) -> Optional[Dict]:
         """Extraer datos del PDF"""
-        logger.info(f"📄 Procesando PDF: {pdf_path}")
+        logger.info("📄 Procesando PDF: %s", pdf_path)
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                texto = ''
-                for page in pdf.pages:
-                    texto += page.extract_text() or ''
+            # Páginas en paralelo (procesos) para PDFs largos, unidas en orden
+            texto = extract_pdf_text(pdf_path)
             
             if not texto.strip():
                 logger.error("No se pudo extraer texto del PDF")
                 return None
             
             logger.info("📝 Texto extraído del PDF:")
-            logger.info(f"Longitud: {len(texto)} caracteres")
-            logger.debug(f"Primeros 500 caracteres: {texto[:500]}")
+            logger.info("Longitud: %d caracteres", len(texto))
+            logger.debug("Primeros 500 caracteres: %s", texto[:500])
             
             # Extraer datos con parsing mejorado
             datos = self._parse_invoice_data(texto)
             
-            logger.info(f"📊 Datos extraídos - Total: ${datos.get('total', 0):,.2f}")
+            logger.info("📊 Datos extraídos - Total: $%s", format(datos.get('total', 0), ',.2f'))
             
             return datos
             
         except Exception as e:
-            logger.error(f"❌ Error procesando PDF: {e}")
+            logger.error("❌ Error procesando PDF: %s", e)
             return None
 
+    def _get_ocr_api(self):
+        """Obtener la API de Tesseract, cargando el modelo 'spa' solo la primera vez"""
+        if self._ocr_api is None:
+            self._ocr_api = tesserocr.PyTessBaseAPI(
+                lang='spa', oem=tesserocr.OEM.LSTM_ONLY, psm=tesserocr.PSM.AUTO
+            )
+        return self._ocr_api
+
+    def _ocr_image(self, gray) -> str:
+        """Reconocer el texto de una imagen preprocesada (tesserocr o, si falta, pytesseract)"""
+        if not TESSEROCR_AVAILABLE:
+            return pytesseract.image_to_string(gray, lang='spa')
+        
+        api = self._get_ocr_api()
+        api.SetImage(Image.fromarray(gray))
+        return api.GetUTF8Text()
+
     def extract_data_from_image(self, image_path: str) -> Optional[Dict]:
         """Extraer datos de imagen usando OCR"""
         if not OCR_AVAILABLE:
             logger.error("❌ OCR no disponible")
             return None
         
-        logger.info(f"🖼️ Procesando imagen: {image_path}")
+        logger.info("🖼️ Procesando imagen: %s", image_path)
         
         try:
             # Cargar imagen
@@ -307,54 +430,59 @@ class ConversationalInvoiceProcessor:
                 logger.error("No se pudo cargar la imagen")
                 return None
             
-            # Preprocesamiento para mejorar OCR
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            gray = cv2.medianBlur(gray, 3)
-            gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+            # Reducir escaneos grandes: la precisión de Tesseract se estanca y su tiempo crece con los píxeles
+            height, width = image.shape[:2]
+            scale = min(1.0, OCR_MAX_SIDE / max(height, width))
+            if scale < 1.0:
+                # Al reducir, INTER_AREA promedia los píxeles y suaviza el ruido que quitaba medianBlur
+                image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            
+            # Preprocesamiento para mejorar OCR sobre un único buffer: gris y umbral de Otsu in situ
+            gray = np.empty(image.shape[:2], dtype=np.uint8)
+            if scale < 1.0:
+                cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=gray)
+            else:
+                # Sin reducción no hay promedio: se conserva el filtro de mediana para escaneos pequeños
+                cv2.medianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 3, dst=gray)
+            cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray)
             
             # OCR
-            texto = pytesseract.image_to_string(gray, lang='spa')
+            texto = self._ocr_image(gray)
             
             if not texto.strip():
                 logger.error("No se pudo extraer texto de la imagen")
                 return None
             
             logger.info("📝 Texto extraído de la imagen:")
-            logger.info(f"Longitud: {len(texto)} caracteres")
-            logger.debug(f"Primeros 500 caracteres: {texto[:500]}")
+            logger.info("Longitud: %d caracteres", len(texto))
+            logger.debug("Primeros 500 caracteres: %s", texto[:500])
             
             # Extraer datos con parsing mejorado
             datos = self._parse_invoice_data(texto)
             
-            logger.info(f"📊 Datos extraídos - Total: ${datos.get('total', 0):,.2f}")
+            logger.info("📊 Datos extraídos - Total: $%s", format(datos.get('total', 0), ',.2f'))
             
             return datos
             
         except Exception as e:
-            logger.error(f"❌ Error procesando imagen: {e}")
+            logger.error("❌ Error procesando imagen: %s", e)
             return None
 
     def _parse_invoice_data(self, texto: str) -> Dict:
         """Parsear datos de factura desde texto con patrones fiscales mejorados"""
-        # Usar patrones de configuración
-        patterns = PDF_PATTERNS.copy()
-        
-        # Añadir patrones adicionales específicos
-        patterns.update({
-            'proveedor': [
-                r'Proveedor[:\s]+(.+)',
-                r'Supplier[:\s]+(.+)',
-                r'Vendor[:\s]+(.+)',
-                r'De[:\s]+(.+)',
-                r'From[:\s]+(.+)'
-            ]
-        })
+        # Una sola pasada multipatrón (Hyperscan o, sin él, palabras clave) indica qué campos
+        # tienen alguna coincidencia; 'proveedor' no está en la base y se evalúa siempre
+        present = matching_fields(texto)
+        patterns = {
+            field: field_patterns if field in present or field not in PDF_PATTERNS_UNION else []
+            for field, field_patterns in _INVOICE_PATTERNS.items()
+        }
         
         datos = {}
         
         # Extraer fecha
         for pattern in patterns['fecha']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 fecha_str = match.group(1)
                 # Convertir formato de fecha
@@ -378,20 +506,20 @@ class ConversationalInvoiceProcessor:
         
         # Extraer cliente/proveedor
         for pattern in patterns['cliente']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 datos['cliente'] = match.group(1).strip()
                 break
         
         for pattern in patterns['proveedor']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 datos['proveedor'] = match.group(1).strip()
                 break
         
         # Extraer total
         for pattern in patterns['total']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 total_str = match.group(1).replace(',', '')
                 try:
@@ -402,7 +530,7 @@ class ConversationalInvoiceProcessor:
         
         # Extraer IVA
         for pattern in patterns.get('iva', []):
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 iva_str = match.group(1).replace(',', '')
                 try:
@@ -413,7 +541,7 @@ class ConversationalInvoiceProcessor:
         
         # Extraer retenciones
         for pattern in patterns.get('retenciones', []):
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 ret_str = match.group(1).replace(',', '')
                 try:
@@ -424,14 +552,14 @@ class ConversationalInvoiceProcessor:
         
         # Extraer NIT del proveedor
         for pattern in patterns.get('nit_proveedor', []):
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 datos['nit_proveedor'] = match.group(1).strip()
                 break
         
         # Extraer número de factura
         for pattern in patterns.get('numero_factura', []):
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 datos['numero_factura'] = match.group(1).strip()
                 break
@@ -454,40 +582,65 @@ class ConversationalInvoiceProcessor:
         # Usar IVA calculado para impuestos (compatibilidad)
         datos['impuestos'] = datos.get('iva', 0)
         
+        # Texto fuente: la detección de tipo lo reutiliza sin volver a leer el archivo
+        datos['texto'] = texto
+        
         return datos
 
+    @staticmethod
+    def _build_items_soa(items: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Items en columnas (precios, cantidades) para validarlos con NumPy; None sin NumPy"""
+        if np is None:
+            return None
+        
+        # float64: los montos en pesos superan la precisión exacta de float32
+        return {
+            'precios': np.fromiter((item.get('precio', 0) for item in items), dtype=np.float64, count=len(items)),
+            'cantidades': np.fromiter((item.get('cantidad', 0) for item in items), dtype=np.float64, count=len(items))
+        }
+
+    @classmethod
+    def _items_total(cls, datos_factura: Dict) -> float:
+        """Suma de los precios de los items, vectorizada con NumPy si está disponible"""
+        # Las columnas se arman de datos['items'] en cada llamada: los items siguen siendo
+        # editables y no hay una segunda copia que pueda quedar desactualizada
+        items = datos_factura.get('items', [])
+        items_soa = cls._build_items_soa(items)
+        if items_soa is not None:
+            return float(items_soa['precios'].sum())
+        return sum(item.get('precio', 0) for item in items)
+
     def _extract_items_from_text(self, texto: str) -> List[Dict]:
         """Extraer items de factura desde texto"""
         items = []
         
-        # Buscar sección de items
-        lines = texto.split('\n')
+        # Buscar sección de items recorriendo las líneas no vacías con un regex compilado
         in_items_section = False
         
-        for line in lines:
-            line = line.strip()
+        for match in _TEXT_LINE_RE.finditer(texto):
+            line = match.group().strip()
             if not line:
                 continue
             
             # Detectar inicio de sección de items
-            if any(keyword in line.lower() for keyword in ['descripción', 'item', 'producto', 'servicio', 'cantidad', 'precio']):
+            if _ITEM_START_RE.search(line):
                 in_items_section = True
                 continue
             
             # Detectar fin de sección de items
-            if any(keyword in line.lower() for keyword in ['subtotal', 'total', 'impuestos', 'iva']):
+            if _ITEM_END_RE.search(line):
                 in_items_section = False
                 continue
             
             # Extraer item si estamos en la sección correcta
             if in_items_section:
                 # Buscar números que podrían ser cantidad y precio
-                numbers = re.findall(r'[\d,]+\.?\d*', line)
+                numbers = _NUM_RE.findall(line)
                 if len(numbers) >= 2:
                     try:
-                        cantidad = float(numbers[0].replace(',', ''))
-                        precio = float(numbers[1].replace(',', ''))
-                        descripcion = re.sub(r'[\d,]+\.?\d*', '', line).strip()
+                        cantidad = float(numbers[0].translate(_COMMA_STRIP))
+                        precio = float(numbers[1].translate(_COMMA_STRIP))
+                        descripcion = _NUM_RE.sub('', line).strip()
                         
                         if descripcion and cantidad > 0 and precio > 0:
                             items.append({
@@ -591,7 +744,7 @@ class ConversationalInvoiceProcessor:
         
         # Validar total vs items + impuestos
         total = datos_factura.get('total', 0)
-        items_total = sum(item.get('precio', 0) for item in datos_factura.get('items', []))
+        items_total = self._items_total(datos_factura)
         iva = datos_factura.get('iva', 0)
         retenciones = datos_factura.get('retenciones', 0)
         
@@ -624,64 +777,68 @@ class ConversationalInvoiceProcessor:
             'valid': len(errors) == 0
         }
     
+    def _find_invoices(self, params: Dict, headers: Dict) -> bool:
+        """Indicar si Alegra devuelve alguna factura para los parámetros de búsqueda"""
+        response = self._session.get(
+            f"{self.base_url}/invoices",
+            headers=headers,
+            params=params,
+            timeout=30
+        )
+        return response.status_code == 200 and bool(_json_loads(response.content))
+
     def check_duplicate_invoice(self, datos_factura: Dict) -> bool:
         """Verificar si la factura ya existe en Alegra"""
         try:
             headers = self.get_auth_headers()
             
-            # Buscar por número de factura si existe
+            # Búsquedas independientes: por número de factura y por total y fecha (método alternativo)
+            searches = []
             if datos_factura.get('numero_factura'):
-                response = requests.get(
-                    f"{self.base_url}/invoices",
-                    headers=headers,
-                    params={'number': datos_factura['numero_factura']},
-                    timeout=30
-                )
-                if response.status_code == 200:
-                    invoices = response.json()
-                    if invoices:
-                        logger.warning(f"⚠️ Factura duplicada encontrada: {datos_factura['numero_factura']}")
-                        return True
+                searches.append((
+                    {'number': datos_factura['numero_factura']},
+                    f"⚠️ Factura duplicada encontrada: {datos_factura['numero_factura']}"
+                ))
             
-            # Buscar por total y fecha (método alternativo)
             fecha = datos_factura.get('fecha')
             total = datos_factura.get('total', 0)
-            
             if fecha and total:
-                response = requests.get(
-                    f"{self.base_url}/invoices",
-                    headers=headers,
-                    params={'date': fecha, 'total': total},
-                    timeout=30
-                )
-                if response.status_code == 200:
-                    invoices = response.json()
-                    if invoices:
-                        logger.warning(f"⚠️ Posible duplicado por total y fecha: ${total} en {fecha}")
+                searches.append((
+                    {'date': fecha, 'total': total},
+                    f"⚠️ Posible duplicado por total y fecha: ${total} en {fecha}"
+                ))
+            
+            if not searches:
+                return False
+            
+            # Se lanzan en paralelo sobre la sesión compartida; gana la primera que encuentra algo
+            executor = ThreadPoolExecutor(max_workers=len(searches))
+            try:
+                futures = {
+                    executor.submit(self._find_invoices, params, headers): message
+                    for params, message in searches
+                }
+                for future in as_completed(futures):
+                    if future.result():
+                        logger.warning(futures[future])
                         return True
+            finally:
+                # Con una coincidencia no se espera a que termine la otra búsqueda
+                executor.shutdown(wait=False)
             
             return False
             
         except Exception as e:
-            logger.error(f"❌ Error verificando duplicados: {e}")
+            logger.error("❌ Error verificando duplicados: %s", e)
             return False
     
     def calculate_taxes(self, datos_factura: Dict) -> Dict:
         """Calcular impuestos basado en reglas fiscales"""
         try:
-            # Cargar reglas fiscales
-            tax_rules_path = os.path.join(os.path.dirname(__file__), 'config', 'tax_rules.json')
-            if os.path.exists(tax_rules_path):
-                with open(tax_rules_path, 'r', encoding='utf-8') as f:
-                    tax_rules = json.load(f)
-            else:
-                # Reglas por defecto
-                tax_rules = {
-                    'tax_rates': {'iva_standard': 0.19, 'rete_iva': 0.035},
-                    'validation_rules': {'tax_tolerance_percentage': 0.01}
-                }
+            # Reglas fiscales leídas del disco solo en la primera factura
+            tax_rules = _load_tax_rules(TAX_RULES_PATH)
             
-            items_total = sum(item.get('precio', 0) for item in datos_factura.get('items', []))
+            items_total = self._items_total(datos_factura)
             iva_rate = tax_rules['tax_rates'].get('iva_standard', 0.19)
             
             calculated_iva = items_total * iva_rate
@@ -691,7 +848,7 @@ class ConversationalInvoiceProcessor:
             tolerance = items_total * tax_rules['validation_rules'].get('tax_tolerance_percentage', 0.01)
             
             if abs(calculated_iva - current_iva) > tolerance:
-                logger.warning(f"⚠️ IVA no estándar: Calculado ${calculated_iva:,.2f}, Reportado ${current_iva:,.2f}")
+                logger.warning("⚠️ IVA no estándar: Calculado $%s, Reportado $%s", format(calculated_iva, ',.2f'), format(current_iva, ',.2f'))
                 # Usar el calculado si la diferencia es significativa
                 datos_factura['iva'] = calculated_iva
             
@@ -703,7 +860,7 @@ class ConversationalInvoiceProcessor:
             return datos_factura
             
         except Exception as e:
-            logger.error(f"❌ Error calculando impuestos: {e}")
+            logger.error("❌ Error calculando impuestos: %s", e)
             return datos_factura
     
     def auto_categorize_items(self, datos_factura: Dict) -> Dict:
@@ -740,14 +897,14 @@ class ConversationalInvoiceProcessor:
                         'item_categories', {}
                     ).get(suggested_category, {}).get('accounting_account', 1)
                 
-                logger.info(f"✅ Items categorizados como: {suggested_category}")
+                logger.info("✅ Items categorizados como: %s", suggested_category)
                 return datos_factura
             else:
                 logger.warning("⚠️ Nanobot no pudo categorizar, usando por defecto")
                 return self._default_categorization(datos_factura)
                 
         except Exception as e:
-            logger.error(f"❌ Error en auto-categorización: {e}")
+            logger.error("❌ Error en auto-categorización: %s", e)
             return self._default_categorization(datos_factura)
     
     def _default_categorization(self, datos_factura: Dict) -> Dict:
@@ -820,7 +977,7 @@ class ConversationalInvoiceProcessor:
         
         try:
             # Buscar contacto existente
-            response = requests.get(
+            response = self._session.get(
                 f"{self.base_url}/contacts",
                 params={'query': name},
                 headers=headers,
@@ -828,14 +985,14 @@ class ConversationalInvoiceProcessor:
             )
             
             if response.status_code == 200:
-                contacts = response.json()
+                contacts = _json_loads(response.content)
                 for contact in contacts:
                     if contact.get('name', '').lower() == name.lower():
-                        logger.info(f"✅ Contacto encontrado: {name} (ID: {contact.get('id')})")
+                        logger.info("✅ Contacto encontrado: %s (ID: %s)", name, contact.get('id'))
                         return contact.get('id')
             
             # Intentar crear nuevo contacto
-            logger.info(f"📝 Intentando crear contacto: {name} (tipo: {contact_type})")
+            logger.info("📝 Intentando crear contacto: %s (tipo: %s)", name, contact_type)
             
             payload = {
                 'name': name.strip(),
@@ -846,26 +1003,26 @@ class ConversationalInvoiceProcessor:
                 }
             }
             
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/contacts",
-                json=payload,
+                data=_json_dumps(payload),
                 headers=headers,
                 timeout=10
             )
             
             if response.status_code == 201:
-                contact = response.json()
-                logger.info(f"✅ Contacto creado: {name} (ID: {contact.get('id')})")
+                contact = _json_loads(response.content)
+                logger.info("✅ Contacto creado: %s (ID: %s)", name, contact.get('id'))
                 return contact.get('id')
             else:
-                logger.warning(f"⚠️ Error creando contacto: {response.status_code} - {response.text}")
+                logger.warning("⚠️ Error creando contacto: %s - %s", response.status_code, response.text)
                 
                 # Fallback: usar contacto por defecto
                 logger.warning("⚠️ Usando contacto por defecto 'Consumidor Final'")
                 return "1"  # ID del contacto por defecto
                 
         except Exception as e:
-            logger.error(f"❌ Error con contacto {name}: {e}")
+            logger.error("❌ Error con contacto %s: %s", name, e)
             logger.warning("⚠️ Usando contacto por defecto 'Consumidor Final'")
             return "1"  # ID del contacto por defecto
 
@@ -879,7 +1036,7 @@ class ConversationalInvoiceProcessor:
         
         try:
             # Buscar item existente
-            response = requests.get(
+            response = self._session.get(
                 f"{self.base_url}/items",
                 params={'query': name},
                 headers=headers,
@@ -887,19 +1044,19 @@ class ConversationalInvoiceProcessor:
             )
             
             if response.status_code == 200:
-                items = response.json()
+                items = _json_loads(response.content)
                 for item in items:
                     if item.get('name', '').lower() == name.lower():
                         # Verificar si el item tiene cuenta contable
                         if item.get('accountingAccount'):
-                            logger.info(f"✅ Item encontrado: {name} (ID: {item.get('id')})")
+                            logger.info("✅ Item encontrado: %s (ID: %s)", name, item.get('id'))
                             return item.get('id')
                         else:
-                            logger.warning(f"⚠️ Item encontrado pero sin cuenta contable: {name} (ID: {item.get('id')})")
+                            logger.warning("⚠️ Item encontrado pero sin cuenta contable: %s (ID: %s)", name, item.get('id'))
                             # Continuar para crear uno nuevo
             
             # Crear nuevo item con cuenta contable
-            logger.info(f"📦 Creando item: {name}")
+            logger.info("📦 Creando item: %s", name)
             
             # Obtener cuenta contable por defecto
             accounting_account_id = self.accounting_config.get('item_categories', {}).get('product', {}).get('accounting_account', 1)
@@ -917,23 +1074,23 @@ class ConversationalInvoiceProcessor:
                 'accountingAccount': {'id': accounting_account_id}
             }
             
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/items",
-                json=payload,
+                data=_json_dumps(payload),
                 headers=headers,
                 timeout=10
             )
             
             if response.status_code == 201:
-                item = response.json()
-                logger.info(f"✅ Item creado: {name} (ID: {item.get('id')})")
+                item = _json_loads(response.content)
+                logger.info("✅ Item creado: %s (ID: %s)", name, item.get('id'))
                 return item.get('id')
             else:
-                logger.warning(f"⚠️ Error creando item: {response.status_code} - {response.text}")
+                logger.warning("⚠️ Error creando item: %s - %s", response.status_code, response.text)
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Error con item {name}: {e}")
+            logger.error("❌ Error con item %s: %s", name, e)
             return None
 
     def create_purchase_bill(self, datos_factura: Dict) -> Optional[Dict]:
@@ -988,32 +1145,32 @@ class ConversationalInvoiceProcessor:
             payload['tax'] = datos_factura['impuestos']
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/bills",
-                json=payload,
+                data=_json_dumps(payload),
                 headers=headers,
                 timeout=30
             )
             
-            logger.info(f"📡 Status Code: {response.status_code}")
+            logger.info("📡 Status Code: %s", response.status_code)
             
             if response.status_code == 201:
-                bill_created = response.json()
+                bill_created = _json_loads(response.content)
                 logger.info("✅ ¡Factura de COMPRA creada exitosamente!")
-                logger.info(f"🆔 ID: {bill_created.get('id')}")
-                logger.info(f"📄 Número: {bill_created.get('number')}")
-                logger.info(f"💰 Total: ${bill_created.get('total')}")
-                logger.info(f"🏪 Proveedor: {bill_created.get('provider', {}).get('name')}")
-                logger.info(f"📅 Fecha: {bill_created.get('date')}")
+                logger.info("🆔 ID: %s", bill_created.get('id'))
+                logger.info("📄 Número: %s", bill_created.get('number'))
+                logger.info("💰 Total: $%s", bill_created.get('total'))
+                logger.info("🏪 Proveedor: %s", bill_created.get('provider', {}).get('name'))
+                logger.info("📅 Fecha: %s", bill_created.get('date'))
                 
                 return bill_created
             else:
-                logger.error(f"❌ Error creando factura de compra: {response.status_code}")
-                logger.error(f"📝 Respuesta: {response.text}")
+                logger.error("❌ Error creando factura de compra: %s", response.status_code)
+                logger.error("📝 Respuesta: %s", response.text)
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Error en API Alegra: {e}")
+            logger.error("❌ Error en API Alegra: %s", e)
             return None
 
     def create_sale_invoice(self, datos_factura: Dict) -> Optional[Dict]:
@@ -1068,37 +1225,37 @@ class ConversationalInvoiceProcessor:
             payload['tax'] = datos_factura['impuestos']
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/invoices",
-                json=payload,
+                data=_json_dumps(payload),
                 headers=headers,
                 timeout=30
             )
             
-            logger.info(f"📡 Status Code: {response.status_code}")
+            logger.info("📡 Status Code: %s", response.status_code)
             
             if response.status_code == 201:
-                invoice_created = response.json()
+                invoice_created = _json_loads(response.content)
                 logger.info("✅ ¡Factura de VENTA creada exitosamente!")
-                logger.info(f"🆔 ID: {invoice_created.get('id')}")
-                logger.info(f"📄 Número: {invoice_created.get('number')}")
-                logger.info(f"💰 Total: ${invoice_created.get('total')}")
-                logger.info(f"👤 Cliente: {invoice_created.get('client', {}).get('name')}")
-                logger.info(f"📅 Fecha: {invoice_created.get('date')}")
+                logger.info("🆔 ID: %s", invoice_created.get('id'))
+                logger.info("📄 Número: %s", invoice_created.get('number'))
+                logger.info("💰 Total: $%s", invoice_created.get('total'))
+                logger.info("👤 Cliente: %s", invoice_created.get('client', {}).get('name'))
+                logger.info("📅 Fecha: %s", invoice_created.get('date'))
                 
                 return invoice_created
             else:
-                logger.error(f"❌ Error creando factura de venta: {response.status_code}")
-                logger.error(f"📝 Respuesta: {response.text}")
+                logger.error("❌ Error creando factura de venta: %s", response.status_code)
+                logger.error("📝 Respuesta: %s", response.text)
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ Error en API Alegra: {e}")
+            logger.error("❌ Error en API Alegra: %s", e)
             return None
 
     def process_invoice_conversational(self, file_path: str) -> Optional[Dict]:
         """Procesar factura con sistema de conversación interactiva y validaciones contables"""
-        logger.info(f"🚀 Iniciando procesamiento conversacional de: {file_path}")
+        logger.info("🚀 Iniciando procesamiento conversacional de: %s", file_path)
         
         # Determinar tipo de archivo y extraer datos
         file_ext = file_path.lower().split('.')[-1]
@@ -1108,29 +1265,15 @@ class ConversationalInvoiceProcessor:
         elif file_ext in ['jpg', 'jpeg', 'png']:
             datos_factura = self.extract_data_from_image(file_path)
         else:
-            logger.error(f"❌ Tipo de archivo no soportado: {file_ext}")
+            logger.error("❌ Tipo de archivo no soportado: %s", file_ext)
             return None
         
         if not datos_factura:
             logger.error("❌ No se pudieron extraer datos del archivo")
             return None
         
-        # Detectar tipo automáticamente
-        # Extraer texto para detección
-        texto_para_deteccion = ""
-        if file_ext == 'pdf':
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    texto_para_deteccion += page.extract_text() or ''
-        elif file_ext in ['jpg', 'jpeg', 'png'] and OCR_AVAILABLE:
-            image = cv2.imread(file_path)
-            if image is not None:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                gray = cv2.medianBlur(gray, 3)
-                gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-                texto_para_deteccion = pytesseract.image_to_string(gray, lang='spa')
-        
-        detected_type = self.detect_invoice_type(texto_para_deteccion)
+        # Detectar tipo automáticamente con el texto ya extraído (sin reabrir el PDF ni repetir el OCR)
+        detected_type = self.detect_invoice_type(datos_factura.get('texto', ''))
         
         # Validaciones contables pre-procesamiento
         logger.info("🔍 Ejecutando validaciones contables...")
@@ -1208,7 +1351,7 @@ def main():
             reports.generate_ledger_report(args.start_date, args.end_date, 'general-ledger')
     
     except Exception as e:
-        logger.error(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
@@ -21,7 +21,7 @@ import requests
 from dotenv import load_dotenv
 
 from alegra_reports import AlegraReports
-from config import ACCOUNTING_CONFIG, ALEGRA_CONFIG, LOGGING_CONFIG, NANOBOT_CONFIG
+from config import ACCOUNTING_CONFIG, ALEGRA_CONFIG, LOGGING_CONFIG, NANOBOT_CONFIG, score_invoice_type
 from nanobot_client import NanobotClient, NanobotError, NanobotResponseError
 
 # Configurar logging dinámicamente
@@ -211,20 +211,8 @@ class InvoiceProcessor:
         return legacy_result
 
     def _legacy_detect_invoice_type(self, texto_lower: str) -> Tuple[str, int, int]:
-        compra_keywords = [
-            'proveedor', 'proveedores', 'compra', 'compras', 'factura de compra',
-            'bill', 'purchase', 'supplier', 'vendor', 'factura de proveedor',
-            'orden de compra', 'oc', 'pedido', 'receipt'
-        ]
-
-        venta_keywords = [
-            'cliente', 'clientes', 'venta', 'ventas', 'factura de venta',
-            'invoice', 'sale', 'customer', 'factura de cliente',
-            'orden de venta', 'ov', 'cotización', 'quote'
-        ]
-
-        compra_score = sum(1 for keyword in compra_keywords if keyword in texto_lower)
-        venta_score = sum(1 for keyword in venta_keywords if keyword in texto_lower)
+        # Una sola pasada Aho-Corasick sobre el texto puntúa ambos tipos
+        compra_score, venta_score = score_invoice_type(texto_lower)
 
         if compra_score > venta_score:
             legacy_result = 'compra'
@@ -272,9 +260,7 @@ class InvoiceProcessor:
         
         try:
             with pdfplumber.open(pdf_path) as pdf:
-                texto = ''
-                for page in pdf.pages:
-                    texto += page.extract_text() or ''
+                texto = ''.join([page.extract_text() or '' for page in pdf.pages])
             
             if not texto.strip():
                 logger.error("No se pudo extraer texto del PDF")
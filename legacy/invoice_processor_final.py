@@ -24,9 +24,7 @@ def extract_data_from_pdf(pdf_path, invoice_type):
     
     try:
         with pdfplumber.open(pdf_path) as pdf:
-            texto = ''
-            for page in pdf.pages:
-                texto += page.extract_text() or ''
+            texto = ''.join([page.extract_text() or '' for page in pdf.pages])
         
         print("📝 Texto extraído del PDF:")
         print("-" * 30)
@@ -12,15 +12,18 @@ import os
 import re
 import sys
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-import pdfplumber
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from alegra_reports import AlegraReports
-from config import ACCOUNTING_CONFIG, ALEGRA_CONFIG, LOGGING_CONFIG, NANOBOT_CONFIG
+from config import ACCOUNTING_CONFIG, ALEGRA_CONFIG, LOGGING_CONFIG, NANOBOT_CONFIG, score_invoice_type
 from nanobot_client import NanobotClient, NanobotError, NanobotResponseError
+from utils_pdf import extract_pdf_text
 
 # Configurar logging dinámicamente
 log_level = LOGGING_CONFIG.get('level', 'INFO')
@@ -55,9 +58,71 @@ except ImportError as e:  # pragma: no cover - best effort optional deps
 else:
     OCR_AVAILABLE = True
 
+# API persistente de Tesseract (opcional): evita lanzar un proceso y recargar el modelo por imagen
+try:
+    import tesserocr  # type: ignore[import]
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
 # Cargar variables de entorno
 load_dotenv()
 
+# Conexiones keep-alive con Alegra que conserva la sesión HTTP
+ALEGRA_POOL_CONNECTIONS = 10
+ALEGRA_POOL_MAXSIZE = 20
+
+# Códigos HTTP transitorios que se reintentan (solo métodos idempotentes, nunca POST)
+ALEGRA_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Lado mayor (px) al que se reducen las imágenes antes del OCR (~300 DPI en tamaño carta)
+OCR_MAX_SIDE = 2200
+
+# Patrones de regex mejorados, compilados una sola vez (re.IGNORECASE incluido)
+_INVOICE_PATTERNS = {
+    'fecha': [
+        re.compile(r'Fecha[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+        re.compile(r'Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+        re.compile(r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+        re.compile(r'Fecha de emisión[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE)
+    ],
+    'cliente': [
+        re.compile(r'Cliente[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Customer[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Facturar a[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Bill to[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Razón Social[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Nombre[:\s]+(.+)', re.IGNORECASE)
+    ],
+    'proveedor': [
+        re.compile(r'Proveedor[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Supplier[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'Vendor[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'De[:\s]+(.+)', re.IGNORECASE),
+        re.compile(r'From[:\s]+(.+)', re.IGNORECASE)
+    ],
+    'total': [
+        re.compile(r'Total[:\s]+\$?([\d,]+\.?\d*)', re.IGNORECASE),
+        re.compile(r'Amount[:\s]+\$?([\d,]+\.?\d*)', re.IGNORECASE),
+        re.compile(r'Subtotal[:\s]+\$?([\d,]+\.?\d*)', re.IGNORECASE),
+        re.compile(r'Importe Total[:\s]+\$?([\d,]+\.?\d*)', re.IGNORECASE),
+        re.compile(r'Total a Pagar[:\s]+\$?([\d,]+\.?\d*)', re.IGNORECASE)
+    ]
+}
+
+# Números (cantidades y precios) dentro de una línea de item
+_NUM_RE = re.compile(r'[\d,]+\.?\d*')
+
+# Líneas no vacías del texto, recorridas sin construir la lista de split('\n')
+_TEXT_LINE_RE = re.compile(r'[^\n]+')
+
+# Palabras que abren y cierran la sección de items (una sola búsqueda por línea)
+_ITEM_START_RE = re.compile('descripción|item|producto|servicio|cantidad|precio', re.IGNORECASE)
+_ITEM_END_RE = re.compile('subtotal|total|impuestos|iva', re.IGNORECASE)
+
+# Tabla para quitar separadores de miles en una sola pasada ("1,234.50" -> "1234.50")
+_COMMA_STRIP = str.maketrans('', '', ',')
+
 class InvoiceProcessor:
     """Procesador mejorado de facturas con detección automática y integración Alegra"""
 
@@ -77,6 +142,27 @@ class InvoiceProcessor:
         if not self.alegra_email or not self.alegra_token:
             raise ValueError("Faltan credenciales de Alegra en .env")
 
+        # Las credenciales no cambian: el header Basic se codifica una sola vez (solo lectura)
+        credentials = f"{self.alegra_email}:{self.alegra_token}"
+        self._auth_headers = MappingProxyType({
+            'Authorization': f"Basic {base64.b64encode(credentials.encode()).decode()}",
+            'Content-Type': 'application/json'
+        })
+
+        # Sesión compartida por todas las llamadas a Alegra: reutiliza la conexión TLS
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=ALEGRA_POOL_CONNECTIONS,
+            pool_maxsize=ALEGRA_POOL_MAXSIZE,
+            max_retries=Retry(
+                total=self.alegra_max_retries,
+                backoff_factor=0.3,
+                status_forcelist=ALEGRA_RETRY_STATUSES,
+                raise_on_status=False
+            )
+        )
+        self._session.mount('https://', adapter)
+
         self.accounting_config = ACCOUNTING_CONFIG
 
         self.nanobot_config = dict(NANOBOT_CONFIG)
@@ -105,6 +191,9 @@ class InvoiceProcessor:
 
         self.last_classification: Optional[Dict[str, Any]] = None
 
+        # API de tesserocr creada en el primer OCR y reutilizada entre facturas
+        self._ocr_api = None
+
         self._ensure_directories()
     
     def _ensure_directories(self) -> None:
@@ -121,15 +210,9 @@ class InvoiceProcessor:
             os.makedirs(directory, exist_ok=True)
             logger.debug("Directorio asegurado: %s", directory)
     
-    def get_auth_headers(self) -> Dict[str, str]:
-        """Obtener headers de autenticación para Alegra"""
-        credentials = f"{self.alegra_email}:{self.alegra_token}"
-        auth_header = f"Basic {base64.b64encode(credentials.encode()).decode()}"
-        
-        return {
-            'Authorization': auth_header,
-            'Content-Type': 'application/json'
-        }
+    def get_auth_headers(self) -> Mapping[str, str]:
+        """Obtener headers de autenticación para Alegra (calculados una vez en __init__)"""
+        return self._auth_headers
     
     def detect_invoice_type(self, texto: str) -> str:
         """Detectar automáticamente si es factura de compra o venta."""
@@ -210,20 +293,8 @@ class InvoiceProcessor:
 
     def _legacy_detect_invoice_type(self, texto_lower: str) -> Tuple[str, int, int]:
         """Detección legacy de tipo de factura"""
-        compra_keywords = [
-            'proveedor', 'proveedores', 'compra', 'compras', 'factura de compra',
-            'bill', 'purchase', 'supplier', 'vendor', 'factura de proveedor',
-            'orden de compra', 'oc', 'pedido', 'receipt'
-        ]
-
-        venta_keywords = [
-            'cliente', 'clientes', 'venta', 'ventas', 'factura de venta',
-            'invoice', 'sale', 'customer', 'factura de cliente',
-            'orden de venta', 'ov', 'cotización', 'quote'
-        ]
-
-        compra_score = sum(1 for keyword in compra_keywords if keyword in texto_lower)
-        venta_score = sum(1 for keyword in venta_keywords if keyword in texto_lower)
+        # Una sola pasada Aho-Corasick sobre el texto puntúa ambos tipos
+        compra_score, venta_score = score_invoice_type(texto_lower)
 
         if compra_score > venta_score:
             legacy_result = 'compra'
@@ -271,10 +342,8 @@ class InvoiceProcessor:
         logger.info(f"📄 Procesando PDF: {pdf_path}")
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                texto = ''
-                for page in pdf.pages:
-                    texto += page.extract_text() or ''
+            # Páginas en paralelo (procesos) para PDFs largos, unidas en orden
+            texto = extract_pdf_text(pdf_path)
             
             if not texto.strip():
                 logger.error("No se pudo extraer texto del PDF")
@@ -300,6 +369,23 @@ class InvoiceProcessor:
             logger.error(f"❌ Error procesando PDF: {e}")
             return None
 
+    def _get_ocr_api(self):
+        """Obtener la API de Tesseract, cargando el modelo 'spa' solo la primera vez"""
+        if self._ocr_api is None:
+            self._ocr_api = tesserocr.PyTessBaseAPI(
+                lang='spa', oem=tesserocr.OEM.LSTM_ONLY, psm=tesserocr.PSM.AUTO
+            )
+        return self._ocr_api
+
+    def _ocr_image(self, gray) -> str:
+        """Reconocer el texto de una imagen preprocesada (tesserocr o, si falta, pytesseract)"""
+        if not TESSEROCR_AVAILABLE:
+            return pytesseract.image_to_string(gray, lang='spa')
+        
+        api = self._get_ocr_api()
+        api.SetImage(Image.fromarray(gray))
+        return api.GetUTF8Text()
+
     def extract_data_from_image(self, image_path: str) -> Optional[Dict]:
         """Extraer datos de imagen usando OCR"""
         if not OCR_AVAILABLE:
@@ -315,13 +401,24 @@ class InvoiceProcessor:
                 logger.error("No se pudo cargar la imagen")
                 return None
             
-            # Preprocesamiento para mejorar OCR
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            gray = cv2.medianBlur(gray, 3)
-            gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+            # Reducir escaneos grandes: la precisión de Tesseract se estanca y su tiempo crece con los píxeles
+            height, width = image.shape[:2]
+            scale = min(1.0, OCR_MAX_SIDE / max(height, width))
+            if scale < 1.0:
+                # Al reducir, INTER_AREA promedia los píxeles y suaviza el ruido que quitaba medianBlur
+                image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            
+            # Preprocesamiento para mejorar OCR sobre un único buffer: gris y umbral de Otsu in situ
+            gray = np.empty(image.shape[:2], dtype=np.uint8)
+            if scale < 1.0:
+                cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=gray)
+            else:
+                # Sin reducción no hay promedio: se conserva el filtro de mediana para escaneos pequeños
+                cv2.medianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 3, dst=gray)
+            cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray)
             
             # OCR
-            texto = pytesseract.image_to_string(gray, lang='spa')
+            texto = self._ocr_image(gray)
             
             if not texto.strip():
                 logger.error("No se pudo extraer texto de la imagen")
@@ -349,43 +446,14 @@ class InvoiceProcessor:
 
     def _parse_invoice_data(self, texto: str) -> Dict:
         """Parsear datos de factura desde texto"""
-        # Patrones de regex mejorados
-        patterns = {
-            'fecha': [
-                r'Fecha[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-                r'Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-                r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-                r'Fecha de emisión[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
-            ],
-            'cliente': [
-                r'Cliente[:\s]+(.+)',
-                r'Customer[:\s]+(.+)',
-                r'Facturar a[:\s]+(.+)',
-                r'Bill to[:\s]+(.+)',
-                r'Razón Social[:\s]+(.+)',
-                r'Nombre[:\s]+(.+)'
-            ],
-            'proveedor': [
-                r'Proveedor[:\s]+(.+)',
-                r'Supplier[:\s]+(.+)',
-                r'Vendor[:\s]+(.+)',
-                r'De[:\s]+(.+)',
-                r'From[:\s]+(.+)'
-            ],
-            'total': [
-                r'Total[:\s]+\$?([\d,]+\.?\d*)',
-                r'Amount[:\s]+\$?([\d,]+\.?\d*)',
-                r'Subtotal[:\s]+\$?([\d,]+\.?\d*)',
-                r'Importe Total[:\s]+\$?([\d,]+\.?\d*)',
-                r'Total a Pagar[:\s]+\$?([\d,]+\.?\d*)'
-            ]
-        }
+        # Patrones compilados una sola vez al importar el módulo
+        patterns = _INVOICE_PATTERNS
         
         datos = {}
         
         # Extraer fecha
         for pattern in patterns['fecha']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 fecha_str = match.group(1)
                 # Convertir formato de fecha
@@ -409,20 +477,20 @@ class InvoiceProcessor:
         
         # Extraer cliente/proveedor
         for pattern in patterns['cliente']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 datos['cliente'] = match.group(1).strip()
                 break
         
         for pattern in patterns['proveedor']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 datos['proveedor'] = match.group(1).strip()
                 break
         
         # Extraer total
         for pattern in patterns['total']:
-            match = re.search(pattern, texto, re.IGNORECASE)
+            match = pattern.search(texto)
             if match:
                 total_str = match.group(1).replace(',', '')
                 try:
@@ -447,34 +515,33 @@ class InvoiceProcessor:
         """Extraer items de factura desde texto"""
         items = []
         
-        # Buscar sección de items
-        lines = texto.split('\n')
+        # Buscar sección de items recorriendo las líneas no vacías con un regex compilado
         in_items_section = False
         
-        for line in lines:
-            line = line.strip()
+        for match in _TEXT_LINE_RE.finditer(texto):
+            line = match.group().strip()
             if not line:
                 continue
             
             # Detectar inicio de sección de items
-            if any(keyword in line.lower() for keyword in ['descripción', 'item', 'producto', 'servicio', 'cantidad', 'precio']):
+            if _ITEM_START_RE.search(line):
                 in_items_section = True
                 continue
             
             # Detectar fin de sección de items
-            if any(keyword in line.lower() for keyword in ['subtotal', 'total', 'impuestos', 'iva']):
+            if _ITEM_END_RE.search(line):
                 in_items_section = False
                 continue
             
             # Extraer item si estamos en la sección correcta
             if in_items_section:
                 # Buscar números que podrían ser cantidad y precio
-                numbers = re.findall(r'[\d,]+\.?\d*', line)
+                numbers = _NUM_RE.findall(line)
                 if len(numbers) >= 2:
                     try:
-                        cantidad = float(numbers[0].replace(',', ''))
-                        precio = float(numbers[1].replace(',', ''))
-                        descripcion = re.sub(r'[\d,]+\.?\d*', '', line).strip()
+                        cantidad = float(numbers[0].translate(_COMMA_STRIP))
+                        precio = float(numbers[1].translate(_COMMA_STRIP))
+                        descripcion = _NUM_RE.sub('', line).strip()
                         
                         if descripcion and cantidad > 0 and precio > 0:
                             items.append({
@@ -505,7 +572,7 @@ class InvoiceProcessor:
         
         try:
             # Buscar contacto existente
-            response = requests.get(
+            response = self._session.get(
                 f"{self.base_url}/contacts",
                 params={'query': name},
                 headers=headers,
@@ -531,7 +598,7 @@ class InvoiceProcessor:
                 }
             }
             
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/contacts",
                 json=payload,
                 headers=headers,
@@ -564,7 +631,7 @@ class InvoiceProcessor:
         
         try:
             # Buscar item existente
-            response = requests.get(
+            response = self._session.get(
                 f"{self.base_url}/items",
                 params={'query': name},
                 headers=headers,
@@ -597,7 +664,7 @@ class InvoiceProcessor:
                 'accountingAccount': {'id': accounting_account_id}
             }
             
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/items",
                 json=payload,
                 headers=headers,
@@ -668,7 +735,7 @@ class InvoiceProcessor:
             payload['tax'] = datos_factura['impuestos']
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/bills",
                 json=payload,
                 headers=headers,
@@ -748,7 +815,7 @@ class InvoiceProcessor:
             payload['tax'] = datos_factura['impuestos']
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/invoices",
                 json=payload,
                 headers=headers,
@@ -80,9 +80,7 @@ class InvoiceBot:
         
         try:
             with pdfplumber.open(pdf_path) as pdf:
-                texto = ''
-                for page in pdf.pages:
-                    texto += page.extract_text() or ''
+                texto = ''.join([page.extract_text() or '' for page in pdf.pages])
             
             self.logger.debug(f"Texto extraído: {texto[:200]}...")
             
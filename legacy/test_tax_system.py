@@ -6,6 +6,7 @@ Valida cálculos de ReteFuente, IVA e ICA
 
 import json
 import sys
+from dataclasses import replace
 from datetime import datetime, timedelta
 from tax_calculator import ColombianTaxCalculator, InvoiceData
 
@@ -381,9 +382,12 @@ def test_edge_cases():
     print("\n📋 Monto justo debajo del umbral")
     below_threshold = threshold_amount - 1
     
-    invoice_data.base_amount = below_threshold
-    invoice_data.total_amount = below_threshold * 1.19
-    invoice_data.iva_amount = below_threshold * 0.19
+    invoice_data = replace(
+        invoice_data,
+        base_amount=below_threshold,
+        total_amount=below_threshold * 1.19,
+        iva_amount=below_threshold * 0.19
+    )
     
     tax_result = calculator.calculate_taxes(invoice_data)
     print(f"   Base: ${below_threshold:,.2f}")
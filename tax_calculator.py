@@ -5,20 +5,47 @@ Implementa ReteFuente (Renta, IVA, ICA), Impuesto a la Renta e IVA
 Basado en normativa DIAN 2025 y Reforma Tributaria 2022/2023
 """
 
+import copy
 import json
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
-class TaxResult:
+# Cantidad de facturas distintas cuyo resultado se memoriza por calculador
+TAX_CACHE_SIZE = 256
+
+class _FrozenSlotsState:
+    """
+    Estado para copy/pickle de dataclasses congeladas con __slots__ explícitos
+    
+    El __setstate__ por defecto usa setattr, que el __setattr__ de frozen rechaza;
+    se restauran los slots con object.__setattr__, como hace dataclass(slots=True).
+    """
+    __slots__ = ()
+    
+    def __getstate__(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state: Tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+# __slots__ explícitos (dataclass(slots=True) requiere Python 3.10)
+@dataclass(frozen=True)
+class TaxResult(_FrozenSlotsState):
     """Resultado del cálculo de impuestos"""
+    __slots__ = (
+        'iva_amount', 'iva_rate', 'retefuente_renta', 'retefuente_iva', 'retefuente_ica',
+        'total_withholdings', 'net_amount', 'tax_breakdown', 'compliance_status'
+    )
+    
     iva_amount: float
     iva_rate: float
     retefuente_renta: float
@@ -29,9 +56,15 @@ class TaxResult:
     tax_breakdown: Dict
     compliance_status: str
 
-@dataclass
-class InvoiceData:
-    """Datos de la factura para cálculo de impuestos"""
+@dataclass(frozen=True)
+class InvoiceData(_FrozenSlotsState):
+    """Datos de la factura para cálculo de impuestos (inmutable y hashable)"""
+    __slots__ = (
+        'base_amount', 'total_amount', 'iva_amount', 'iva_rate', 'item_type', 'description',
+        'vendor_nit', 'vendor_regime', 'vendor_city', 'buyer_nit', 'buyer_regime', 'buyer_city',
+        'invoice_date', 'invoice_number'
+    )
+    
     base_amount: float
     total_amount: float
     iva_amount: float
@@ -56,6 +89,9 @@ class ColombianTaxCalculator:
         self.config = self._load_config()
         self.uvt_2025 = self.config["uvt_2025"]
         
+        # Facturas repetidas se resuelven desde memoria (InvoiceData es hashable)
+        self._cached_calculate = lru_cache(maxsize=TAX_CACHE_SIZE)(self._calculate_taxes)
+        
         logger.info(f"✅ Calculador de impuestos inicializado - UVT 2025: ${self.uvt_2025:,}")
     
     def _load_config(self) -> Dict:
@@ -73,9 +109,23 @@ class ColombianTaxCalculator:
             raise
     
     def calculate_taxes(self, invoice_data: InvoiceData) -> TaxResult:
-        """Calcular todos los impuestos aplicables a la factura"""
+        """
+        Calcular todos los impuestos aplicables a la factura
+        
+        El resultado memorizado no se entrega directamente: cada llamada recibe
+        su propia copia de tax_breakdown para que modificarla no altere las
+        respuestas siguientes. El log de auditoría se emite en todas las llamadas.
+        """
         logger.info(f"🧮 Calculando impuestos para factura #{invoice_data.invoice_number}")
         
+        cached = self._cached_calculate(invoice_data)
+        result = replace(cached, tax_breakdown=copy.deepcopy(cached.tax_breakdown))
+        
+        logger.info(f"✅ Cálculo completado - IVA: ${result.iva_amount:,.2f}, Retenciones: ${result.total_withholdings:,.2f}")
+        return result
+    
+    def _calculate_taxes(self, invoice_data: InvoiceData) -> TaxResult:
+        """Calcular los impuestos sin pasar por la memoria de resultados"""
         # 1. Calcular IVA
         iva_result = self._calculate_iva(invoice_data)
         
@@ -124,7 +174,7 @@ class ColombianTaxCalculator:
             }
         }
         
-        result = TaxResult(
+        return TaxResult(
             iva_amount=iva_result['amount'],
             iva_rate=iva_result['rate'],
             retefuente_renta=retefuente_renta,
@@ -135,9 +185,6 @@ class ColombianTaxCalculator:
             tax_breakdown=tax_breakdown,
             compliance_status=compliance_status
         )
-        
-        logger.info(f"✅ Cálculo completado - IVA: ${iva_result['amount']:,.2f}, Retenciones: ${total_withholdings:,.2f}")
-        return result
     
     def _calculate_iva(self, invoice_data: InvoiceData) -> Dict:
         """Calcular IVA según categoría del producto/servicio"""
@@ -6,6 +6,7 @@ Maneja casos ambiguos y validaciones fiscales complejas
 
 import json
 import logging
+from dataclasses import replace
 from typing import Dict, List, Optional
 from tax_calculator import ColombianTaxCalculator, InvoiceData, TaxResult
 
@@ -65,13 +66,14 @@ class TaxNanobotIntegration:
         
         # Actualizar categoría basada en respuesta
         new_category = nanobot_response.get("category", "general")
-        invoice_data.item_type = new_category
+        original_category = invoice_data.item_type
+        invoice_data = replace(invoice_data, item_type=new_category)
         
         # Recalcular impuestos
         tax_result = self.tax_calculator.calculate_taxes(invoice_data)
         
         return {
-            "original_category": invoice_data.item_type,
+            "original_category": original_category,
             "resolved_category": new_category,
             "justification": nanobot_response.get("justification", ""),
             "tax_result": tax_result,
@@ -106,8 +108,7 @@ class TaxNanobotIntegration:
         new_vendor_regime = nanobot_response.get("vendor_regime", "comun")
         new_buyer_regime = nanobot_response.get("buyer_regime", "comun")
         
-        invoice_data.vendor_regime = new_vendor_regime
-        invoice_data.buyer_regime = new_buyer_regime
+        invoice_data = replace(invoice_data, vendor_regime=new_vendor_regime, buyer_regime=new_buyer_regime)
         
         # Recalcular impuestos
         tax_result = self.tax_calculator.calculate_taxes(invoice_data)
@@ -145,7 +146,7 @@ class TaxNanobotIntegration:
         
         # Actualizar ciudad
         new_city = nanobot_response.get("city", "bogota")
-        invoice_data.vendor_city = new_city
+        invoice_data = replace(invoice_data, vendor_city=new_city)
         
         # Recalcular impuestos
         tax_result = self.tax_calculator.calculate_taxes(invoice_data)
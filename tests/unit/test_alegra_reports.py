@@ -0,0 +1,178 @@
+"""
+Unit tests for Alegra reports.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+import orjson
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import alegra_reports
+from alegra_reports import AlegraReports
+
+TODAY = np.datetime64("2024-06-30", "D")
+
+
+class FakeResponse:
+    """Minimal aiohttp response returning a JSON payload."""
+    
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.headers = {}
+        self._payload = payload
+    
+    async def read(self):
+        return orjson.dumps(self._payload)
+    
+    async def text(self):
+        return str(self._payload)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeSession:
+    """Minimal aiohttp session that records every GET."""
+    
+    closed = False
+    
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+    
+    def get(self, url, params=None):
+        self.calls.append((url, dict(params or {})))
+        return FakeResponse(self.handler(url, params or {}))
+
+
+@pytest.fixture
+def reports(monkeypatch):
+    """AlegraReports without Redis and without writing report files."""
+    monkeypatch.setenv("ALEGRA_USER", "test@example.com")
+    monkeypatch.setenv("ALEGRA_TOKEN", "test_token_123")
+    instance = AlegraReports(use_cache=False)
+    monkeypatch.setattr(instance, "_save_report_to_file", lambda *args: None)
+    return instance
+
+
+class TestAlegraFetching:
+    """Test pagination of list endpoints and raw report endpoints."""
+    
+    def test_list_endpoint_fetches_every_page_in_order(self, reports):
+        """Test that /invoices is fetched page by page and concatenated."""
+        total = 2 * alegra_reports.ALEGRA_PAGE_SIZE + 5
+        
+        def handler(url, params):
+            start = int(params["start"])
+            stop = min(start + int(params["limit"]), total)
+            return {"metadata": {"total": total}, "data": [{"id": i} for i in range(start, stop)]}
+        
+        session = FakeSession(handler)
+        status, items = asyncio.run(
+            reports._cached_fetch(session, "invoices", {"startDate": "2024-01-01"})
+        )
+        
+        assert status == 200
+        assert [item["id"] for item in items] == list(range(total))
+        assert sorted(int(params["start"]) for _, params in session.calls) == [
+            0, alegra_reports.ALEGRA_PAGE_SIZE, 2 * alegra_reports.ALEGRA_PAGE_SIZE
+        ]
+    
+    def test_ledger_report_is_returned_unchanged(self, reports):
+        """Test that report endpoints get one GET and keep every top-level key."""
+        payload = {
+            "data": [{"date": "2024-01-31", "description": "Venta", "debit": 100.0, "credit": 0.0}],
+            "summary": {"debit": 100.0, "credit": 0.0},
+        }
+        session = FakeSession(lambda url, params: payload)
+        reports._session = session
+        
+        result = asyncio.run(reports.generate_ledger_report_async("2024-01-01", "2024-01-31"))
+        
+        assert result == payload
+        assert len(session.calls) == 1
+        url, params = session.calls[0]
+        assert url.endswith("/reports/general-ledger")
+        assert params == {"startDate": "2024-01-01", "endDate": "2024-01-31"}
+    
+    def test_report_without_data_is_not_emptied(self, reports):
+        """Test that a report payload without 'data' is kept as returned."""
+        payload = {"accounts": [{"name": "Caja", "balance": 10.0}], "total": 10.0}
+        reports._session = FakeSession(lambda url, params: payload)
+        
+        result = asyncio.run(
+            reports.generate_ledger_report_async("2024-01-01", "2024-01-31", "trial-balance")
+        )
+        
+        assert result == payload
+    
+    @pytest.mark.parametrize("report_type", ["general-ledger", "trial-balance", "journal"])
+    def test_list_payload_still_returns_report(self, reports, report_type):
+        """Test that a list-shaped report response is returned, not dropped to None."""
+        payload = [{"date": "2024-01-31", "name": "Caja", "debit": 100.0, "credit": 0.0, "total": 100.0}]
+        reports._session = FakeSession(lambda url, params: payload)
+        
+        result = asyncio.run(
+            reports.generate_ledger_report_async("2024-01-01", "2024-01-31", report_type)
+        )
+        
+        assert result == payload
+
+
+class TestAgingBuckets:
+    """Test vectorized aging of open documents."""
+    
+    @staticmethod
+    def open_document(days_overdue, total=1.0, **fields):
+        due_date = str(TODAY - np.timedelta64(days_overdue, "D"))
+        return dict({"status": "open", "dueDate": due_date, "total": total}, **fields)
+    
+    @pytest.mark.parametrize("days, bucket", [
+        (0, "current"),
+        (30, "current"),
+        (31, "31_60"),
+        (60, "31_60"),
+        (61, "61_90"),
+        (90, "61_90"),
+        (91, "over_90"),
+        (-5, "current"),
+    ])
+    def test_bucket_boundaries(self, days, bucket):
+        """Test that each boundary day lands in the same bucket as the day-by-day loop."""
+        result = AlegraReports._bucket_open_documents([self.open_document(days, 100.0)], TODAY)
+        
+        assert result["total"] == 100.0
+        assert result["aging"] == {
+            name: (100.0 if name == bucket else 0.0) for name in alegra_reports.AGING_BUCKET_NAMES
+        }
+    
+    def test_undated_documents_are_skipped(self, caplog):
+        """Test that documents without dueDate/date (NaT) are logged and excluded."""
+        documents = [
+            self.open_document(10, 50.0),
+            {"status": "open", "dueDate": "", "date": None, "total": 999.0},
+            {"status": "open", "total": 888.0},
+            self.open_document(100, 25.0),
+            self.open_document(100, 7.0, status="closed"),
+        ]
+        
+        result = AlegraReports._bucket_open_documents(iter(documents), TODAY)
+        
+        assert result["total"] == 75.0
+        assert result["aging"] == {"current": 50.0, "31_60": 0.0, "61_90": 0.0, "over_90": 25.0}
+        assert "2 documentos abiertos sin dueDate/date" in caplog.text
+    
+    def test_date_used_when_due_date_missing(self):
+        """Test that 'date' is the fallback for an empty 'dueDate'."""
+        document = {"status": "open", "dueDate": "", "date": "2024-05-15", "total": 10.0}
+        result = AlegraReports._bucket_open_documents([document], TODAY)
+        
+        assert result["aging"]["31_60"] == 10.0
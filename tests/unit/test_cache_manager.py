@@ -0,0 +1,66 @@
+"""
+Unit tests for the L1 layer of the cache manager.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import cache_manager
+from cache_manager import CacheManager
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """CacheManager backed by an in-memory fake Redis with Lua support."""
+    import redis
+    
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.Redis, "from_url",
+        classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs))
+    )
+    return CacheManager()
+
+
+class TestL1Cache:
+    """Test that L1 stays consistent with writes and is counted in metrics."""
+    
+    def test_name_lookup_sees_new_entity_after_id_write(self, cache):
+        """Test that rewriting the id key is visible through the name key."""
+        cache.cache_contact({"id": 7, "name": "Comercial ABC", "email": "old@abc.co"})
+        assert cache.get_contact_by_name("Comercial ABC")["email"] == "old@abc.co"
+        
+        cache.set_cached_data("contacts", "id:7", {"id": 7, "name": "Comercial ABC", "email": "new@abc.co"})
+        
+        assert cache.get_contact_by_name("Comercial ABC")["email"] == "new@abc.co"
+    
+    def test_l1_hits_are_counted(self, cache, monkeypatch):
+        """Test that hits served from L1 reach the hit rate."""
+        monkeypatch.setattr(cache_manager, "L1_METRICS_FLUSH_EVERY", 2)
+        cache.reset_metrics()
+        cache.set_cached_data("taxes", "iva", {"rate": 0.19})
+        
+        for _ in range(5):
+            assert cache.get_cached_data("taxes", "iva") == {"rate": 0.19}
+        cache.get_cached_data("taxes", "missing")
+        
+        metrics = cache.get_cache_metrics()
+        assert metrics["hits"] == 5
+        assert metrics["misses"] == 1
+    
+    def test_name_l1_hits_are_counted(self, cache):
+        """Test that name lookups served from L1 count as hits."""
+        cache.cache_item({"id": 3, "name": "Laptop"})
+        cache.reset_metrics()
+        
+        for _ in range(3):
+            assert cache.get_item_by_name("laptop")["id"] == 3
+        
+        assert cache.get_cache_metrics()["hits"] == 3
@@ -0,0 +1,63 @@
+"""
+Unit tests for PDF field patterns in config.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from config import PDF_PATTERNS, PDF_PATTERNS_UNION, extract_fields, match_field
+
+
+def first_pattern_match(text, field):
+    """Reference semantics: first pattern in priority order that matches anywhere."""
+    for pattern in PDF_PATTERNS[field]:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+class TestFieldPriority:
+    """Test that the unified patterns keep the priority of PDF_PATTERNS."""
+    
+    def test_labelled_date_beats_earlier_bare_date(self):
+        """Test that 'Fecha:' wins over a bare date that appears first."""
+        text = "Emitida 01/02/2024\nFecha: 15/03/2024"
+        assert match_field(text, "fecha") == "15/03/2024"
+        assert extract_fields(text)["fecha"] == "15/03/2024"
+    
+    def test_bare_date_is_fallback(self):
+        """Test that a bare date is used when no labelled date exists."""
+        assert match_field("Emitida 01/02/2024", "fecha") == "01/02/2024"
+    
+    def test_cliente_label_beats_earlier_nombre(self):
+        """Test that 'Cliente' wins over an earlier 'Nombre' line."""
+        text = "Nombre: Juan Pérez\nCliente: Comercial ABC"
+        assert match_field(text, "cliente") == "Comercial ABC"
+    
+    def test_iva_label_beats_earlier_tax(self):
+        """Test that 'IVA' wins over an earlier 'Tax' line."""
+        text = "Tax: 50\nIVA: $19,000"
+        assert match_field(text, "iva") == "19,000"
+    
+    def test_missing_field_returns_none(self):
+        """Test that a field without matches returns None."""
+        assert match_field("sin datos", "nit_proveedor") is None
+        assert "nit_proveedor" not in extract_fields("sin datos")
+    
+    @pytest.mark.parametrize("text", [
+        "Date 02/01/2024 Fecha: 03/04/2024 Fecha de emisión: 05/06/2024",
+        "Bill to: Empresa\nCustomer: Otra\nRazón Social: Tercera",
+        "Subtotal: 1,000\nAmount 900\nTotal: $1,190.00",
+        "Rete: 10\nRetention 20\nRetención: 30",
+        "Tax ID 123\nNIT: 900123456-7",
+        "No. 7\nNúmero: 9\nInvoice 33\nFactura #12",
+    ])
+    def test_matches_ordered_pattern_loop(self, text):
+        """Test that every field matches the ordered per-pattern loop."""
+        for field in PDF_PATTERNS_UNION:
+            assert match_field(text, field) == first_pattern_match(text, field)
@@ -0,0 +1,62 @@
+"""
+Unit tests for copying and pickling the frozen tax dataclasses.
+"""
+
+import copy
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from tax_calculator import InvoiceData, TaxResult
+
+
+def make_invoice_data():
+    return InvoiceData(
+        base_amount=1000000.0, total_amount=1190000.0, iva_amount=190000.0, iva_rate=0.19,
+        item_type="product", description="Laptop Dell", vendor_nit="900123456-7",
+        vendor_regime="comun", vendor_city="bogota", buyer_nit="800987654-3",
+        buyer_regime="comun", buyer_city="bogota", invoice_date="2025-01-15",
+        invoice_number="FAC-001"
+    )
+
+
+def make_tax_result():
+    return TaxResult(
+        iva_amount=190000.0, iva_rate=0.19, retefuente_renta=25000.0, retefuente_iva=28500.0,
+        retefuente_ica=4140.0, total_withholdings=57640.0, net_amount=1132360.0,
+        tax_breakdown={"iva": {"amount": 190000.0, "rate": 0.19}}, compliance_status="compliant"
+    )
+
+
+@pytest.mark.parametrize("factory", [make_invoice_data, make_tax_result])
+class TestFrozenSlotsState:
+    """Test that frozen dataclasses with explicit __slots__ round-trip."""
+    
+    def test_copy(self, factory):
+        """Test shallow copy."""
+        original = factory()
+        assert copy.copy(original) == original
+    
+    def test_deepcopy(self, factory):
+        """Test deep copy keeps values and does not share nested dicts."""
+        original = factory()
+        duplicate = copy.deepcopy(original)
+        
+        assert duplicate == original
+        if isinstance(original, TaxResult):
+            assert duplicate.tax_breakdown is not original.tax_breakdown
+    
+    def test_pickle(self, factory):
+        """Test pickle round-trip (process pools, multiprocessing)."""
+        original = factory()
+        assert pickle.loads(pickle.dumps(original)) == original
+    
+    def test_still_frozen(self, factory):
+        """Test that restored instances stay immutable."""
+        restored = pickle.loads(pickle.dumps(factory()))
+        with pytest.raises(AttributeError):
+            restored.iva_amount = 0.0
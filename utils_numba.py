@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Kernels numéricos compilados con Numba para los reportes contables
+
+Si numba no está instalado (ver requirements_performance.txt) se usan
+implementaciones equivalentes en NumPy con la misma firma.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Límites inferiores de los buckets 31-60, 61-90 y más de 90 días
+AGING_BUCKET_EDGES = (31, 61, 91)
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, parallel=True)
+    def aging_sum(days_overdue: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """Sumar montos por bucket de aging (0-30, 31-60, 61-90, >90 días)"""
+        current = 0.0
+        days_31_60 = 0.0
+        days_61_90 = 0.0
+        over_90 = 0.0
+
+        for i in prange(days_overdue.shape[0]):
+            days = days_overdue[i]
+            amount = amounts[i]
+            if days < AGING_BUCKET_EDGES[0]:
+                current += amount
+            elif days < AGING_BUCKET_EDGES[1]:
+                days_31_60 += amount
+            elif days < AGING_BUCKET_EDGES[2]:
+                days_61_90 += amount
+            else:
+                over_90 += amount
+
+        sums = np.empty(4, dtype=np.float64)
+        sums[0] = current
+        sums[1] = days_31_60
+        sums[2] = days_61_90
+        sums[3] = over_90
+        return sums
+else:
+    def aging_sum(days_overdue: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """Sumar montos por bucket de aging (0-30, 31-60, 61-90, >90 días)"""
+        buckets = np.digitize(days_overdue, AGING_BUCKET_EDGES)
+        return np.bincount(buckets, weights=amounts, minlength=len(AGING_BUCKET_EDGES) + 1)
+
+
+def warmup() -> None:
+    """Compilar los kernels por adelantado para no pagar el JIT en el primer reporte"""
+    if NUMBA_AVAILABLE:
+        aging_sum(np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.float64))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Extracción de texto de PDFs en paralelo para los procesadores de facturas
+
+pdfplumber (pdfminer) es puro Python y está limitado por CPU, así que las
+páginas de los PDFs largos se reparten en procesos para esquivar el GIL.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Tuple
+
+import pdfplumber
+
+# Procesos usados para extraer el texto de PDFs largos
+PDF_PROCESS_WORKERS = os.cpu_count() or 1
+
+# Por debajo de este número de páginas no compensa arrancar procesos
+PDF_PARALLEL_MIN_PAGES = 4
+
+
+def _extract_page_range(pdf_path: str, bounds: Tuple[int, int]) -> List[str]:
+    """Extraer el texto de un rango de páginas reabriendo el PDF (pdfplumber no es serializable)"""
+    start, stop = bounds
+    with pdfplumber.open(pdf_path) as pdf:
+        return [pdf.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Texto de todas las páginas concatenado en orden, en varios procesos si el PDF es largo"""
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        if page_count < PDF_PARALLEL_MIN_PAGES or PDF_PROCESS_WORKERS == 1:
+            return ''.join([page.extract_text() or '' for page in pdf.pages])
+
+    # Un rango contiguo por proceso: cada uno parsea el documento una sola vez
+    chunk = -(-page_count // PDF_PROCESS_WORKERS)
+    bounds = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    with ProcessPoolExecutor(max_workers=len(bounds)) as executor:
+        ranges = executor.map(partial(_extract_page_range, pdf_path), bounds)
+        return ''.join([text for texts in ranges for text in texts])